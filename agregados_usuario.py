@@ -0,0 +1,856 @@
+"""
+Agregados por Usuário - Estado incremental do /usuario/stats
+
+O /stats recarregava todos os simulados finalizados a cada chamada para
+recalcular streak (ordenando datas como string) e média de notas: custo
+crescente com o histórico, numa rota chamada a cada carregamento do
+dashboard. Agora cada usuário tem uma linha de agregados:
+
+    ultimo_dia, streak, total_simulados, soma_notas, pontos_fp, nivel
+
+atualizada em O(1) quando um simulado é finalizado (e quando FP muda em
+recompensas/desafios). O /stats vira uma leitura por chave.
+
+O mesmo vale para o /stats/por-area: uma linha por (usuário, área) com
+simulados, acertos, questões e soma das notas.
+
+E para o /stats/evolucao: uma série append-only (usuário, finished_at) com
+nota/acertos/total/área, lida por intervalo e reduzida no servidor para um
+número limitado de pontos (LTTB ou buckets dia/semana/mês). A mesma série
+atende o /simulados/history com paginação por cursor (finished_at, id).
+
+Armazenamento: SQLite local (ESTATISTICAS_DB).
+
+RECONSTRUÇÃO E VERIFICAÇÃO:
+---------------------------
+python agregados_usuario.py --backfill     # todos os usuários
+python agregados_usuario.py --verificar    # compara com os dados brutos
+
+O backfill lê os simulados em uma passada em streaming (streak) para uma
+tabela temporária e troca tudo (série, áreas e agregados) numa única
+transação: leitores nunca veem a série pela metade, e um /finish que chega
+durante a leitura é aplicado sobre a versão nova na troca (sem perder nem
+contar duas vezes). O --verificar recalcula as áreas com um GROUP BY no
+banco.
+
+Usuários sem linha (ex: anteriores a este módulo) são reconstruídos
+individualmente no primeiro acesso.
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import math
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from executores import em_thread
+from prisma_bridge import prisma_bridge, run_prisma_script
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURAÇÃO
+# ============================================================================
+
+ESTATISTICAS_DB = Path(
+    os.getenv("ESTATISTICAS_DB", Path(__file__).resolve().parent / "estatisticas.db")
+)
+
+# Tamanho das páginas lidas do banco no backfill (usuários e simulados)
+PAGINA_BACKFILL = 2000
+
+# ============================================================================
+# ÁREAS
+# ============================================================================
+
+# Disciplina do simulado -> área do conhecimento (fonte única: antes havia
+# uma cópia em Python e outra no script JS do /por-area)
+AREA_MAPPING = {
+    'matematica': 'Matemática',
+    'math': 'Matemática',
+    'linguagens': 'Linguagens',
+    'portugues': 'Linguagens',
+    'literatura': 'Linguagens',
+    'ingles': 'Linguagens',
+    'espanhol': 'Linguagens',
+    'ciencias_humanas': 'Ciências Humanas',
+    'historia': 'Ciências Humanas',
+    'geografia': 'Ciências Humanas',
+    'filosofia': 'Ciências Humanas',
+    'sociologia': 'Ciências Humanas',
+    'ciencias_natureza': 'Ciências da Natureza',
+    'biologia': 'Ciências da Natureza',
+    'fisica': 'Ciências da Natureza',
+    'quimica': 'Ciências da Natureza',
+    'geral': 'Geral',
+}
+
+
+def area_da_disciplina(disciplina: Optional[str]) -> str:
+    return AREA_MAPPING.get((disciplina or 'geral').lower(), 'Geral')
+
+# ============================================================================
+# ESTADO
+# ============================================================================
+
+def _dia(valor) -> Optional[date]:
+    """Dia UTC de um timestamp ISO (como o Prisma serializa DateTime)"""
+    if not valor:
+        return None
+    return datetime.fromisoformat(str(valor).replace("Z", "+00:00")).date()
+
+
+def _acumular(agregado: Dict, nota: Optional[float], dia: Optional[date]) -> Dict:
+    """Aplica um simulado finalizado ao agregado (O(1))"""
+    agregado["total_simulados"] += 1
+    agregado["soma_notas"] += nota or 0
+
+    if dia is None:
+        return agregado
+
+    ultimo = _dia(agregado["ultimo_dia"])
+    if ultimo is None or dia > ultimo:
+        consecutivo = ultimo is not None and dia - ultimo == timedelta(days=1)
+        agregado["streak"] = agregado["streak"] + 1 if consecutivo else 1
+        agregado["ultimo_dia"] = dia.isoformat()
+
+    return agregado
+
+
+def _novo_agregado(usuario: Dict) -> Dict:
+    return {
+        "usuario_id": usuario["id"],
+        "email": usuario["email"],
+        "nome": usuario.get("nome") or "Usuário ENEM",
+        "ultimo_dia": None,
+        "streak": 0,
+        "total_simulados": 0,
+        "soma_notas": 0.0,
+        "pontos_fp": usuario.get("pontosFP") or 0,
+        "nivel": usuario.get("nivel") or "Bronze",
+    }
+
+
+def para_stats(agregado: Dict, hoje: Optional[date] = None) -> Dict:
+    """Formato de resposta do /usuario/stats"""
+    hoje = hoje or datetime.utcnow().date()
+    ultimo = _dia(agregado["ultimo_dia"])
+
+    # Streak só vale se estudou hoje ou ontem
+    streak = agregado["streak"] if ultimo and (hoje - ultimo).days <= 1 else 0
+    total = agregado["total_simulados"]
+
+    return {
+        "email": agregado["email"],
+        "nome": agregado["nome"],
+        "pontosFP": agregado["pontos_fp"],
+        "nivel": agregado["nivel"],
+        "streak": streak,
+        "total_simulados": total,
+        "media_nota": math.floor(agregado["soma_notas"] / total + 0.5) if total > 0 else 0,
+    }
+
+def para_desempenho(areas: List[Dict]) -> List[Dict]:
+    """Formato de resposta do /stats/por-area"""
+    desempenho = []
+    for a in areas:
+        porcentagem = a["acertos"] / a["questoes"] * 100 if a["questoes"] > 0 else 0
+        nota_media = a["soma_notas"] / a["simulados"] if a["simulados"] > 0 else 0
+        desempenho.append({
+            "area": a["area"],
+            "porcentagem": math.floor(porcentagem * 10 + 0.5) / 10,
+            "simulados": a["simulados"],
+            "nota_media": math.floor(nota_media + 0.5),
+        })
+
+    # Ordena por número de simulados (decrescente)
+    desempenho.sort(key=lambda d: d["simulados"], reverse=True)
+    return desempenho
+
+# Início de cada bucket da série (semana começa na segunda-feira)
+_BUCKETS = {
+    "dia": "substr(s.finished_at, 1, 10)",
+    "semana": "date(s.finished_at, '-6 days', 'weekday 1')",
+    "mes": "substr(s.finished_at, 1, 7) || '-01'",
+}
+
+AGRUPAMENTOS = tuple(_BUCKETS)
+
+
+def _filtros_serie(email: str, inicio: Optional[str], fim: Optional[str],
+                   area: Optional[str]) -> tuple:
+    filtros = ["u.email = ?"]
+    valores: List = [email]
+    if inicio:
+        filtros.append("s.finished_at >= ?")
+        valores.append(inicio)
+    if fim:
+        filtros.append("s.finished_at <= ?")
+        valores.append(fim)
+    if area:
+        filtros.append("s.area = ?")
+        valores.append(area)
+    return " AND ".join(filtros), valores
+
+
+def lttb(pontos: List[Dict], limite: int) -> List[Dict]:
+    """
+    Largest-Triangle-Three-Buckets: reduz a série a `limite` pontos
+    preservando a forma (picos e vales), sempre com o primeiro e o último.
+    O eixo x é a ordem dos simulados (o gráfico não é proporcional ao tempo).
+    """
+    n = len(pontos)
+    if limite >= n:
+        return pontos
+    if limite < 3:
+        return [pontos[0], pontos[-1]][-limite:]
+
+    amostra = [pontos[0]]
+    largura = (n - 2) / (limite - 2)
+    a = 0
+
+    for i in range(limite - 2):
+        inicio = int(i * largura) + 1
+        fim = int((i + 1) * largura) + 1
+
+        # Média do próximo bucket (vértice C do triângulo)
+        prox_inicio, prox_fim = fim, min(int((i + 2) * largura) + 1, n)
+        if i == limite - 3:
+            prox_inicio, prox_fim = n - 1, n
+        cx = (prox_inicio + prox_fim - 1) / 2
+        cy = sum(p["nota"] for p in pontos[prox_inicio:prox_fim]) / (prox_fim - prox_inicio)
+
+        ay = pontos[a]["nota"]
+        melhor, maior_area = inicio, -1.0
+        for j in range(inicio, fim):
+            area = abs((a - cx) * (pontos[j]["nota"] - ay) - (a - j) * (cy - ay))
+            if area > maior_area:
+                melhor, maior_area = j, area
+
+        amostra.append(pontos[melhor])
+        a = melhor
+
+    amostra.append(pontos[-1])
+    return amostra
+
+
+def para_evolucao(pontos: List[Dict]) -> List[Dict]:
+    """Formato de resposta do /stats/evolucao"""
+    return [{
+        "data": p["data"],
+        "nota": round(p["nota"], 2),
+        "acertos": p["acertos"],
+        "total": p["total"],
+        "porcentagem": f"{p['acertos'] / p['total'] * 100:.1f}" if p["total"] > 0 else 0,
+        "simulados": p["simulados"],
+    } for p in pontos]
+
+# ============================================================================
+# ARMAZENAMENTO
+# ============================================================================
+
+_COLUNAS = (
+    "usuario_id", "email", "nome", "ultimo_dia", "streak",
+    "total_simulados", "soma_notas", "pontos_fp", "nivel",
+)
+
+_COLUNAS_SERIE = (
+    "usuario_id", "finished_at", "usuario_simulado_id", "area",
+    "disciplina", "nota", "acertos", "total",
+)
+
+
+class AgregadosUsuario:
+    """Linhas de agregados por usuário (acesso síncrono: use em_thread)"""
+
+    def __init__(self, caminho: Path = ESTATISTICAS_DB):
+        self._caminho = caminho
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # Reconstruções em andamento: tabela temporária -> {usuario_ids, finalizados}
+        self._reconstrucoes: Dict[str, Dict] = {}
+        self._numeros = itertools.count(1)
+
+    def _conexao(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(str(self._caminho), check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS agregados_usuario (
+                    usuario_id      TEXT PRIMARY KEY,
+                    email           TEXT NOT NULL UNIQUE,
+                    nome            TEXT NOT NULL,
+                    ultimo_dia      TEXT,
+                    streak          INTEGER NOT NULL DEFAULT 0,
+                    total_simulados INTEGER NOT NULL DEFAULT 0,
+                    soma_notas      REAL NOT NULL DEFAULT 0,
+                    pontos_fp       INTEGER NOT NULL DEFAULT 0,
+                    nivel           TEXT NOT NULL DEFAULT 'Bronze'
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS agregados_area (
+                    usuario_id TEXT NOT NULL,
+                    area       TEXT NOT NULL,
+                    simulados  INTEGER NOT NULL DEFAULT 0,
+                    acertos    INTEGER NOT NULL DEFAULT 0,
+                    questoes   INTEGER NOT NULL DEFAULT 0,
+                    soma_notas REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (usuario_id, area)
+                ) WITHOUT ROWID
+            """)
+            # finished_at em ISO 8601 UTC: ordem lexicográfica = cronológica
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS serie_notas (
+                    usuario_id          TEXT NOT NULL,
+                    finished_at         TEXT NOT NULL,
+                    usuario_simulado_id TEXT NOT NULL,
+                    area                TEXT NOT NULL,
+                    disciplina          TEXT NOT NULL DEFAULT 'geral',
+                    nota                REAL NOT NULL,
+                    acertos             INTEGER NOT NULL,
+                    total               INTEGER NOT NULL,
+                    PRIMARY KEY (usuario_id, finished_at, usuario_simulado_id)
+                ) WITHOUT ROWID
+            """)
+            colunas = {c[1] for c in self._conn.execute("PRAGMA table_info(serie_notas)")}
+            if "disciplina" not in colunas:
+                self._conn.execute("ALTER TABLE serie_notas ADD COLUMN disciplina TEXT NOT NULL DEFAULT 'geral'")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS serie_notas_area ON serie_notas (usuario_id, area, finished_at)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS serie_notas_simulado ON serie_notas (usuario_simulado_id)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _buscar(self, campo: str, valor: str) -> Optional[Dict]:
+        linha = self._conexao().execute(
+            f"SELECT * FROM agregados_usuario WHERE {campo} = ?", (valor,)
+        ).fetchone()
+        return dict(linha) if linha else None
+
+    def por_email(self, email: str) -> Optional[Dict]:
+        with self._lock:
+            return self._buscar("email", email)
+
+    def areas_por_email(self, email: str) -> Optional[List[Dict]]:
+        """Linhas por área do usuário (None se ele ainda não tem agregados)"""
+        with self._lock:
+            conn = self._conexao()
+            if self._buscar("email", email) is None:
+                return None
+            linhas = conn.execute(
+                "SELECT a.* FROM agregados_area a JOIN agregados_usuario u USING (usuario_id) "
+                "WHERE u.email = ?", (email,)
+            ).fetchall()
+        return [dict(linha) for linha in linhas]
+
+    def todas_areas(self) -> List[Dict]:
+        with self._lock:
+            return [dict(linha) for linha in self._conexao().execute("SELECT * FROM agregados_area")]
+
+    def descartar(self, usuario_id: str):
+        """Remove os agregados do usuário: o próximo acesso reconstrói"""
+        with self._lock:
+            conn = self._conexao()
+            with conn:
+                conn.execute("DELETE FROM agregados_usuario WHERE usuario_id = ?", (usuario_id,))
+
+    def possui(self, usuario_id: str) -> bool:
+        with self._lock:
+            return self._buscar("usuario_id", usuario_id) is not None
+
+    def registrar_simulado(self, usuario_id: str, simulado: Dict) -> bool:
+        """
+        Aplica um simulado finalizado (O(1)): agregado do usuário, linha da
+        área e ponto da série de notas
+
+        Args:
+            usuario_id: ID do usuário (Prisma)
+            simulado: {id, nota, acertos, total, disciplina, finished_at}
+
+        Returns:
+            False se o usuário ainda não tem agregados (precisa reconstruir)
+        """
+        nota = simulado.get("nota") or 0
+        acertos = simulado.get("acertos") or 0
+        total = simulado.get("total") or 0
+        area = area_da_disciplina(simulado.get("disciplina"))
+
+        with self._lock:
+            # Reconstruções deste usuário em andamento podem não ter lido
+            # este simulado: ele é conferido na troca (concluir_reconstrucao)
+            for reconstrucao in self._reconstrucoes.values():
+                if reconstrucao["usuario_ids"] is None or usuario_id in reconstrucao["usuario_ids"]:
+                    reconstrucao["finalizados"].append((usuario_id, simulado))
+
+            conn = self._conexao()
+            with conn:
+                agregado = self._buscar("usuario_id", usuario_id)
+                if agregado is None:
+                    return False
+                _acumular(agregado, nota, _dia(simulado["finished_at"]))
+                conn.execute(
+                    "UPDATE agregados_usuario SET ultimo_dia = ?, streak = ?, total_simulados = ?, "
+                    "soma_notas = ? WHERE usuario_id = ?",
+                    (agregado["ultimo_dia"], agregado["streak"], agregado["total_simulados"],
+                     agregado["soma_notas"], usuario_id)
+                )
+                conn.execute(
+                    "INSERT INTO agregados_area (usuario_id, area, simulados, acertos, questoes, soma_notas) "
+                    "VALUES (?, ?, 1, ?, ?, ?) "
+                    "ON CONFLICT (usuario_id, area) DO UPDATE SET "
+                    "simulados = simulados + 1, acertos = acertos + excluded.acertos, "
+                    "questoes = questoes + excluded.questoes, soma_notas = soma_notas + excluded.soma_notas",
+                    (usuario_id, area, acertos, total, nota)
+                )
+                self._inserir_serie(conn, [_linha_serie(usuario_id, simulado)])
+        return True
+
+    def _inserir_serie(self, conn: sqlite3.Connection, linhas: Iterable[tuple],
+                       tabela: str = "serie_notas"):
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {tabela} ({','.join(_COLUNAS_SERIE)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            linhas
+        )
+
+    # ------------------------------------------------------------------
+    # Reconstrução (tabela temporária + troca numa transação)
+    # ------------------------------------------------------------------
+
+    def iniciar_reconstrucao(self, usuario_ids: Optional[List[str]] = None) -> str:
+        """Cria a tabela temporária da série reconstruída (devolve o nome)"""
+        with self._lock:
+            tabela = f"serie_reconstrucao_{next(self._numeros)}"
+            self._conexao().execute(f"""
+                CREATE TEMP TABLE {tabela} (
+                    usuario_id          TEXT NOT NULL,
+                    finished_at         TEXT NOT NULL,
+                    usuario_simulado_id TEXT NOT NULL,
+                    area                TEXT NOT NULL,
+                    disciplina          TEXT NOT NULL,
+                    nota                REAL NOT NULL,
+                    acertos             INTEGER NOT NULL,
+                    total               INTEGER NOT NULL,
+                    PRIMARY KEY (usuario_id, finished_at, usuario_simulado_id)
+                ) WITHOUT ROWID
+            """)
+            self._reconstrucoes[tabela] = {
+                "usuario_ids": set(usuario_ids) if usuario_ids is not None else None,
+                "finalizados": [],
+            }
+            return tabela
+
+    def anexar_reconstrucao(self, tabela: str, simulados: List[Dict]):
+        """Acrescenta uma página de simulados (formato do Prisma) à série reconstruída"""
+        with self._lock:
+            conn = self._conexao()
+            with conn:
+                self._inserir_serie(conn, (
+                    _linha_serie(s["usuarioId"], {
+                        "id": s["id"], "finished_at": s["finishedAt"], "disciplina": s.get("disciplina"),
+                        "nota": s.get("nota"), "acertos": s.get("acertos"), "total": s.get("total"),
+                    })
+                    for s in simulados
+                ), tabela)
+
+    def concluir_reconstrucao(self, tabela: str, agregados: Dict[str, Dict]):
+        """
+        Troca série, áreas e agregados de uma vez pelos reconstruídos
+
+        Simulados finalizados durante a reconstrução que ela não leu são
+        aplicados antes da troca. As áreas saem da própria série
+        reconstruída (mesmo instante da leitura).
+        """
+        with self._lock:
+            reconstrucao = self._reconstrucoes.pop(tabela)
+            usuario_ids = reconstrucao["usuario_ids"]
+            conn = self._conexao()
+            try:
+                with conn:
+                    for usuario_id, simulado in reconstrucao["finalizados"]:
+                        lido = conn.execute(
+                            f"SELECT 1 FROM {tabela} WHERE usuario_simulado_id = ?", (simulado["id"],)
+                        ).fetchone()
+                        if lido is not None:
+                            continue
+                        self._inserir_serie(conn, [_linha_serie(usuario_id, simulado)], tabela)
+                        if usuario_id in agregados:
+                            _acumular(agregados[usuario_id], simulado.get("nota") or 0,
+                                      _dia(simulado["finished_at"]))
+
+                    if usuario_ids is None:
+                        conn.execute("DELETE FROM serie_notas")
+                        conn.execute("DELETE FROM agregados_area")
+                    else:
+                        conn.executemany("DELETE FROM serie_notas WHERE usuario_id = ?",
+                                         ((u,) for u in usuario_ids))
+                        conn.executemany("DELETE FROM agregados_area WHERE usuario_id = ?",
+                                         ((u,) for u in usuario_ids))
+
+                    colunas = ",".join(_COLUNAS_SERIE)
+                    conn.execute(f"INSERT INTO serie_notas ({colunas}) SELECT {colunas} FROM {tabela}")
+                    conn.execute(
+                        "INSERT INTO agregados_area (usuario_id, area, simulados, acertos, questoes, soma_notas) "
+                        f"SELECT usuario_id, area, COUNT(*), SUM(acertos), SUM(total), SUM(nota) FROM {tabela} "
+                        "GROUP BY usuario_id, area"
+                    )
+                    marcadores = ",".join("?" * len(_COLUNAS))
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO agregados_usuario ({','.join(_COLUNAS)}) VALUES ({marcadores})",
+                        ([a[c] for c in _COLUNAS] for a in agregados.values())
+                    )
+            finally:
+                conn.execute(f"DROP TABLE IF EXISTS {tabela}")
+
+    def abortar_reconstrucao(self, tabela: str):
+        """Descarta uma reconstrução que falhou (as tabelas atuais ficam como estão)"""
+        with self._lock:
+            self._reconstrucoes.pop(tabela, None)
+            self._conexao().execute(f"DROP TABLE IF EXISTS {tabela}")
+
+    def serie_por_email(self, email: str, inicio: Optional[str] = None, fim: Optional[str] = None,
+                        area: Optional[str] = None, agrupamento: Optional[str] = None) -> Optional[List[Dict]]:
+        """
+        Pontos da série de notas no intervalo [inicio, fim]
+
+        Args:
+            agrupamento: None (pontos brutos), 'dia', 'semana' ou 'mes'
+
+        Returns:
+            None se o usuário ainda não tem agregados
+        """
+        where, valores = _filtros_serie(email, inicio, fim, area)
+
+        if agrupamento:
+            bucket = _BUCKETS[agrupamento]
+            sql = (
+                f"SELECT {bucket} AS data, AVG(s.nota) AS nota, SUM(s.acertos) AS acertos, "
+                f"SUM(s.total) AS total, COUNT(*) AS simulados "
+                f"FROM serie_notas s JOIN agregados_usuario u USING (usuario_id) "
+                f"WHERE {where} GROUP BY 1 ORDER BY 1"
+            )
+        else:
+            sql = (
+                "SELECT s.finished_at AS data, s.nota, s.acertos, s.total, 1 AS simulados "
+                "FROM serie_notas s JOIN agregados_usuario u USING (usuario_id) "
+                f"WHERE {where} ORDER BY s.finished_at"
+            )
+
+        with self._lock:
+            conn = self._conexao()
+            if self._buscar("email", email) is None:
+                return None
+            return [dict(linha) for linha in conn.execute(sql, valores)]
+
+    def historico_por_email(self, email: str, limite: int, cursor: Optional[tuple] = None,
+                            inicio: Optional[str] = None, fim: Optional[str] = None,
+                            area: Optional[str] = None) -> Optional[List[Dict]]:
+        """
+        Página do histórico (mais recentes primeiro), paginada por cursor
+
+        Args:
+            limite: Tamanho da página
+            cursor: (finished_at, usuario_simulado_id) do último item da página anterior
+
+        Returns:
+            None se o usuário ainda não tem agregados
+        """
+        where, valores = _filtros_serie(email, inicio, fim, area)
+        if cursor:
+            # Keyset: custo da página não depende de quantas vieram antes
+            where += " AND (s.finished_at, s.usuario_simulado_id) < (?, ?)"
+            valores.extend(cursor)
+
+        sql = (
+            "SELECT s.usuario_simulado_id AS id, s.disciplina, s.nota, s.acertos, s.total, "
+            "s.finished_at AS data "
+            "FROM serie_notas s JOIN agregados_usuario u USING (usuario_id) "
+            f"WHERE {where} ORDER BY s.finished_at DESC, s.usuario_simulado_id DESC LIMIT ?"
+        )
+
+        with self._lock:
+            conn = self._conexao()
+            if self._buscar("email", email) is None:
+                return None
+            return [dict(linha) for linha in conn.execute(sql, [*valores, limite])]
+
+    def nota_do_simulado(self, usuario_simulado_id: str) -> Optional[float]:
+        """Nota de um simulado finalizado (None se não está na série)"""
+        with self._lock:
+            linha = self._conexao().execute(
+                "SELECT nota FROM serie_notas WHERE usuario_simulado_id = ?", (usuario_simulado_id,)
+            ).fetchone()
+        return linha["nota"] if linha else None
+
+    def atualizar_fp(self, email: str, pontos_fp: int, nivel: Optional[str] = None):
+        """Sincroniza FP/nível após recompensas e desafios"""
+        with self._lock:
+            conn = self._conexao()
+            with conn:
+                conn.execute(
+                    "UPDATE agregados_usuario SET pontos_fp = ?, nivel = COALESCE(?, nivel) WHERE email = ?",
+                    (pontos_fp, nivel, email)
+                )
+
+
+def _linha_serie(usuario_id: str, simulado: Dict) -> tuple:
+    """Linha de serie_notas para um simulado {id, nota, acertos, total, disciplina, finished_at}"""
+    return (
+        usuario_id, simulado["finished_at"], simulado["id"], area_da_disciplina(simulado.get("disciplina")),
+        simulado.get("disciplina") or "geral", simulado.get("nota") or 0, simulado.get("acertos") or 0,
+        simulado.get("total") or 0,
+    )
+
+
+agregados_usuario = AgregadosUsuario()
+
+# ============================================================================
+# RECONSTRUÇÃO
+# ============================================================================
+
+SCRIPT_USUARIOS = '''
+const usuarios = await prisma.usuario.findMany({
+  where: params.ids ? { id: { in: params.ids } } : (params.apos_id ? { id: { gt: params.apos_id } } : {}),
+  orderBy: { id: 'asc' },
+  take: params.pagina,
+  select: { id: true, email: true, nome: true, pontosFP: true, nivel: true }
+});
+return usuarios;
+'''
+
+# Paginação por (usuarioId, finishedAt, id): cada usuário chega em ordem
+# cronológica, o que permite acumular streak numa única passada
+SCRIPT_SIMULADOS = '''
+const apos = params.apos;
+const simulados = await prisma.usuarioSimulado.findMany({
+  where: {
+    status: "finalizado",
+    ...(params.usuario_ids ? { usuarioId: { in: params.usuario_ids } } : {}),
+    ...(apos ? {
+      OR: [
+        { usuarioId: { gt: apos.usuario_id } },
+        { usuarioId: apos.usuario_id, finishedAt: { gt: apos.finished_at } },
+        { usuarioId: apos.usuario_id, finishedAt: apos.finished_at, id: { gt: apos.id } }
+      ]
+    } : {})
+  },
+  orderBy: [{ usuarioId: 'asc' }, { finishedAt: 'asc' }, { id: 'asc' }],
+  take: params.pagina,
+  select: { id: true, usuarioId: true, simuladoId: true, nota: true, acertos: true, total: true, finishedAt: true }
+});
+
+// Disciplina (área) de cada simulado da página, numa consulta só
+const bases = await prisma.simulado.findMany({
+  where: { id: { in: Array.from(new Set(simulados.map(s => s.simuladoId))) } },
+  select: { id: true, disciplina: true }
+});
+const disciplinas = new Map(bases.map(b => [b.id, b.disciplina]));
+
+return simulados.map(s => ({ ...s, disciplina: disciplinas.get(s.simuladoId) ?? null }));
+'''
+
+
+# Agregação feita pelo banco (um GROUP BY para todos os usuários); o Python
+# só junta disciplinas da mesma área. Contagens do SQLite chegam como BigInt.
+SCRIPT_AREAS = '''
+const filtro = params.usuario_ids ? `AND us.usuarioId IN (${params.usuario_ids.map(() => '?').join(',')})` : '';
+const linhas = await prisma.$queryRawUnsafe(`
+  SELECT us.usuarioId AS usuario_id,
+         lower(COALESCE(NULLIF(s.disciplina, ''), 'geral')) AS disciplina,
+         COUNT(*) AS simulados,
+         SUM(COALESCE(us.acertos, 0)) AS acertos,
+         SUM(COALESCE(us.total, 0)) AS questoes,
+         SUM(COALESCE(us.nota, 0)) AS soma_notas
+  FROM UsuarioSimulado us
+  LEFT JOIN Simulado s ON s.id = us.simuladoId
+  WHERE us.status = 'finalizado' ${filtro}
+  GROUP BY us.usuarioId, lower(COALESCE(NULLIF(s.disciplina, ''), 'geral'))
+`, ...(params.usuario_ids ?? []));
+
+return linhas.map(l => ({
+  usuario_id: l.usuario_id,
+  disciplina: l.disciplina,
+  simulados: Number(l.simulados),
+  acertos: Number(l.acertos),
+  questoes: Number(l.questoes),
+  soma_notas: Number(l.soma_notas)
+}));
+'''
+
+
+async def _calcular_areas(usuario_ids: Optional[List[str]] = None) -> List[Dict]:
+    """Linhas por (usuário, área) calculadas a partir dos dados brutos"""
+    grupos = await run_prisma_script(SCRIPT_AREAS, {"usuario_ids": usuario_ids})
+
+    areas: Dict[tuple, Dict] = {}
+    for g in grupos:
+        chave = (g["usuario_id"], area_da_disciplina(g["disciplina"]))
+        linha = areas.setdefault(chave, {
+            "usuario_id": chave[0], "area": chave[1],
+            "simulados": 0, "acertos": 0, "questoes": 0, "soma_notas": 0.0,
+        })
+        for campo in ("simulados", "acertos", "questoes", "soma_notas"):
+            linha[campo] += g[campo]
+    return list(areas.values())
+
+
+async def _reconstruir(usuario_ids: Optional[List[str]] = None) -> int:
+    """Reconstrói agregados (todos os usuários ou só `usuario_ids`)"""
+    # 1. Usuários (todos começam zerados, mesmo sem simulados)
+    agregados: Dict[str, Dict] = {}
+    total = 0
+    apos_id = None
+    while True:
+        usuarios = await run_prisma_script(SCRIPT_USUARIOS, {
+            "ids": usuario_ids, "apos_id": apos_id, "pagina": PAGINA_BACKFILL,
+        })
+        for u in usuarios:
+            agregados[u["id"]] = _novo_agregado(u)
+        total += len(usuarios)
+        if usuario_ids or len(usuarios) < PAGINA_BACKFILL:
+            break
+        apos_id = usuarios[-1]["id"]
+
+    # 2. Simulados em streaming para a tabela temporária; 3. troca numa
+    #    transação (série, áreas e agregados). Usuário fora do passo 1 (ex:
+    #    criado entre os dois passos) não tem agregado aqui: fica para o
+    #    primeiro acesso
+    tabela = await em_thread(agregados_usuario.iniciar_reconstrucao, usuario_ids)
+    try:
+        apos = None
+        while True:
+            simulados = await run_prisma_script(SCRIPT_SIMULADOS, {
+                "usuario_ids": usuario_ids, "apos": apos, "pagina": PAGINA_BACKFILL,
+            })
+            await em_thread(agregados_usuario.anexar_reconstrucao, tabela, simulados)
+            for s in simulados:
+                if s["usuarioId"] in agregados:
+                    _acumular(agregados[s["usuarioId"]], s["nota"], _dia(s["finishedAt"]))
+            if len(simulados) < PAGINA_BACKFILL:
+                break
+            ultimo = simulados[-1]
+            apos = {"usuario_id": ultimo["usuarioId"], "finished_at": ultimo["finishedAt"], "id": ultimo["id"]}
+    except BaseException:
+        await em_thread(agregados_usuario.abortar_reconstrucao, tabela)
+        raise
+
+    await em_thread(agregados_usuario.concluir_reconstrucao, tabela, agregados)
+    return total
+
+
+async def reconstruir_usuario(usuario_id: str):
+    """Reconstrói os agregados de um usuário (primeiro acesso)"""
+    await _reconstruir([usuario_id])
+    logger.info(f"🧮 Agregados reconstruídos para {usuario_id}")
+
+
+async def registrar_finalizacao(usuario_id: str, simulado: Dict):
+    """
+    Aplica um simulado recém-finalizado aos agregados, sem deixá-lo de fora
+
+    O /finish já gravou no banco quando chega aqui. Se o incremento O(1)
+    falhar (ou o usuário ainda não tiver agregados), o usuário é
+    reconstruído a partir dos dados brutos; se até isso falhar, a linha
+    dele é descartada para a reconstrução acontecer no próximo acesso
+    (garantir_usuario).
+    """
+    try:
+        if await em_thread(agregados_usuario.registrar_simulado, usuario_id, simulado):
+            return
+    except Exception as e:
+        logger.error(f"❌ Falha ao registrar simulado {simulado['id']} nos agregados: {e}")
+
+    try:
+        await reconstruir_usuario(usuario_id)
+    except Exception as e:
+        logger.error(f"❌ Falha ao reconstruir agregados de {usuario_id}: {e} (reconstrução no próximo acesso)")
+        await em_thread(agregados_usuario.descartar, usuario_id)
+
+
+async def verificar() -> List[str]:
+    """Compara as linhas por área com os dados brutos (lista de divergências)"""
+    esperadas = {(l["usuario_id"], l["area"]): l for l in await _calcular_areas()}
+    gravadas = {(l["usuario_id"], l["area"]): l for l in await em_thread(agregados_usuario.todas_areas)}
+
+    divergencias = []
+    for chave in sorted(esperadas.keys() | gravadas.keys()):
+        esperada, gravada = esperadas.get(chave), gravadas.get(chave)
+        if esperada is None or gravada is None:
+            divergencias.append(f"{chave}: esperado={esperada} gravado={gravada}")
+            continue
+        for campo in ("simulados", "acertos", "questoes"):
+            if esperada[campo] != gravada[campo]:
+                divergencias.append(f"{chave}: {campo} esperado={esperada[campo]} gravado={gravada[campo]}")
+        if abs(esperada["soma_notas"] - gravada["soma_notas"]) > 0.01:
+            divergencias.append(f"{chave}: soma_notas esperado={esperada['soma_notas']} gravado={gravada['soma_notas']}")
+    return divergencias
+
+
+async def garantir_usuario(email: str) -> bool:
+    """
+    Reconstrói os agregados de um usuário que ainda não os tem
+
+    Returns:
+        False se o usuário não existe
+    """
+    script = '''
+const usuario = await prisma.usuario.findUnique({
+  where: { email: params.email },
+  select: { id: true }
+});
+return { usuario_id: usuario?.id ?? null };
+'''
+    usuario = await run_prisma_script(script, {"email": email})
+    if usuario["usuario_id"] is None:
+        return False
+
+    await reconstruir_usuario(usuario["usuario_id"])
+    return True
+
+
+async def backfill():
+    """Reconstrói os agregados de todos os usuários"""
+    await prisma_bridge.iniciar()
+    try:
+        total = await _reconstruir()
+        logger.info(f"✅ Agregados reconstruídos para {total} usuários")
+    finally:
+        await prisma_bridge.encerrar()
+
+
+async def _verificar_cli() -> int:
+    await prisma_bridge.iniciar()
+    try:
+        divergencias = await verificar()
+    finally:
+        await prisma_bridge.encerrar()
+
+    for d in divergencias:
+        logger.warning(f"⚠️ {d}")
+    logger.info(f"{'✅ Agregados por área consistentes' if not divergencias else f'❌ {len(divergencias)} divergências'}")
+    return 1 if divergencias else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agregados de usuário do /usuario/stats e /stats/por-area")
+    parser.add_argument("--backfill", action="store_true", help="Reconstrói todos os usuários")
+    parser.add_argument("--verificar", action="store_true", help="Compara agregados por área com os dados brutos")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.backfill:
+        asyncio.run(backfill())
+    elif args.verificar:
+        raise SystemExit(asyncio.run(_verificar_cli()))
+    else:
+        parser.print_help()
@@ -0,0 +1,226 @@
+"""
+Armazém de Resultados - Onde o backend_proxy guarda as correções
+
+RESULTADOS era um dict sem limite: crescia para sempre, sumia a cada restart
+e /resultados copiava e ordenava todos os valores a cada página. Agora o
+armazenamento é plugável, escolhido por RESULTADOS_STORE:
+
+- memoria (padrão): limitado a RESULTADOS_MAX itens, com expiração por
+  RESULTADOS_TTL_HORAS e despejo do menos usado (LRU) quando enche.
+  Índice por ordem de inserção: a página mais recente é lida do fim do
+  índice, sem cópia nem ordenação.
+- sqlite: persistente (RESULTADOS_DB), sobrevive a restarts. Paginação
+  pela chave de inserção (rowid) com LIMIT/OFFSET; mesmo limite e TTL,
+  despejando os mais antigos.
+
+Os resultados são guardados já serializáveis (dict/JSON).
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURAÇÃO
+# ============================================================================
+
+RESULTADOS_STORE = os.getenv("RESULTADOS_STORE", "memoria").lower()
+RESULTADOS_MAX = int(os.getenv("RESULTADOS_MAX", "10000"))
+RESULTADOS_TTL_HORAS = float(os.getenv("RESULTADOS_TTL_HORAS", "24"))
+RESULTADOS_DB = Path(
+    os.getenv("RESULTADOS_DB", Path(__file__).resolve().parent / "resultados.db")
+)
+
+# ============================================================================
+# INTERFACE
+# ============================================================================
+
+class ArmazemResultados:
+    """Operações que o backend_proxy usa (ver implementações abaixo)"""
+
+    def salvar(self, resultado_id: str, resultado: Dict):
+        raise NotImplementedError
+
+    def obter(self, resultado_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def remover(self, resultado_id: str) -> bool:
+        raise NotImplementedError
+
+    def listar(self, limite: int, offset: int = 0) -> Tuple[int, List[Dict]]:
+        """(total, página mais recente primeiro)"""
+        raise NotImplementedError
+
+# ============================================================================
+# MEMÓRIA (LRU + TTL)
+# ============================================================================
+
+class ArmazemMemoria(ArmazemResultados):
+    """
+    Armazém em memória limitado
+
+    Duas visões das mesmas chaves:
+        _uso:   OrderedDict em ordem de uso (LRU: o primeiro é o despejado)
+        _ordem: dict em ordem de inserção (paginação e expiração)
+    """
+
+    def __init__(self, max_itens: int = RESULTADOS_MAX, ttl_horas: float = RESULTADOS_TTL_HORAS):
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_horas * 3600
+        self._uso: "OrderedDict[str, Dict]" = OrderedDict()
+        self._ordem: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _remover(self, resultado_id: str):
+        del self._uso[resultado_id]
+        del self._ordem[resultado_id]
+
+    def _expirar(self):
+        """Remove os vencidos: são sempre os primeiros da ordem de inserção"""
+        limite = time.monotonic() - self.ttl_segundos
+        vencidos = []
+        for resultado_id, criado_em in self._ordem.items():
+            if criado_em >= limite:
+                break
+            vencidos.append(resultado_id)
+        for resultado_id in vencidos:
+            self._remover(resultado_id)
+
+    def salvar(self, resultado_id: str, resultado: Dict):
+        with self._lock:
+            self._expirar()
+            if resultado_id in self._uso:
+                self._remover(resultado_id)
+            self._uso[resultado_id] = resultado
+            self._ordem[resultado_id] = time.monotonic()
+            while len(self._uso) > self.max_itens:
+                self._remover(next(iter(self._uso)))
+
+    def obter(self, resultado_id: str) -> Optional[Dict]:
+        with self._lock:
+            self._expirar()
+            resultado = self._uso.get(resultado_id)
+            if resultado is not None:
+                self._uso.move_to_end(resultado_id)
+            return resultado
+
+    def remover(self, resultado_id: str) -> bool:
+        with self._lock:
+            if resultado_id not in self._uso:
+                return False
+            self._remover(resultado_id)
+            return True
+
+    def listar(self, limite: int, offset: int = 0) -> Tuple[int, List[Dict]]:
+        with self._lock:
+            self._expirar()
+            # Percorre só offset + limite chaves a partir da mais recente
+            pagina = islice(reversed(self._ordem), offset, offset + limite)
+            return len(self._ordem), [self._uso[resultado_id] for resultado_id in pagina]
+
+# ============================================================================
+# SQLITE (PERSISTENTE)
+# ============================================================================
+
+class ArmazemSQLite(ArmazemResultados):
+    """Armazém persistente em SQLite (uma conexão, protegida por lock)"""
+
+    def __init__(self, caminho: Path = RESULTADOS_DB, max_itens: int = RESULTADOS_MAX,
+                 ttl_horas: float = RESULTADOS_TTL_HORAS):
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_horas * 3600
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(str(caminho), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS resultados (
+                    seq       INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id        TEXT NOT NULL UNIQUE,
+                    criado_em REAL NOT NULL,
+                    dados     TEXT NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS resultados_criado_em ON resultados (criado_em)"
+            )
+            self._expirar()
+        self._total = self._conn.execute("SELECT COUNT(*) FROM resultados").fetchone()[0]
+        logger.info(f"💾 Resultados persistidos em {caminho} ({self._total} registros)")
+
+    def _expirar(self) -> int:
+        cursor = self._conn.execute(
+            "DELETE FROM resultados WHERE criado_em < ?",
+            (time.time() - self.ttl_segundos,)
+        )
+        return cursor.rowcount
+
+    def salvar(self, resultado_id: str, resultado: Dict):
+        with self._lock, self._conn:
+            removidos = self._expirar()
+            removidos += self._conn.execute(
+                "DELETE FROM resultados WHERE id = ?", (resultado_id,)
+            ).rowcount
+            self._conn.execute(
+                "INSERT INTO resultados (id, criado_em, dados) VALUES (?, ?, ?)",
+                (resultado_id, time.time(), json.dumps(resultado, ensure_ascii=False))
+            )
+            self._total += 1 - removidos
+
+            if self._total > self.max_itens:
+                # Despeja os mais antigos pela chave de inserção
+                self._total -= self._conn.execute(
+                    "DELETE FROM resultados WHERE seq IN "
+                    "(SELECT seq FROM resultados ORDER BY seq LIMIT ?)",
+                    (self._total - self.max_itens,)
+                ).rowcount
+
+    def obter(self, resultado_id: str) -> Optional[Dict]:
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT dados FROM resultados WHERE id = ? AND criado_em >= ?",
+                (resultado_id, time.time() - self.ttl_segundos)
+            ).fetchone()
+        return json.loads(linha["dados"]) if linha else None
+
+    def remover(self, resultado_id: str) -> bool:
+        with self._lock, self._conn:
+            removido = self._conn.execute(
+                "DELETE FROM resultados WHERE id = ?", (resultado_id,)
+            ).rowcount > 0
+            self._total -= removido
+            return removido
+
+    def listar(self, limite: int, offset: int = 0) -> Tuple[int, List[Dict]]:
+        with self._lock:
+            with self._conn:
+                self._total -= self._expirar()
+            linhas = self._conn.execute(
+                "SELECT dados FROM resultados ORDER BY seq DESC LIMIT ? OFFSET ?",
+                (limite, offset)
+            ).fetchall()
+            total = self._total
+        return total, [json.loads(linha["dados"]) for linha in linhas]
+
+# ============================================================================
+# FÁBRICA
+# ============================================================================
+
+def criar_armazem(tipo: str = RESULTADOS_STORE) -> ArmazemResultados:
+    """Armazém configurado por RESULTADOS_STORE (memoria | sqlite)"""
+    if tipo == "sqlite":
+        return ArmazemSQLite()
+    if tipo != "memoria":
+        logger.warning(f"⚠️ RESULTADOS_STORE={tipo!r} desconhecido, usando memória")
+    return ArmazemMemoria()
@@ -2,7 +2,7 @@
 Autenticação - Utilitários JWT e Hashing de Senhas
 
 Funções para gerenciar autenticação de usuários:
-- Hashing e verificação de senhas com bcrypt
+- Hashing e verificação de senhas com bcrypt (fora do event loop)
 - Criação e validação de tokens JWT
 - Dependências FastAPI para proteção de rotas
 """
@@ -15,6 +15,8 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from executores import em_thread_hash
+
 # ============================================================================
 # CONFIGURAÇÕES
 # ============================================================================
@@ -61,6 +63,21 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+async def hash_password_async(password: str) -> str:
+    """
+    Versão assíncrona de hash_password para handlers async
+
+    O bcrypt leva ~250ms de CPU por chamada; roda no pool de hashing para
+    não bloquear o event loop.
+    """
+    return await em_thread_hash(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Versão assíncrona de verify_password (executa no pool de hashing)"""
+    return await em_thread_hash(verify_password, plain_password, hashed_password)
+
+
 # ============================================================================
 # FUNÇÕES DE JWT
 # ============================================================================
@@ -1,11 +1,21 @@
 from fastapi import FastAPI, HTTPException, Path, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field, validator
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional
+from collections import deque
 from datetime import datetime
+import asyncio
+import json
 import uuid
 import logging
 
+import tri
+from armazem_resultados import criar_armazem
+from correcao_lote import classificar_desempenho, corrigir_bloco
+from executores import CPU_PROCESSOS, em_processo, encerrar_executores
+
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,8 +34,16 @@ app.add_middleware(
     allow_credentials=True,
 )
 
-# Memória simples (em produção, use banco de dados)
-RESULTADOS: Dict[str, Dict] = {}
+# Resultados das correções: memória limitada (LRU/TTL) ou SQLite persistente,
+# conforme RESULTADOS_STORE (ver armazem_resultados.py)
+RESULTADOS = criar_armazem()
+
+# Correção em lote: entregas por requisição e por bloco de matriz
+LOTE_MAX_ENTREGAS = 20000
+LOTE_BLOCO = 1000
+
+# Alternativa em branco em `marcadas` da correção em lote
+EM_BRANCO = "-"
 
 # ============================================================================
 # MODELOS
@@ -37,6 +55,7 @@ class Resp(BaseModel):
     enunciado: str = Field(..., min_length=10, description="Texto da questão")
     alternativas: List[str] = Field(..., min_items=4, max_items=5, description="Lista de alternativas")
     gabarito: Optional[str] = Field(None, description="Resposta correta (A-E)")
+    dificuldade: Optional[str] = Field(None, description="Dificuldade da questão (1-5 ou facil/medio/dificil) para a TRI")
     
     @validator('marcada')
     def validar_marcada(cls, v):
@@ -79,34 +98,78 @@ class ResultadoResponse(BaseModel):
     data_hora: str
     disciplina: Optional[str] = None
 
+
+class QuestaoLote(BaseModel):
+    id: int = Field(..., description="ID da questão")
+    gabarito: str = Field(..., description="Resposta correta (A-E)")
+    dificuldade: Optional[str] = Field(None, description="Dificuldade da questão (1-5 ou facil/medio/dificil) para a TRI")
+
+    @validator('gabarito')
+    def validar_gabarito(cls, v):
+        if v.upper() not in ['A', 'B', 'C', 'D', 'E']:
+            raise ValueError("Gabarito deve ser A, B, C, D ou E")
+        return v.upper()
+
+
+class EntregaLote(BaseModel):
+    aluno_id: str = Field(..., min_length=1, description="ID do aluno")
+    marcadas: str = Field(..., description="Uma letra por questão, na ordem de `questoes` ('-' = em branco)")
+    gabarito: Optional[str] = Field(None, description="Gabarito próprio desta entrega (prova com versões), na ordem de `questoes`")
+
+    @validator('marcadas')
+    def validar_marcadas(cls, v):
+        v = v.upper()
+        if v.strip("ABCDE" + EM_BRANCO):
+            raise ValueError(f"Marcadas devem ser A, B, C, D, E ou '{EM_BRANCO}'")
+        return v
+
+    @validator('gabarito')
+    def validar_gabarito(cls, v):
+        if v is not None and v.upper().strip("ABCDE"):
+            raise ValueError("Gabarito deve conter apenas A, B, C, D ou E")
+        return v.upper() if v else None
+
+
+class CorrigirLoteReq(BaseModel):
+    simulado_id: str = Field(..., min_length=1, description="ID do simulado")
+    questoes: List[QuestaoLote] = Field(..., min_items=1, description="Questões da prova, em ordem")
+    entregas: List[EntregaLote] = Field(..., min_items=1, max_items=LOTE_MAX_ENTREGAS, description="Respostas de cada aluno")
+    disciplina: Optional[str] = Field(None, description="Disciplina do simulado")
+
+
+class ResultadoAluno(BaseModel):
+    aluno_id: str
+    acertos: int
+    total: int
+    porcentagem: float
+    nota: float
+    desempenho: str
+    erradas: List[int]
+
+
+class ResultadoLoteResponse(BaseModel):
+    simulado_id: str
+    total_entregas: int
+    total_questoes: int
+    media_nota: float
+    resultados: List[ResultadoAluno]
+    data_hora: str
+    disciplina: Optional[str] = None
+
 # ============================================================================
 # FUNÇÕES AUXILIARES
 # ============================================================================
 
-def calcular_nota(acertos: int, total: int) -> float:
-    """Calcula nota baseada no modelo TRI simplificado (0-1000)"""
-    if total == 0:
+def calcular_nota(itens: List[Dict]) -> float:
+    """
+    Calcula nota TRI (3PL, EAP) do simulado (0-1000)
+
+    Args:
+        itens: [{acertou, dificuldade}] - uma entrada por questão
+    """
+    if not itens:
         return 0.0
-    porcentagem = (acertos / total) * 100
-    # Fórmula simplificada: nota base + bonus por acerto
-    nota_base = 300
-    nota_por_acerto = 700 / total
-    nota = nota_base + (acertos * nota_por_acerto)
-    return round(nota, 2)
-
-
-def classificar_desempenho(porcentagem: float) -> str:
-    """Classifica o desempenho com base na porcentagem de acertos"""
-    if porcentagem >= 90:
-        return "🏆 Excelente"
-    elif porcentagem >= 75:
-        return "🌟 Muito Bom"
-    elif porcentagem >= 60:
-        return "👍 Bom"
-    elif porcentagem >= 50:
-        return "📚 Regular"
-    else:
-        return "💪 Precisa Melhorar"
+    return tri.pontuar_simulado(itens)["nota"]
 
 
 def obter_gabarito(questao: Resp) -> str:
@@ -125,6 +188,42 @@ def obter_gabarito(questao: Resp) -> str:
     logger.warning(f"Gabarito não fornecido para questão {questao.id}, usando mock")
     return "C"
 
+async def corrigir_lote(req: CorrigirLoteReq) -> AsyncIterator[List[Dict]]:
+    """
+    Corrige as entregas em blocos de LOTE_BLOCO alunos
+
+    Cada bloco é corrigido no pool de processos (CPU fora do event loop),
+    com até CPU_PROCESSOS blocos em paralelo; os resultados saem na ordem
+    das entregas.
+
+    Yields:
+        Resultados compactos (ResultadoAluno) de cada bloco
+    """
+    ids = [q.id for q in req.questoes]
+    itens = [{"dificuldade": q.dificuldade} for q in req.questoes]
+    gabarito_comum = "".join(q.gabarito for q in req.questoes)
+
+    em_andamento = deque()
+    try:
+        for inicio in range(0, len(req.entregas), LOTE_BLOCO):
+            bloco = req.entregas[inicio:inicio + LOTE_BLOCO]
+            em_andamento.append(asyncio.ensure_future(em_processo(
+                corrigir_bloco,
+                [e.aluno_id for e in bloco],
+                [e.marcadas for e in bloco],
+                [e.gabarito for e in bloco],
+                gabarito_comum, ids, itens
+            )))
+            if len(em_andamento) >= CPU_PROCESSOS:
+                yield await em_andamento.popleft()
+
+        while em_andamento:
+            yield await em_andamento.popleft()
+    finally:
+        # Cliente desconectou no meio do stream
+        for pendente in em_andamento:
+            pendente.cancel()
+
 # ============================================================================
 # ENDPOINTS
 # ============================================================================
@@ -136,7 +235,7 @@ def root():
         "status": "online",
         "service": "ENEM-IA Result API",
         "version": "1.0",
-        "endpoints": ["/responder", "/resultado/{id}", "/resultados"]
+        "endpoints": ["/responder", "/responder/lote", "/resultado/{id}", "/resultados"]
     }
 
 
@@ -154,6 +253,7 @@ def corrigir(req: CorrigirReq):
         
         acertos = 0
         erros: List[ErroDetalhado] = []
+        itens: List[Dict] = []
         
         for r in req.respostas:
             # Obtém o gabarito correto
@@ -162,6 +262,7 @@ def corrigir(req: CorrigirReq):
             
             # Verifica se acertou
             is_certo = (marcada == correta)
+            itens.append({"acertou": is_certo, "dificuldade": r.dificuldade})
             
             if is_certo:
                 acertos += 1
@@ -178,7 +279,7 @@ def corrigir(req: CorrigirReq):
         # Cálculos
         total = len(req.respostas)
         porcentagem = round((acertos / total) * 100, 2) if total > 0 else 0
-        nota = calcular_nota(acertos, total)
+        nota = calcular_nota(itens)
         desempenho = classificar_desempenho(porcentagem)
         
         # Gera ID único para o resultado
@@ -199,8 +300,8 @@ def corrigir(req: CorrigirReq):
             "disciplina": req.disciplina
         }
         
-        # Salva em memória
-        RESULTADOS[rid] = resultado
+        # Salva já serializável (o armazém SQLite grava como JSON)
+        RESULTADOS.salvar(rid, jsonable_encoder(resultado))
         
         logger.info(f"Resultado {rid} criado: {acertos}/{total} acertos ({porcentagem}%)")
         
@@ -211,6 +312,59 @@ def corrigir(req: CorrigirReq):
         raise HTTPException(status_code=500, detail=f"Erro ao processar correção: {str(e)}")
 
 
+@app.post("/responder/lote", response_model=ResultadoLoteResponse)
+async def corrigir_em_lote(
+    req: CorrigirLoteReq,
+    stream: bool = Query(False, description="Envia um resultado por linha (NDJSON) conforme cada bloco é corrigido")
+):
+    """
+    Corrige várias entregas do mesmo simulado (ex: uma turma inteira).
+
+    - **questoes**: Questões em ordem, com gabarito e dificuldade (opcional)
+    - **entregas**: Uma string de letras por aluno (`marcadas`), alinhada com `questoes`
+    - **stream**: `true` devolve `application/x-ndjson`, um ResultadoAluno por
+      linha, sem montar a resposta inteira em memória
+
+    Os resultados são compactos (IDs das questões erradas, sem enunciados) e
+    não ficam salvos em /resultados.
+    """
+    total = len(req.questoes)
+    for i, entrega in enumerate(req.entregas):
+        if len(entrega.marcadas) != total:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Entrega {i} ({entrega.aluno_id}): {len(entrega.marcadas)} marcadas para {total} questões"
+            )
+        if entrega.gabarito and len(entrega.gabarito) != total:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Entrega {i} ({entrega.aluno_id}): gabarito com {len(entrega.gabarito)} letras para {total} questões"
+            )
+
+    logger.info(f"Corrigindo simulado {req.simulado_id} em lote: {len(req.entregas)} entregas x {total} questões")
+
+    if stream:
+        linhas = (
+            "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in bloco)
+            async for bloco in corrigir_lote(req)
+        )
+        return StreamingResponse(linhas, media_type="application/x-ndjson")
+
+    resultados = [r async for bloco in corrigir_lote(req) for r in bloco]
+    media_nota = round(sum(r["nota"] for r in resultados) / len(resultados), 2)
+
+    # Já serializável: evita validar milhares de ResultadoAluno no response_model
+    return JSONResponse(content={
+        "simulado_id": req.simulado_id,
+        "total_entregas": len(resultados),
+        "total_questoes": total,
+        "media_nota": media_nota,
+        "resultados": resultados,
+        "data_hora": datetime.now().isoformat(),
+        "disciplina": req.disciplina
+    })
+
+
 @app.get("/resultado/{resultado_id}", response_model=ResultadoResponse)
 def get_resultado(resultado_id: str = Path(..., description="ID do resultado a buscar")):
     """
@@ -220,14 +374,15 @@ def get_resultado(resultado_id: str = Path(..., description="ID do resultado a b
     """
     logger.info(f"Buscando resultado {resultado_id}")
     
-    if resultado_id not in RESULTADOS:
+    resultado = RESULTADOS.obter(resultado_id)
+    if resultado is None:
         logger.warning(f"Resultado {resultado_id} não encontrado")
         raise HTTPException(
             status_code=404, 
             detail=f"Resultado '{resultado_id}' não encontrado. Verifique o ID."
         )
     
-    return RESULTADOS[resultado_id]
+    return resultado
 
 
 @app.get("/resultados")
@@ -243,18 +398,8 @@ def listar_resultados(
     """
     logger.info(f"Listando resultados (limite={limite}, offset={offset})")
     
-    resultados_lista = list(RESULTADOS.values())
-    total = len(resultados_lista)
-    
-    # Ordenar por data (mais recente primeiro)
-    resultados_ordenados = sorted(
-        resultados_lista, 
-        key=lambda x: x.get('data_hora', ''), 
-        reverse=True
-    )
-    
-    # Aplicar paginação
-    resultados_pagina = resultados_ordenados[offset:offset + limite]
+    # Mais recente primeiro, direto do índice de inserção do armazém
+    total, resultados_pagina = RESULTADOS.listar(limite, offset)
     
     return {
         "total": total,
@@ -273,11 +418,9 @@ def deletar_resultado(resultado_id: str = Path(..., description="ID do resultado
     """
     logger.info(f"Deletando resultado {resultado_id}")
     
-    if resultado_id not in RESULTADOS:
+    if not RESULTADOS.remover(resultado_id):
         raise HTTPException(status_code=404, detail="Resultado não encontrado")
     
-    del RESULTADOS[resultado_id]
-    
     return {"message": f"Resultado {resultado_id} deletado com sucesso"}
 
 
@@ -293,6 +436,7 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    encerrar_executores()
     logger.info("🛑 ENEM-IA Result API encerrada")
 
 
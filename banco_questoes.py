@@ -0,0 +1,285 @@
+"""
+Banco de Questões - Índice em memória para montagem de simulados
+
+O /start pegava as N primeiras questões da consulta (`take: N`): todo mundo
+recebia as mesmas questões e o banco varria a tabela desde o início a cada
+simulado. Agora o processo mantém um snapshot SOMENTE LEITURA com os ids das
+questões indexados por disciplina/área/dificuldade, e a amostragem é feita
+em memória:
+
+- amostrar(...)               -> uniforme, sem reposição, O(k)
+- amostrar(..., estratificar_por="dificuldade")
+                              -> proporcional a cada estrato, O(k)
+
+Questões já vistas (bitmap de questoes_vistas.py) são puladas; só entram
+como FALLBACK se não houver questões novas suficientes.
+
+Os dados vêm do banco Prisma (os JSON de enem_ingestion/ não têm os ids do
+banco, que são o que o simulado grava). O snapshot é trocado atomicamente:
+quem já está amostrando continua com o anterior.
+
+Recarga:
+    - automática: a cada BANCO_QUESTOES_TTL_SECONDS compara total/maior id
+    - manual:     banco_questoes.invalidar() (ex: após importar questões)
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from array import array
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+from questoes_vistas import contem
+from prisma_bridge import run_prisma_script
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURAÇÃO
+# ============================================================================
+
+BANCO_QUESTOES_TTL_SECONDS = float(os.getenv("BANCO_QUESTOES_TTL_SECONDS", "60"))
+
+# Carga paginada: o sidecar nunca materializa o banco inteiro de uma vez
+PAGINA_CARGA = 5000
+
+CAMPOS = ("disciplina", "area", "dificuldade")
+
+# Campos opcionais no schema: lidos com `??` para não quebrar a consulta
+SCRIPT_CARGA = '''
+const questoes = await prisma.questao.findMany({
+  where: params.apos_id != null ? { id: { gt: params.apos_id } } : {},
+  orderBy: { id: 'asc' },
+  take: params.pagina
+});
+
+return questoes.map(q => ({
+  id: q.id,
+  disciplina: q.disciplina ?? null,
+  area: q.area ?? null,
+  dificuldade: q.difficulty ?? q.dificuldade ?? null
+}));
+'''
+
+SCRIPT_ASSINATURA = '''
+const agregado = await prisma.questao.aggregate({
+  _count: { id: true },
+  _max: { id: true }
+});
+
+return { total: agregado._count.id, max_id: agregado._max.id };
+'''
+
+Chave = Tuple[Optional[str], Optional[str], Optional[str]]
+
+# ============================================================================
+# SNAPSHOT
+# ============================================================================
+
+class SnapshotBanco:
+    """
+    Índices imutáveis do banco de questões
+
+    Cada questão entra em uma lista por combinação de filtros
+    (disciplina, area, dificuldade), com None como curinga, então qualquer
+    filtro é resolvido com um único acesso a dicionário.
+    """
+
+    def __init__(self, questoes: List[Dict], assinatura: Dict):
+        self.assinatura = assinatura
+        self.carregado_em = time.monotonic()
+        self.total = len(questoes)
+        self._indice: Dict[Chave, array] = {}
+        distintos: Dict[str, set] = {campo: set() for campo in CAMPOS}
+
+        for q in questoes:
+            valores = tuple(_normalizar(q.get(campo)) for campo in CAMPOS)
+            for campo, valor in zip(CAMPOS, valores):
+                if valor is not None:
+                    distintos[campo].add(valor)
+            for chave in _chaves(valores):
+                self._indice.setdefault(chave, array("l")).append(q["id"])
+
+        # Valores de cada campo (estratos possíveis)
+        self.valores: Dict[str, List[str]] = {campo: sorted(v) for campo, v in distintos.items()}
+
+    def ids(self, disciplina: Optional[str] = None, area: Optional[str] = None,
+            dificuldade: Optional[str] = None) -> array:
+        return self._indice.get(
+            (_normalizar(disciplina), _normalizar(area), _normalizar(dificuldade)),
+            array("l")
+        )
+
+    def amostrar(self, quantidade: int, excluir: bytes = b"",
+                 disciplina: Optional[str] = None, area: Optional[str] = None,
+                 dificuldade: Optional[str] = None,
+                 estratificar_por: Optional[str] = None,
+                 rng: Optional[random.Random] = None) -> Tuple[List[int], int]:
+        """
+        Sorteia questões sem reposição, evitando as marcadas em `excluir`
+
+        Args:
+            quantidade: Número de questões
+            excluir: Bitmap de questões já vistas
+            disciplina/area/dificuldade: Filtros (opcionais)
+            estratificar_por: Campo para amostragem estratificada (opcional);
+                se o filtro já fixa esse campo, sorteia só dentro dele
+
+        Returns:
+            (ids sorteados, quantas delas são repetidas)
+        """
+        rng = rng or random
+        filtro = {"disciplina": disciplina, "area": area, "dificuldade": dificuldade}
+
+        if not estratificar_por:
+            return _sortear(self.ids(**filtro), quantidade, excluir, rng)
+
+        if estratificar_por not in CAMPOS:
+            raise ValueError(f"estratificar_por deve ser um de {CAMPOS}")
+
+        # Filtro já fixa o campo: um único estrato (o do filtro)
+        if filtro[estratificar_por] is not None:
+            return _sortear(self.ids(**filtro), quantidade, excluir, rng)
+
+        estratos = [
+            self.ids(**{**filtro, estratificar_por: valor})
+            for valor in self.valores[estratificar_por]
+        ]
+        estratos = [e for e in estratos if e]
+        cotas = _distribuir(quantidade, [len(e) for e in estratos])
+
+        selecionadas: List[int] = []
+        repetidas = 0
+        for estrato, cota in zip(estratos, cotas):
+            ids, rep = _sortear(estrato, cota, excluir, rng)
+            selecionadas.extend(ids)
+            repetidas += rep
+
+        # Questões sem valor no campo de estratificação completam a cota
+        faltam = quantidade - len(selecionadas)
+        if faltam > 0:
+            escolhidas = set(selecionadas)
+            restantes = array("l", (i for i in self.ids(**filtro) if i not in escolhidas))
+            ids, rep = _sortear(restantes, faltam, excluir, rng)
+            selecionadas.extend(ids)
+            repetidas += rep
+
+        rng.shuffle(selecionadas)
+        return selecionadas, repetidas
+
+
+def _normalizar(valor) -> Optional[str]:
+    if valor is None or valor == "":
+        return None
+    return str(valor).strip().lower()
+
+
+def _chaves(valores: Tuple) -> List[Chave]:
+    """Todas as combinações (valor ou curinga) de uma questão"""
+    chaves = []
+    for r in range(len(CAMPOS) + 1):
+        for posicoes in combinations(range(len(CAMPOS)), r):
+            if any(valores[p] is None for p in posicoes):
+                continue
+            chaves.append(tuple(valores[p] if p in posicoes else None for p in range(len(CAMPOS))))
+    return chaves
+
+
+def _sortear(ids: array, quantidade: int, excluir: bytes,
+             rng: random.Random) -> Tuple[List[int], int]:
+    """
+    Fisher-Yates "virtual": as trocas ficam num dict em vez de copiar `ids`,
+    então cada sorteio é O(1) e a amostra custa O(k) (mais as vistas puladas).
+    """
+    n = len(ids)
+    trocas: Dict[int, int] = {}
+    novas: List[int] = []
+    vistas: List[int] = []
+
+    for j in range(n):
+        if len(novas) >= quantidade:
+            break
+        i = rng.randrange(j, n)
+        escolhido = trocas.get(i, i)
+        trocas[i] = trocas.get(j, j)
+        questao_id = ids[escolhido]
+        if excluir and contem(excluir, questao_id):
+            vistas.append(questao_id)
+        else:
+            novas.append(questao_id)
+
+    # FALLBACK: completa com questões já vistas
+    repetidas = vistas[:max(0, quantidade - len(novas))]
+    return novas + repetidas, len(repetidas)
+
+
+def _distribuir(quantidade: int, tamanhos: List[int]) -> List[int]:
+    """Cotas proporcionais ao tamanho de cada estrato (maiores restos)"""
+    total = sum(tamanhos)
+    if total == 0:
+        return [0] * len(tamanhos)
+    quantidade = min(quantidade, total)
+    exatas = [quantidade * t / total for t in tamanhos]
+    cotas = [int(e) for e in exatas]
+    ordem = sorted(range(len(tamanhos)), key=lambda i: exatas[i] - cotas[i], reverse=True)
+    for i in ordem[:quantidade - sum(cotas)]:
+        cotas[i] += 1
+    return cotas
+
+# ============================================================================
+# BANCO (snapshot + recarga)
+# ============================================================================
+
+class BancoQuestoes:
+    """Mantém o snapshot atual e o recarrega quando o banco muda"""
+
+    def __init__(self):
+        self._snapshot: Optional[SnapshotBanco] = None
+        self._lock = asyncio.Lock()
+        self._verificado_em = 0.0
+
+    def invalidar(self):
+        """Força verificação no próximo acesso"""
+        self._verificado_em = 0.0
+
+    async def obter(self) -> SnapshotBanco:
+        """Snapshot atual (carrega ou recarrega se necessário)"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._verificado_em < BANCO_QUESTOES_TTL_SECONDS:
+            return snapshot
+
+        async with self._lock:
+            # Outra requisição pode ter recarregado enquanto esperávamos
+            if self._snapshot is not None and time.monotonic() - self._verificado_em < BANCO_QUESTOES_TTL_SECONDS:
+                return self._snapshot
+
+            assinatura = await run_prisma_script(SCRIPT_ASSINATURA)
+            if self._snapshot is None or self._snapshot.assinatura != assinatura:
+                self._snapshot = await self._carregar(assinatura)
+            self._verificado_em = time.monotonic()
+            return self._snapshot
+
+    async def _carregar(self, assinatura: Dict) -> SnapshotBanco:
+        inicio = time.perf_counter()
+        questoes: List[Dict] = []
+        apos_id = None
+        while True:
+            pagina = await run_prisma_script(SCRIPT_CARGA, {"apos_id": apos_id, "pagina": PAGINA_CARGA})
+            questoes.extend(pagina)
+            if len(pagina) < PAGINA_CARGA:
+                break
+            apos_id = pagina[-1]["id"]
+
+        snapshot = SnapshotBanco(questoes, assinatura)
+        logger.info(
+            f"📚 Banco de questões carregado: {snapshot.total} questões "
+            f"em {(time.perf_counter() - inicio) * 1000:.0f} ms"
+        )
+        return snapshot
+
+
+# Instância única do processo
+banco_questoes = BancoQuestoes()
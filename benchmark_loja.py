@@ -0,0 +1,100 @@
+"""
+Benchmark - /rewards/loja (antes x depois)
+
+Mede requisições por segundo do trabalho feito pelo endpoint, com
+`--concorrencia` requisições simultâneas durante `--duracao` segundos:
+
+- antes:      reward.findMany no sidecar a cada requisição + serialização
+- depois:     catálogo em cache (corpo já serializado)
+- depois 304: cliente envia If-None-Match com o ETag atual (sem corpo)
+
+Usa o mesmo sidecar Prisma da API (prisma_bridge). Não inclui o custo do
+servidor HTTP, igual nos três casos.
+
+COMO USAR:
+----------
+python benchmark_loja.py --duracao 5 --concorrencia 20
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from catalogo_recompensas import catalogo_recompensas
+from prisma_bridge import prisma_bridge, run_prisma_script
+
+SCRIPT_ANTES = '''
+const rewards = await prisma.reward.findMany({
+  orderBy: {
+    custoFP: 'asc'
+  }
+});
+
+const recompensas = rewards.map(r => ({
+  id: r.id,
+  titulo: r.titulo,
+  descricao: r.descricao,
+  custoFP: r.custoFP,
+  emoji: r.emoji,
+  categoria: r.categoria,
+  disponivel: r.disponivel
+}));
+
+return { recompensas };
+'''
+
+
+async def antes():
+    result = await run_prisma_script(SCRIPT_ANTES)
+    return json.dumps(result).encode("utf-8")
+
+
+async def depois():
+    return (await catalogo_recompensas.obter()).corpo
+
+
+async def depois_304(etag: str):
+    catalogo = await catalogo_recompensas.obter()
+    return b"" if catalogo.corresponde(etag) else catalogo.corpo
+
+
+async def medir(requisicao, duracao: float, concorrencia: int) -> float:
+    """Retorna requisições por segundo"""
+    fim = time.perf_counter() + duracao
+    contagem = 0
+
+    async def trabalhador():
+        nonlocal contagem
+        while time.perf_counter() < fim:
+            await requisicao()
+            contagem += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    return contagem / (time.perf_counter() - inicio)
+
+
+async def main(duracao: float, concorrencia: int):
+    await prisma_bridge.iniciar()
+    try:
+        etag = (await catalogo_recompensas.obter()).etag
+
+        base = await medir(antes, duracao, concorrencia)
+        print(f"{'cenário':>11} | {'req/s':>10} | {'ganho':>8}")
+        print("-" * 36)
+        print(f"{'antes':>11} | {base:>10.0f} | {'':>8}")
+        for nome, requisicao in (("depois", depois), ("depois 304", lambda: depois_304(etag))):
+            rps = await medir(requisicao, duracao, concorrencia)
+            print(f"{nome:>11} | {rps:>10.0f} | {rps / base:>7.0f}x")
+    finally:
+        await prisma_bridge.encerrar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do catálogo da loja (/rewards/loja)")
+    parser.add_argument("--duracao", type=float, default=5)
+    parser.add_argument("--concorrencia", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.duracao, args.concorrencia))
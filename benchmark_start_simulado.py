@@ -0,0 +1,118 @@
+"""
+Benchmark - Vinculação de questões no /start (antes x depois)
+
+Mede a latência de criar Simulado + SimuladoQuestao + UsuarioSimulado para
+10/45/90/180 questões com as duas estratégias:
+
+- antes:  um simuladoQuestao.create sequencial por questão
+- depois: $transaction + createMany (INSERT multi-linha)
+
+Usa o mesmo sidecar Prisma da API (prisma_bridge) e remove tudo o que criar.
+
+COMO USAR:
+----------
+python benchmark_start_simulado.py --repeticoes 5 --email bench@enem.local
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from prisma_bridge import prisma_bridge, run_prisma_script
+
+TAMANHOS = [10, 45, 90, 180]
+
+SCRIPT_ANTES = '''
+const simulado = await prisma.simulado.create({ data: { disciplina: "benchmark" } });
+
+const questoesUnicas = Array.from(new Set(params.ids))
+  .map(id => params.ids.find(q => q === id));
+
+for (const id of questoesUnicas) {
+  await prisma.simuladoQuestao.create({
+    data: { simuladoId: simulado.id, questaoId: id }
+  });
+}
+
+const usuarioSimulado = await prisma.usuarioSimulado.create({
+  data: { usuarioId: params.usuario_id, simuladoId: simulado.id, total: questoesUnicas.length }
+});
+
+return { simulado_id: simulado.id, usuario_simulado_id: usuarioSimulado.id };
+'''
+
+SCRIPT_DEPOIS = '''
+const questoesUnicas = Array.from(new Set(params.ids));
+
+return await prisma.$transaction(async (tx) => {
+  const simulado = await tx.simulado.create({ data: { disciplina: "benchmark" } });
+
+  await tx.simuladoQuestao.createMany({
+    data: questoesUnicas.map(id => ({ simuladoId: simulado.id, questaoId: id }))
+  });
+
+  const usuarioSimulado = await tx.usuarioSimulado.create({
+    data: { usuarioId: params.usuario_id, simuladoId: simulado.id, total: questoesUnicas.length }
+  });
+
+  return { simulado_id: simulado.id, usuario_simulado_id: usuarioSimulado.id };
+});
+'''
+
+SCRIPT_LIMPEZA = '''
+await prisma.usuarioSimulado.delete({ where: { id: params.usuario_simulado_id } });
+await prisma.simuladoQuestao.deleteMany({ where: { simuladoId: params.simulado_id } });
+await prisma.simulado.delete({ where: { id: params.simulado_id } });
+return { ok: true };
+'''
+
+SCRIPT_PREPARO = '''
+let usuario = await prisma.usuario.findUnique({ where: { email: params.email } });
+if (!usuario) {
+  usuario = await prisma.usuario.create({
+    data: { email: params.email, nome: "Benchmark", senha: "-" }
+  });
+}
+const questoes = await prisma.questao.findMany({ select: { id: true }, take: params.max });
+return { usuario_id: usuario.id, ids: questoes.map(q => q.id) };
+'''
+
+
+async def medir(script: str, usuario_id: str, ids: list, repeticoes: int) -> float:
+    """Retorna a mediana (ms) de `repeticoes` execuções do script"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        criado = await run_prisma_script(script, {"usuario_id": usuario_id, "ids": ids})
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        await run_prisma_script(SCRIPT_LIMPEZA, criado)
+    return statistics.median(tempos)
+
+
+async def main(repeticoes: int, email: str):
+    await prisma_bridge.iniciar()
+    try:
+        preparo = await run_prisma_script(SCRIPT_PREPARO, {"email": email, "max": max(TAMANHOS)})
+        ids = preparo["ids"]
+
+        print(f"{'questões':>9} | {'antes (ms)':>11} | {'depois (ms)':>11} | {'ganho':>6}")
+        print("-" * 48)
+        for n in TAMANHOS:
+            if n > len(ids):
+                print(f"{n:>9} | banco tem apenas {len(ids)} questões")
+                continue
+            antes = await medir(SCRIPT_ANTES, preparo["usuario_id"], ids[:n], repeticoes)
+            depois = await medir(SCRIPT_DEPOIS, preparo["usuario_id"], ids[:n], repeticoes)
+            print(f"{n:>9} | {antes:>11.1f} | {depois:>11.1f} | {antes / depois:>5.1f}x")
+    finally:
+        await prisma_bridge.encerrar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da vinculação de questões do /start")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--email", default="benchmark@enem.local")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.repeticoes, args.email))
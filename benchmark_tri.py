@@ -0,0 +1,84 @@
+"""
+Benchmark - Pontuação TRI (um vetor por vez x lote vetorizado)
+
+Gera respostas sintéticas pelo próprio modelo 3PL (45 itens por área, como
+uma área do ENEM) e mede o tempo de pontuar 100/1.000/10.000 alunos:
+
+- por aluno: tri.pontuar_simulado em laço (como o /finish faz para um aluno)
+- lote:      tri.pontuar_lote numa única chamada (matriz alunos × itens)
+
+Também confere que os dois caminhos dão a mesma nota e que a TRI recupera a
+proficiência simulada (correlação θ estimado x θ verdadeiro).
+
+Não usa banco nem sidecar.
+
+COMO USAR:
+----------
+python benchmark_tri.py --itens 45 --repeticoes 3
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+import tri
+
+TAMANHOS = [100, 1000, 10000]
+
+
+def gerar(alunos: int, n_itens: int, rng: np.random.Generator):
+    """(respostas 0/1, itens, θ verdadeiro) simulados pelo modelo 3PL"""
+    itens = [{"dificuldade": int(d)} for d in rng.integers(1, 6, n_itens)]
+    theta = rng.standard_normal(alunos)
+    a, b, c = tri.parametros_itens(itens)
+    p = c + (1 - c) / (1 + np.exp(-tri.D * a * (theta[:, None] - b)))
+    respostas = (rng.random((alunos, n_itens)) < p).astype(float)
+    return respostas, itens, theta
+
+
+def por_aluno(respostas: np.ndarray, itens: list) -> np.ndarray:
+    notas = []
+    for linha in respostas:
+        notas.append(tri.pontuar_simulado([
+            {**item, "acertou": bool(r)} for item, r in zip(itens, linha)
+        ])["nota"])
+    return np.array(notas)
+
+
+def medir(funcao, repeticoes: int) -> float:
+    """Retorna a mediana (ms) de `repeticoes` execuções"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main(n_itens: int, repeticoes: int, semente: int):
+    rng = np.random.default_rng(semente)
+
+    print(f"{'alunos':>7} | {'por aluno (ms)':>14} | {'lote (ms)':>10} | {'ganho':>7} | {'corr θ':>6}")
+    print("-" * 58)
+    for alunos in TAMANHOS:
+        respostas, itens, theta = gerar(alunos, n_itens, rng)
+
+        lote = tri.pontuar_lote(respostas, itens)
+        assert np.allclose(lote["nota"], por_aluno(respostas, itens))
+        correlacao = np.corrcoef(lote["theta"], theta)[0, 1]
+
+        antes = medir(lambda: por_aluno(respostas, itens), repeticoes)
+        depois = medir(lambda: tri.pontuar_lote(respostas, itens), repeticoes)
+        print(f"{alunos:>7} | {antes:>14.1f} | {depois:>10.2f} | {antes / depois:>6.0f}x | {correlacao:>6.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da pontuação TRI")
+    parser.add_argument("--itens", type=int, default=45)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    main(args.itens, args.repeticoes, args.semente)
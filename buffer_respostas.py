@@ -0,0 +1,401 @@
+"""
+Buffer de Respostas - Escrita diferida (write-behind) do /answer
+
+Cada clique numa alternativa era um findFirst + update/create no banco: a
+escrita mais frequente do sistema. Agora o /answer:
+
+1. Anota a resposta num diário local (append-only, JSON por linha, fsync)
+2. Guarda a resposta em memória (a última marcação de cada questão vence)
+3. Responde imediatamente
+
+As respostas pendentes vão para o banco:
+- a cada RESPOSTAS_FLUSH_SECONDS, em lote (createMany + updateMany numa transação)
+- SEMPRE antes de pontuar: o /finish grava as pendentes do simulado na mesma
+  transação em que calcula a nota
+
+Recuperação: ao iniciar, o diário é relido e o que não foi gravado volta a
+ficar pendente. Após cada gravação o diário é compactado (só o que falta).
+
+Concorrência: gravar é exclusivo POR SIMULADO (sem chave única, duas
+gravações simultâneas das mesmas respostas duplicariam linhas). O /finish
+reserva só o seu simulado (`finalizacao`) e a descarga periódica pula os
+simulados reservados; finalizações de simulados diferentes não esperam
+umas pelas outras nem pela descarga.
+
+Simulados finalizados não aceitam respostas: o /answer consulta
+`status_do_simulado` (uma ida ao banco por simulado, depois em memória) e a
+descarga descarta o que chegar depois da finalização.
+
+UM PROCESSO POR DIÁRIO: as pendentes vivem na memória do processo, então o
+/finish só enxerga as respostas recebidas pelo próprio processo, e a
+compactação de um processo apagaria as linhas anotadas por outro. O buffer
+segura um lock exclusivo (<diário>.lock) e o startup FALHA num segundo
+processo com o mesmo diário (ex: `uvicorn --workers 2`): o backend roda com
+UM worker (ver main.py).
+
+Configuração:
+    RESPOSTAS_JOURNAL          (padrão: respostas_pendentes.jsonl)
+    RESPOSTAS_FLUSH_SECONDS    (padrão: 2)
+    RESPOSTAS_JOURNAL_FSYNC    (padrão: 1 - desligue só em desenvolvimento)
+    RESPOSTAS_STATUS_CACHE     (padrão: 10000 - simulados com status em memória)
+"""
+
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock (desenvolvimento)
+    fcntl = None
+
+from executores import em_thread
+from prisma_bridge import run_prisma_script
+from questoes_vistas import indice_vistas
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURAÇÃO
+# ============================================================================
+
+RESPOSTAS_JOURNAL = Path(
+    os.getenv("RESPOSTAS_JOURNAL", Path(__file__).resolve().parent / "respostas_pendentes.jsonl")
+)
+RESPOSTAS_FLUSH_SECONDS = float(os.getenv("RESPOSTAS_FLUSH_SECONDS", "2"))
+RESPOSTAS_JOURNAL_FSYNC = os.getenv("RESPOSTAS_JOURNAL_FSYNC", "1") == "1"
+RESPOSTAS_STATUS_CACHE = int(os.getenv("RESPOSTAS_STATUS_CACHE", "10000"))
+
+SIMULADO_FINALIZADO = "finalizado"
+
+# ============================================================================
+# SCRIPTS PRISMA
+# ============================================================================
+
+# Upsert em lote de respostas. UsuarioResposta não tem chave única
+# (usuarioSimuladoId, questaoId), então: 1 findMany + 1 createMany +
+# 1 updateMany por alternativa (no máximo 6). Usado também pelo /finish.
+JS_GRAVAR_RESPOSTAS = '''
+async function gravarRespostas(tx, respostas) {
+  if (respostas.length === 0) return 0;
+
+  const simuladoIds = Array.from(new Set(respostas.map(r => r.usuario_simulado_id)));
+  const existentes = await tx.usuarioResposta.findMany({
+    where: { usuarioSimuladoId: { in: simuladoIds } },
+    select: { id: true, usuarioSimuladoId: true, questaoId: true, alternativaMarcada: true }
+  });
+  const porChave = new Map(existentes.map(e => [`${e.usuarioSimuladoId}:${e.questaoId}`, e]));
+
+  const novas = [];
+  const atualizar = new Map();  // alternativa -> ids de UsuarioResposta
+
+  for (const r of respostas) {
+    const existente = porChave.get(`${r.usuario_simulado_id}:${r.questao_id}`);
+    if (!existente) {
+      novas.push({
+        usuarioSimuladoId: r.usuario_simulado_id,
+        questaoId: r.questao_id,
+        alternativaMarcada: r.alternativa_marcada
+      });
+    } else if (existente.alternativaMarcada !== r.alternativa_marcada) {
+      if (!atualizar.has(r.alternativa_marcada)) atualizar.set(r.alternativa_marcada, []);
+      atualizar.get(r.alternativa_marcada).push(existente.id);
+    }
+  }
+
+  if (novas.length > 0) {
+    await tx.usuarioResposta.createMany({ data: novas });
+  }
+  for (const [alternativa, ids] of atualizar) {
+    await tx.usuarioResposta.updateMany({
+      where: { id: { in: ids } },
+      data: { alternativaMarcada: alternativa }
+    });
+  }
+
+  return respostas.length;
+}
+'''
+
+SCRIPT_STATUS = '''
+const us = await prisma.usuarioSimulado.findUnique({
+  where: { id: params.usuario_simulado_id },
+  select: { status: true }
+});
+return us ? us.status : null;
+'''
+
+SCRIPT_DESCARREGAR = JS_GRAVAR_RESPOSTAS + '''
+return await prisma.$transaction(async (tx) => {
+  // Descarta respostas de simulados inexistentes ou já finalizados e de
+  // questões fora do simulado (o /answer não consulta o banco a cada
+  // resposta, então a validação final acontece aqui)
+  const simuladoIds = Array.from(new Set(params.respostas.map(r => r.usuario_simulado_id)));
+  const simulados = await tx.usuarioSimulado.findMany({
+    where: { id: { in: simuladoIds }, status: { not: "finalizado" } },
+    select: { id: true, usuarioId: true, simuladoId: true }
+  });
+  const vinculos = await tx.simuladoQuestao.findMany({
+    where: { simuladoId: { in: simulados.map(s => s.simuladoId) } },
+    select: { simuladoId: true, questaoId: true }
+  });
+
+  const porId = new Map(simulados.map(s => [s.id, s]));
+  const validos = new Set(vinculos.map(v => `${v.simuladoId}:${v.questaoId}`));
+
+  const aceitas = params.respostas.filter(r => {
+    const us = porId.get(r.usuario_simulado_id);
+    return us && validos.has(`${us.simuladoId}:${r.questao_id}`);
+  });
+
+  await gravarRespostas(tx, aceitas);
+
+  return {
+    gravadas: aceitas.map(r => ({ ...r, usuario_id: porId.get(r.usuario_simulado_id).usuarioId })),
+    descartadas: params.respostas.length - aceitas.length
+  };
+});
+'''
+
+# ============================================================================
+# BUFFER
+# ============================================================================
+
+class BufferRespostas:
+    """Respostas pendentes em memória + diário local para recuperação"""
+
+    def __init__(self, caminho: Path = RESPOSTAS_JOURNAL):
+        self._caminho = caminho
+        # usuario_simulado_id -> questao_id -> alternativa_marcada
+        self._pendentes: Dict[str, Dict[int, Optional[int]]] = defaultdict(dict)
+        # Uma única thread para o diário: anotações e compactações rodam na
+        # ordem em que foram pedidas pelo event loop, então a compactação
+        # nunca apaga uma anotação feita depois do retrato das pendentes
+        self._diario = ThreadPoolExecutor(max_workers=1, thread_name_prefix="diario")
+        # Simulados com respostas sendo gravadas (descarga ou /finish): sem
+        # chave única, duas gravações simultâneas duplicariam linhas
+        self._gravando: Set[str] = set()
+        self._mudou = asyncio.Condition()
+        # usuario_simulado_id -> status (LRU); só o /finish finaliza
+        self._status: "OrderedDict[str, str]" = OrderedDict()
+        self._tarefa: Optional[asyncio.Task] = None
+        self._lock_arquivo = None
+
+    # ------------------------------------------------------------------
+    # API usada pelos endpoints
+    # ------------------------------------------------------------------
+
+    async def registrar(self, usuario_simulado_id: str, questao_id: int,
+                        alternativa_marcada: Optional[int]):
+        """Anota a resposta no diário (durável) e deixa pendente em memória"""
+        entrada = {
+            "usuario_simulado_id": usuario_simulado_id,
+            "questao_id": questao_id,
+            "alternativa_marcada": alternativa_marcada,
+        }
+        self._pendentes[usuario_simulado_id][questao_id] = alternativa_marcada
+        await self._no_diario(self._anotar, [entrada])
+
+    def pendentes_do_simulado(self, usuario_simulado_id: str) -> List[Dict]:
+        """Respostas ainda não gravadas de um simulado (para o /finish)"""
+        return [
+            {"usuario_simulado_id": usuario_simulado_id, "questao_id": q, "alternativa_marcada": a}
+            for q, a in self._pendentes.get(usuario_simulado_id, {}).items()
+        ]
+
+    @asynccontextmanager
+    async def finalizacao(self, usuario_simulado_id: str) -> AsyncIterator[List[Dict]]:
+        """
+        Reserva o simulado para o /finish gravar suas pendentes
+
+        Espera só por uma gravação em andamento do MESMO simulado.
+
+        Yields:
+            Respostas pendentes do simulado (confirmar após gravar)
+        """
+        async with self._mudou:
+            await self._mudou.wait_for(lambda: usuario_simulado_id not in self._gravando)
+            self._gravando.add(usuario_simulado_id)
+        try:
+            yield self.pendentes_do_simulado(usuario_simulado_id)
+        finally:
+            await self._liberar({usuario_simulado_id})
+
+    async def status_do_simulado(self, usuario_simulado_id: str) -> Optional[str]:
+        """Status do simulado (None se não existe); consulta o banco uma vez"""
+        status = self._status.get(usuario_simulado_id)
+        if status is None:
+            status = await run_prisma_script(SCRIPT_STATUS, {"usuario_simulado_id": usuario_simulado_id})
+            if status is None:
+                return None
+            self._guardar_status(usuario_simulado_id, status)
+        self._status.move_to_end(usuario_simulado_id)
+        return status
+
+    def marcar_finalizado(self, usuario_simulado_id: str):
+        """Chamado pelo /finish: respostas seguintes são recusadas"""
+        self._guardar_status(usuario_simulado_id, SIMULADO_FINALIZADO)
+
+    async def confirmar(self, respostas: List[Dict]):
+        """Remove do buffer respostas já gravadas no banco e compacta o diário"""
+        for r in respostas:
+            questoes = self._pendentes.get(r["usuario_simulado_id"])
+            # Só remove se não houve nova marcação enquanto gravava
+            if questoes and questoes.get(r["questao_id"], ...) == r["alternativa_marcada"]:
+                del questoes[r["questao_id"]]
+                if not questoes:
+                    del self._pendentes[r["usuario_simulado_id"]]
+        await self._no_diario(self._compactar, self._todas_pendentes())
+
+    async def descarregar(self):
+        """Grava as respostas pendentes no banco (em lote)"""
+        # Simulados em finalização ficam de fora: o /finish grava os dele
+        async with self._mudou:
+            respostas = [r for r in self._todas_pendentes() if r["usuario_simulado_id"] not in self._gravando]
+            simulados = {r["usuario_simulado_id"] for r in respostas}
+            self._gravando |= simulados
+        if not respostas:
+            return
+
+        try:
+            result = await run_prisma_script(SCRIPT_DESCARREGAR, {"respostas": respostas})
+
+            # Descartadas também saem do buffer: nunca seriam aceitas
+            await self.confirmar(respostas)
+
+            vistas: Dict[str, List[int]] = defaultdict(list)
+            for r in result["gravadas"]:
+                vistas[r["usuario_id"]].append(r["questao_id"])
+            for usuario_id, questao_ids in vistas.items():
+                await em_thread(indice_vistas.marcar, usuario_id, questao_ids)
+
+            if result["descartadas"]:
+                logger.warning(f"⚠️ {result['descartadas']} respostas descartadas (simulado finalizado/inválido ou questão fora dele)")
+            logger.info(f"💾 {len(result['gravadas'])} respostas gravadas em lote")
+        finally:
+            await self._liberar(simulados)
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    async def iniciar(self):
+        """Recupera o diário e inicia a gravação periódica"""
+        self._travar_diario()
+        recuperadas = await self._no_diario(self._ler_diario)
+        for r in recuperadas:
+            self._pendentes[r["usuario_simulado_id"]][r["questao_id"]] = r["alternativa_marcada"]
+        if recuperadas:
+            logger.info(f"♻️ {len(recuperadas)} respostas recuperadas do diário")
+
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._laco())
+
+    async def encerrar(self):
+        """Para a gravação periódica e grava o que restou"""
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            await asyncio.gather(self._tarefa, return_exceptions=True)
+            self._tarefa = None
+        try:
+            await self.descarregar()
+        except Exception as e:
+            logger.error(f"❌ Respostas mantidas no diário para a próxima inicialização: {e}")
+        if self._lock_arquivo is not None:
+            self._lock_arquivo.close()
+            self._lock_arquivo = None
+
+    def _travar_diario(self):
+        """Garante um único processo dono do diário (ver docstring do módulo)"""
+        if fcntl is None or self._lock_arquivo is not None:
+            return
+        arquivo = open(self._caminho.with_name(self._caminho.name + ".lock"), "w")
+        try:
+            fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            arquivo.close()
+            logger.critical(f"🛑 Diário de respostas {self._caminho} em uso por outro processo")
+            raise RuntimeError(
+                f"Diário de respostas {self._caminho} já está em uso por outro processo. "
+                "O backend roda com UM worker: as respostas pendentes do /answer ficam "
+                "na memória do processo e o /finish de outro worker não as veria. "
+                "Use `uvicorn main:app` sem --workers (ou --workers 1); para uma "
+                "segunda instância, aponte RESPOSTAS_JOURNAL para outro arquivo e "
+                "garanta que cada simulado seja atendido sempre pela mesma instância."
+            )
+        self._lock_arquivo = arquivo
+
+    async def _laco(self):
+        while True:
+            await asyncio.sleep(RESPOSTAS_FLUSH_SECONDS)
+            try:
+                await self.descarregar()
+            except Exception as e:
+                # Continua no diário: nova tentativa no próximo ciclo
+                logger.error(f"❌ Erro ao gravar respostas pendentes: {e}")
+
+    async def _liberar(self, simulados: Set[str]):
+        async with self._mudou:
+            self._gravando -= simulados
+            self._mudou.notify_all()
+
+    def _guardar_status(self, usuario_simulado_id: str, status: str):
+        self._status[usuario_simulado_id] = status
+        self._status.move_to_end(usuario_simulado_id)
+        while len(self._status) > RESPOSTAS_STATUS_CACHE:
+            self._status.popitem(last=False)
+
+    async def _no_diario(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._diario, fn, *args)
+
+    def _todas_pendentes(self) -> List[Dict]:
+        return [
+            {"usuario_simulado_id": us, "questao_id": q, "alternativa_marcada": a}
+            for us, questoes in self._pendentes.items()
+            for q, a in questoes.items()
+        ]
+
+    # ------------------------------------------------------------------
+    # Diário (síncrono: roda na thread do diário)
+    # ------------------------------------------------------------------
+
+    def _anotar(self, entradas: List[Dict]):
+        linhas = "".join(json.dumps(e) + "\n" for e in entradas)
+        with open(self._caminho, "a", encoding="utf-8") as f:
+            f.write(linhas)
+            f.flush()
+            if RESPOSTAS_JOURNAL_FSYNC:
+                os.fsync(f.fileno())
+
+    def _ler_diario(self) -> List[Dict]:
+        if not self._caminho.exists():
+            return []
+        entradas = []
+        with open(self._caminho, encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    entradas.append(json.loads(linha))
+                except json.JSONDecodeError:
+                    # Última linha truncada por queda durante a escrita
+                    logger.warning("⚠️ Linha inválida ignorada no diário de respostas")
+        return entradas
+
+    def _compactar(self, pendentes: List[Dict]):
+        """Reescreve o diário só com o que falta gravar (troca atômica)"""
+        temporario = self._caminho.with_suffix(".tmp")
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(p) + "\n" for p in pendentes)
+            f.flush()
+            if RESPOSTAS_JOURNAL_FSYNC:
+                os.fsync(f.fileno())
+        os.replace(temporario, self._caminho)
+
+
+# Instância única do processo
+buffer_respostas = BufferRespostas()
@@ -0,0 +1,263 @@
+"""
+Cache em Camadas - Explicações geradas pelo Ollama (memória + disco)
+
+Cada explicação custa 10-90 s de geração. O cache antigo era um dict sem
+limite, varrido inteiro a cada /explicar para remover vencidos, e perdido a
+cada restart. Agora:
+
+1ª camada - memória (LRU)
+    - limitada por CACHE_MAX_ENTRADAS e CACHE_MAX_BYTES (o que vier antes)
+    - o menos usado sai primeiro
+    - expiração por heap de vencimentos: só os vencidos são visitados
+
+2ª camada - disco (SQLite, via pool_sqlite)
+    - valores comprimidos (zlib), sobrevive a restarts
+    - acerto no disco promove a entrada para a memória
+    - vencidos removidos por índice em expira_em, no máximo a cada
+      CACHE_LIMPEZA_SECONDS
+
+Contadores de acertos (por camada), faltas, despejos e expirações ficam em
+estatisticas() para o /cache/stats.
+
+Configuração:
+    CACHE_MAX_ENTRADAS   (padrão: 2000)
+    CACHE_MAX_BYTES      (padrão: 64 MB)
+    CACHE_DISCO          (padrão: true)
+    CACHE_DB             (padrão: explicacoes_cache.db ao lado deste arquivo)
+"""
+
+import heapq
+import logging
+import os
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from executores import em_thread
+from pool_sqlite import PoolSQLite
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURAÇÃO
+# ============================================================================
+
+CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "2000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_DISCO = os.getenv("CACHE_DISCO", "true").lower() == "true"
+CACHE_DB = Path(
+    os.getenv("CACHE_DB", Path(__file__).resolve().parent / "explicacoes_cache.db")
+)
+CACHE_LIMPEZA_SECONDS = 300
+
+# ============================================================================
+# DISCO
+# ============================================================================
+
+class CamadaDisco:
+    """Tabela chave -> valor comprimido (acesso síncrono: usar via em_thread)"""
+
+    def __init__(self, caminho: Path, tabela: str):
+        self.tabela = tabela
+        self._pool = PoolSQLite(caminho)
+        with self._pool.conexao() as conn, conn:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {tabela} (
+                    chave     TEXT PRIMARY KEY,
+                    valor     BLOB NOT NULL,
+                    expira_em REAL NOT NULL
+                )
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {tabela}_expira_em ON {tabela} (expira_em)")
+
+    def obter(self, chave: str) -> Optional[Tuple[str, float]]:
+        """(valor, expira_em) se existir e não estiver vencido"""
+        with self._pool.conexao() as conn:
+            linha = conn.execute(
+                f"SELECT valor, expira_em FROM {self.tabela} WHERE chave = ? AND expira_em > ?",
+                (chave, time.time())
+            ).fetchone()
+        if linha is None:
+            return None
+        return zlib.decompress(linha["valor"]).decode("utf-8"), linha["expira_em"]
+
+    def guardar(self, chave: str, valor: str, expira_em: float):
+        comprimido = zlib.compress(valor.encode("utf-8"), 6)
+        with self._pool.conexao() as conn, conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.tabela} (chave, valor, expira_em) VALUES (?, ?, ?)",
+                (chave, comprimido, expira_em)
+            )
+
+    def expirar(self) -> int:
+        with self._pool.conexao() as conn, conn:
+            return conn.execute(
+                f"DELETE FROM {self.tabela} WHERE expira_em <= ?", (time.time(),)
+            ).rowcount
+
+    def limpar(self):
+        with self._pool.conexao() as conn, conn:
+            conn.execute(f"DELETE FROM {self.tabela}")
+
+    def resumo(self) -> Dict:
+        with self._pool.conexao() as conn:
+            linha = conn.execute(
+                f"SELECT COUNT(*) AS entradas, TOTAL(length(valor)) AS bytes FROM {self.tabela}"
+            ).fetchone()
+        return {"entradas": linha["entradas"], "bytes_comprimidos": int(linha["bytes"])}
+
+    def fechar(self):
+        self._pool.fechar()
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class CacheCamadas:
+    """
+    Cache texto -> texto com TTL, memória LRU na frente do disco
+
+    A camada de memória só é tocada no event loop (sem lock); o disco roda
+    em em_thread.
+    """
+
+    def __init__(self, nome: str, ttl_segundos: float,
+                 max_entradas: int = CACHE_MAX_ENTRADAS,
+                 max_bytes: int = CACHE_MAX_BYTES,
+                 disco: bool = CACHE_DISCO,
+                 caminho: Path = CACHE_DB):
+        self.nome = nome
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+
+        # chave -> (valor, expira_em, bytes); ordem = uso (primeiro sai)
+        self._memoria: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self._bytes = 0
+        # (expira_em, chave): itens de chaves removidas/regravadas são
+        # descartados ao chegar no topo
+        self._vencimentos: List[Tuple[float, str]] = []
+
+        self._disco = CamadaDisco(caminho, nome) if disco else None
+        self._limpeza_disco_em = 0.0
+
+        self._contadores = {
+            "acertos_memoria": 0,
+            "acertos_disco": 0,
+            "faltas": 0,
+            "despejos": 0,
+            "expiradas": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._memoria)
+
+    # ------------------------------------------------------------------
+    # Memória
+    # ------------------------------------------------------------------
+
+    def _remover(self, chave: str):
+        _, _, tamanho = self._memoria.pop(chave)
+        self._bytes -= tamanho
+
+    def _expirar(self):
+        agora = time.time()
+        while self._vencimentos and self._vencimentos[0][0] <= agora:
+            expira_em, chave = heapq.heappop(self._vencimentos)
+            item = self._memoria.get(chave)
+            if item is not None and item[1] == expira_em:
+                self._remover(chave)
+                self._contadores["expiradas"] += 1
+
+        # Muitos itens órfãos (despejados/regravados): reconstrói o heap
+        if len(self._vencimentos) > 2 * len(self._memoria) + 64:
+            self._vencimentos = [(item[1], chave) for chave, item in self._memoria.items()]
+            heapq.heapify(self._vencimentos)
+
+    def _na_memoria(self, chave: str, valor: str, expira_em: float):
+        if chave in self._memoria:
+            self._remover(chave)
+        tamanho = len(valor.encode("utf-8"))
+        if tamanho > self.max_bytes:
+            return
+        self._memoria[chave] = (valor, expira_em, tamanho)
+        self._bytes += tamanho
+        heapq.heappush(self._vencimentos, (expira_em, chave))
+
+        while len(self._memoria) > self.max_entradas or self._bytes > self.max_bytes:
+            self._remover(next(iter(self._memoria)))
+            self._contadores["despejos"] += 1
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    async def obter(self, chave: str) -> Optional[str]:
+        """Valor da memória, senão do disco (promovido); None se faltar"""
+        self._expirar()
+
+        item = self._memoria.get(chave)
+        if item is not None:
+            self._memoria.move_to_end(chave)
+            self._contadores["acertos_memoria"] += 1
+            return item[0]
+
+        if self._disco is not None:
+            do_disco = await em_thread(self._disco.obter, chave)
+            if do_disco is not None:
+                valor, expira_em = do_disco
+                self._na_memoria(chave, valor, expira_em)
+                self._contadores["acertos_disco"] += 1
+                return valor
+
+        self._contadores["faltas"] += 1
+        return None
+
+    async def guardar(self, chave: str, valor: str):
+        """Grava nas duas camadas com o TTL do cache"""
+        self._expirar()
+        expira_em = time.time() + self.ttl_segundos
+        self._na_memoria(chave, valor, expira_em)
+
+        if self._disco is not None:
+            await em_thread(self._disco.guardar, chave, valor, expira_em)
+            if time.monotonic() - self._limpeza_disco_em > CACHE_LIMPEZA_SECONDS:
+                self._limpeza_disco_em = time.monotonic()
+                removidas = await em_thread(self._disco.expirar)
+                if removidas:
+                    logger.info(f"🗑️ Cache {self.nome}: {removidas} entradas vencidas removidas do disco")
+
+    async def limpar(self):
+        """Esvazia as duas camadas"""
+        self._memoria.clear()
+        self._vencimentos.clear()
+        self._bytes = 0
+        if self._disco is not None:
+            await em_thread(self._disco.limpar)
+
+    async def estatisticas(self) -> Dict:
+        """Tamanho das camadas e contadores desde o início do processo"""
+        self._expirar()
+        consultas = (
+            self._contadores["acertos_memoria"]
+            + self._contadores["acertos_disco"]
+            + self._contadores["faltas"]
+        )
+        acertos = self._contadores["acertos_memoria"] + self._contadores["acertos_disco"]
+        return {
+            "memoria": {
+                "entradas": len(self._memoria),
+                "bytes": self._bytes,
+                "max_entradas": self.max_entradas,
+                "max_bytes": self.max_bytes,
+            },
+            "disco": await em_thread(self._disco.resumo) if self._disco is not None else None,
+            **self._contadores,
+            "taxa_acerto": round(acertos / consultas, 4) if consultas else None,
+        }
+
+    def fechar(self):
+        if self._disco is not None:
+            self._disco.fechar()
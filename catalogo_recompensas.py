@@ -0,0 +1,123 @@
+"""
+Catálogo de Recompensas - Cache versionado da loja (/rewards/loja)
+
+A loja é a mesma para todos os usuários e quase nunca muda, mas cada
+requisição rodava reward.findMany no sidecar. Agora o processo mantém o
+catálogo pronto para envio:
+
+- corpo JSON já serializado (bytes), servido sem passar pelo Pydantic
+- versão = hash do conteúdo, usada como ETag forte
+- If-None-Match igual à versão -> 304 sem corpo
+
+Como a versão é derivada do conteúdo, recarregar um catálogo idêntico não
+muda o ETag: clientes e proxies continuam revalidando com 304.
+
+Configuração:
+    RECOMPENSAS_TTL_SECONDS      (padrão: 60 - releitura do catálogo)
+    RECOMPENSAS_MAX_AGE_SECONDS  (padrão: 60 - Cache-Control para clientes)
+
+Recarga:
+    - automática: a cada RECOMPENSAS_TTL_SECONDS relê o catálogo. As
+      recompensas são cadastradas fora deste backend (o resgate não altera
+      Reward), então é o TTL que limita o atraso de uma mudança na loja
+    - resgate recusado por recompensa inexistente ou indisponível: o
+      catálogo servido está desatualizado, e o /resgatar chama
+      catalogo_recompensas.invalidar() para relê-lo no próximo acesso
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+from prisma_bridge import run_prisma_script
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURAÇÃO
+# ============================================================================
+
+RECOMPENSAS_TTL_SECONDS = float(os.getenv("RECOMPENSAS_TTL_SECONDS", "60"))
+
+# Clientes/proxies podem reutilizar a resposta por até max-age; depois
+# revalidam com If-None-Match (304 sem corpo se nada mudou)
+CACHE_CONTROL = f"public, max-age={int(os.getenv('RECOMPENSAS_MAX_AGE_SECONDS', '60'))}, must-revalidate"
+
+SCRIPT_CATALOGO = '''
+const rewards = await prisma.reward.findMany({
+  orderBy: [{ custoFP: 'asc' }, { id: 'asc' }]
+});
+
+return rewards.map(r => ({
+  id: r.id,
+  titulo: r.titulo,
+  descricao: r.descricao,
+  custoFP: r.custoFP,
+  emoji: r.emoji,
+  categoria: r.categoria,
+  disponivel: r.disponivel
+}));
+'''
+
+# ============================================================================
+# CATÁLOGO
+# ============================================================================
+
+class VersaoCatalogo:
+    """Catálogo imutável pronto para resposta HTTP"""
+
+    def __init__(self, recompensas: List[Dict]):
+        self.recompensas = recompensas
+        self.corpo = json.dumps(
+            {"recompensas": recompensas}, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        self.etag = f'"{hashlib.sha256(self.corpo).hexdigest()[:32]}"'
+
+    def corresponde(self, if_none_match: Optional[str]) -> bool:
+        """True se o cliente já tem esta versão (comparação fraca, RFC 9110)"""
+        if not if_none_match:
+            return False
+        for etag in if_none_match.split(","):
+            etag = etag.strip()
+            if etag == "*" or etag.removeprefix("W/") == self.etag:
+                return True
+        return False
+
+
+class CatalogoRecompensas:
+    """Mantém a versão atual do catálogo e a recarrega periodicamente"""
+
+    def __init__(self):
+        self._versao: Optional[VersaoCatalogo] = None
+        self._lock = asyncio.Lock()
+        self._verificado_em = 0.0
+
+    def invalidar(self):
+        """Força releitura no próximo acesso"""
+        self._verificado_em = 0.0
+
+    async def obter(self) -> VersaoCatalogo:
+        """Versão atual (carrega ou recarrega se necessário)"""
+        versao = self._versao
+        if versao is not None and time.monotonic() - self._verificado_em < RECOMPENSAS_TTL_SECONDS:
+            return versao
+
+        async with self._lock:
+            # Outra requisição pode ter recarregado enquanto esperávamos
+            if self._versao is not None and time.monotonic() - self._verificado_em < RECOMPENSAS_TTL_SECONDS:
+                return self._versao
+
+            nova = VersaoCatalogo(await run_prisma_script(SCRIPT_CATALOGO))
+            if self._versao is None or self._versao.etag != nova.etag:
+                logger.info(f"🏪 Catálogo de recompensas carregado: {len(nova.recompensas)} itens, ETag {nova.etag}")
+                self._versao = nova
+            self._verificado_em = time.monotonic()
+            return self._versao
+
+
+# Instância única do processo
+catalogo_recompensas = CatalogoRecompensas()
@@ -0,0 +1,101 @@
+"""
+Cliente Ollama - Um pool HTTP keep-alive por processo
+
+Cada chamada ao Ollama (e cada retry, e cada /health) criava um
+httpx.AsyncClient novo: nova conexão TCP, novo pool, tudo descartado logo
+depois. Agora o processo tem UM cliente, criado no startup e fechado no
+shutdown, com conexões reaproveitadas entre requisições.
+
+Uso:
+    await cliente_ollama.iniciar()            # startup
+    cliente = cliente_ollama.cliente          # httpx.AsyncClient (base_url = OLLAMA_URL)
+    await cliente.post("/api/generate", json=...)
+    async for trecho in cliente_ollama.gerar_tokens(modelo, prompt, opcoes):
+        ...                                   # geração com "stream": true
+    await cliente_ollama.encerrar()           # shutdown
+
+Timeouts por fase (httpx.Timeout): conexão, leitura (a geração inteira sem
+streaming, então longa), escrita e espera por conexão livre no pool.
+
+Configuração: ver config_ollama.py (compartilhada com enem_ia_layer4)
+"""
+
+import json
+import logging
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from config_ollama import (
+    OLLAMA_KEEPALIVE_CONEXOES,
+    OLLAMA_MAX_CONEXOES,
+    OLLAMA_URL,
+    TIMEOUT_SONDA,
+    limites,
+    timeouts,
+)
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CLIENTE
+# ============================================================================
+
+class ClienteOllama:
+    """Ciclo de vida do httpx.AsyncClient compartilhado"""
+
+    def __init__(self):
+        self._cliente: Optional[httpx.AsyncClient] = None
+
+    def _criar(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(base_url=OLLAMA_URL, timeout=timeouts(), limits=limites())
+
+    async def iniciar(self):
+        """Cria o pool (startup)"""
+        if self._cliente is None:
+            self._cliente = self._criar()
+            logger.info(
+                f"🔌 Pool HTTP do Ollama: até {OLLAMA_MAX_CONEXOES} conexões "
+                f"({OLLAMA_KEEPALIVE_CONEXOES} keep-alive)"
+            )
+
+    async def encerrar(self):
+        """Fecha as conexões (shutdown)"""
+        if self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
+            logger.info("🔌 Pool HTTP do Ollama encerrado")
+
+    @property
+    def cliente(self) -> httpx.AsyncClient:
+        """Cliente compartilhado (criado sob demanda se o startup não rodou)"""
+        if self._cliente is None:
+            self._cliente = self._criar()
+        return self._cliente
+
+    async def gerar_tokens(self, modelo: str, prompt: str,
+                           opcoes: Optional[Dict] = None) -> AsyncIterator[str]:
+        """
+        Trechos de texto conforme o Ollama gera (/api/generate com stream)
+
+        Sair do laço antes do fim (ou ser cancelado, ex: cliente HTTP
+        desconectou) fecha a resposta e a conexão: o Ollama interrompe a
+        geração.
+        """
+        corpo = {"model": modelo, "prompt": prompt, "stream": True, "options": opcoes or {}}
+        async with self.cliente.stream("POST", "/api/generate", json=corpo) as resposta:
+            resposta.raise_for_status()
+            async for linha in resposta.aiter_lines():
+                if not linha:
+                    continue
+                dados = json.loads(linha)
+                if dados.get("error"):
+                    raise RuntimeError(f"Ollama: {dados['error']}")
+                if dados.get("response"):
+                    yield dados["response"]
+                if dados.get("done"):
+                    return
+
+
+# Instância única do processo
+cliente_ollama = ClienteOllama()
@@ -0,0 +1,63 @@
+"""
+Configuração do Ollama - Servidor, pool e timeouts compartilhados
+
+Um lugar só para os clientes HTTP do Ollama: cliente_ollama.py (o
+httpx.AsyncClient do backend) e enem_ia_layer4/ai_engine.py (httpx.Client
+síncrono da camada 4) leem daqui, então os dois usam o mesmo servidor, os
+mesmos limites de conexão e os mesmos timeouts.
+
+Configuração:
+    OLLAMA_URL                  (padrão: http://127.0.0.1:11434)
+    OLLAMA_MAX_CONEXOES         (padrão: 10)
+    OLLAMA_KEEPALIVE_CONEXOES   (padrão: 5 - conexões ociosas mantidas)
+    OLLAMA_KEEPALIVE_SECONDS    (padrão: 60 - tempo ocioso até fechar)
+    OLLAMA_CONNECT_TIMEOUT      (padrão: 5)
+    TIMEOUT_SECONDS             (padrão: 90 - leitura)
+    OLLAMA_WRITE_TIMEOUT        (padrão: 10)
+    OLLAMA_POOL_TIMEOUT         (padrão: 30)
+"""
+
+import os
+from typing import Optional
+
+import httpx
+
+# ============================================================================
+# CONFIGURAÇÃO
+# ============================================================================
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434")
+
+OLLAMA_MAX_CONEXOES = int(os.getenv("OLLAMA_MAX_CONEXOES", "10"))
+OLLAMA_KEEPALIVE_CONEXOES = int(os.getenv("OLLAMA_KEEPALIVE_CONEXOES", "5"))
+OLLAMA_KEEPALIVE_SECONDS = float(os.getenv("OLLAMA_KEEPALIVE_SECONDS", "60"))
+
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_READ_TIMEOUT = float(os.getenv("TIMEOUT_SECONDS", "90"))
+OLLAMA_WRITE_TIMEOUT = float(os.getenv("OLLAMA_WRITE_TIMEOUT", "10"))
+OLLAMA_POOL_TIMEOUT = float(os.getenv("OLLAMA_POOL_TIMEOUT", "30"))
+
+# Sondas rápidas (/api/tags): não esperam uma geração inteira
+TIMEOUT_SONDA = httpx.Timeout(5.0)
+
+# ============================================================================
+# POOL
+# ============================================================================
+
+def limites() -> httpx.Limits:
+    """Limites do pool de conexões (httpx.Client ou AsyncClient)"""
+    return httpx.Limits(
+        max_connections=OLLAMA_MAX_CONEXOES,
+        max_keepalive_connections=OLLAMA_KEEPALIVE_CONEXOES,
+        keepalive_expiry=OLLAMA_KEEPALIVE_SECONDS,
+    )
+
+
+def timeouts(leitura: Optional[float] = None) -> httpx.Timeout:
+    """Timeouts por fase; `leitura` substitui OLLAMA_READ_TIMEOUT"""
+    return httpx.Timeout(
+        connect=OLLAMA_CONNECT_TIMEOUT,
+        read=OLLAMA_READ_TIMEOUT if leitura is None else leitura,
+        write=OLLAMA_WRITE_TIMEOUT,
+        pool=OLLAMA_POOL_TIMEOUT,
+    )
@@ -0,0 +1,73 @@
+"""
+Correção em Lote - Núcleo vetorizado do /responder/lote (backend_proxy.py)
+
+Módulo leve de propósito: `corrigir_bloco` roda no pool de processos
+(em_processo) e é enviado por referência ao módulo. Se morasse em
+backend_proxy, cada processo do pool importaria o app inteiro (FastAPI,
+armazém de resultados) só para corrigir uma matriz.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import tri
+
+
+def classificar_desempenho(porcentagem: float) -> str:
+    """Classifica o desempenho com base na porcentagem de acertos"""
+    if porcentagem >= 90:
+        return "🏆 Excelente"
+    elif porcentagem >= 75:
+        return "🌟 Muito Bom"
+    elif porcentagem >= 60:
+        return "👍 Bom"
+    elif porcentagem >= 50:
+        return "📚 Regular"
+    else:
+        return "💪 Precisa Melhorar"
+
+
+def _letras(texto: str) -> np.ndarray:
+    """Letras como bytes (uint8) para comparação vetorizada"""
+    return np.frombuffer(texto.encode("ascii"), dtype=np.uint8)
+
+
+def corrigir_bloco(alunos: List[str], marcadas: List[str], gabaritos: List[Optional[str]],
+                   gabarito_comum: str, ids: List[int], itens: List[Dict]) -> List[Dict]:
+    """
+    Corrige um bloco de entregas (roda em outro processo via em_processo)
+
+    O bloco vira uma matriz (alunos × questões) de letras comparada de uma
+    vez com o gabarito (comum a todos ou uma linha por entrega), e as notas
+    TRI saem numa única chamada a tri.pontuar_lote.
+    """
+    total = len(ids)
+    ids = np.array(ids)
+    gabarito = _letras(gabarito_comum)
+
+    matriz = _letras("".join(marcadas)).reshape(len(alunos), total)
+    if any(gabaritos):
+        gabarito = np.tile(gabarito, (len(alunos), 1))
+        for linha, proprio in enumerate(gabaritos):
+            if proprio:
+                gabarito[linha] = _letras(proprio)
+
+    # Em branco nunca é igual a uma letra do gabarito: conta como erro
+    acertou = matriz == gabarito
+    acertos = acertou.sum(axis=1)
+    porcentagens = np.round(acertos * 100 / total, 2)
+    notas = tri.pontuar_lote(acertou.astype(float), itens)["nota"]
+
+    return [
+        {
+            "aluno_id": aluno_id,
+            "acertos": int(acertos[linha]),
+            "total": total,
+            "porcentagem": float(porcentagens[linha]),
+            "nota": float(notas[linha]),
+            "desempenho": classificar_desempenho(porcentagens[linha]),
+            "erradas": ids[~acertou[linha]].tolist(),
+        }
+        for linha, aluno_id in enumerate(alunos)
+    ]
@@ -1,33 +1,45 @@
-
 import os
-import json
-import http.client
+import sys
+from pathlib import Path
 from typing import Dict, Optional, Any
 
-# Tenta usar Ollama local (http://localhost:11434). Se não estiver disponível, cai em fallback determinístico.
-OLLAMA_HOST = os.getenv("OLLAMA_HOST", "127.0.0.1")
-OLLAMA_PORT = int(os.getenv("OLLAMA_PORT", "11434"))
+import httpx
+
+# Servidor, pool e timeouts do Ollama vêm de config_ollama.py, na raiz do
+# repositório (os mesmos do backend principal)
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config_ollama import OLLAMA_URL, limites, timeouts  # noqa: E402
+
+# Tenta usar Ollama local (OLLAMA_URL). Se não estiver disponível, cai em fallback determinístico.
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
 
+# Acima disto a geração desiste e usa o template (endpoints síncronos)
+IA_LAYER4_TIMEOUT = float(os.getenv("IA_LAYER4_TIMEOUT", "10"))
+
+# Cliente keep-alive: as conexões HTTP com o Ollama são reaproveitadas entre
+# gerações (httpx.Client é seguro entre as threads dos endpoints síncronos)
+_cliente_ollama = httpx.Client(base_url=OLLAMA_URL, timeout=timeouts(IA_LAYER4_TIMEOUT), limits=limites())
+
+
+def fechar_pool_ollama():
+    """Fecha as conexões ociosas (shutdown do app)."""
+    _cliente_ollama.close()
+
+
 def _ollama_generate(prompt: str, temperature: float = 0.3, max_tokens: int = 512) -> Optional[str]:
     try:
-        conn = http.client.HTTPConnection(OLLAMA_HOST, OLLAMA_PORT, timeout=10)
-        payload = json.dumps({
+        payload = {
             "model": OLLAMA_MODEL,
             "prompt": prompt,
             "stream": False,
             "options": {
                 "temperature": temperature
             }
-        })
-        headers = {'Content-Type': 'application/json'}
-        conn.request("POST", "/api/generate", payload, headers)
-        res = conn.getresponse()
-        if res.status != 200:
+        }
+        res = _cliente_ollama.post("/api/generate", json=payload)
+        if res.status_code != 200:
             return None
-        data = res.read().decode("utf-8")
-        obj = json.loads(data)
-        return obj.get("response")
+        return res.json().get("response")
     except Exception:
         return None
 
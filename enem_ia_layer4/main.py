@@ -6,7 +6,7 @@ from typing import List, Optional, Dict, Any
 from uuid import uuid4
 from datetime import datetime
 
-from ai_engine import explain_with_ai, simplify_explanation_with_ai, build_study_plan
+from ai_engine import explain_with_ai, simplify_explanation_with_ai, build_study_plan, fechar_pool_ollama
 
 app = FastAPI(title="ENEM-IA • Camada 4 – IA Integrada", version="1.0.0")
 
@@ -157,3 +157,7 @@ def plano_estudo(data: PlanoInput):
 @app.get("/health")
 def health():
     return {"ok": True, "time": datetime.utcnow().isoformat()}
+
+@app.on_event("shutdown")
+def shutdown():
+    fechar_pool_ollama()
@@ -0,0 +1,87 @@
+"""
+Executores - Modelo de execução para trabalho bloqueante
+
+Os handlers são `async def`: qualquer chamada bloqueante feita diretamente
+neles congela TODAS as requisições em andamento no worker. Regra do projeto:
+
+- I/O assíncrono nativo (sidecar Prisma, httpx)     -> await direto
+- I/O síncrono (sqlite3, http.client, arquivos)     -> await em_thread(...)
+- bcrypt (CPU, mas libera o GIL)                    -> await em_thread_hash(...)
+- CPU pesado em Python puro/NumPy (lotes grandes)   -> await em_processo(...)
+
+Tamanhos configuráveis por variável de ambiente:
+    EXECUTOR_IO_THREADS      (padrão: min(32, CPUs + 4))
+    EXECUTOR_HASH_THREADS    (padrão: CPUs)
+    EXECUTOR_CPU_PROCESSOS   (padrão: CPUs)
+"""
+
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURAÇÃO
+# ============================================================================
+
+_CPUS = os.cpu_count() or 1
+
+IO_THREADS = int(os.getenv("EXECUTOR_IO_THREADS", str(min(32, _CPUS + 4))))
+HASH_THREADS = int(os.getenv("EXECUTOR_HASH_THREADS", str(_CPUS)))
+CPU_PROCESSOS = int(os.getenv("EXECUTOR_CPU_PROCESSOS", str(_CPUS)))
+
+# ============================================================================
+# POOLS
+# ============================================================================
+
+# bcrypt tem pool próprio: um pico de logins não pode esgotar as threads de I/O
+_pool_io = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="io")
+_pool_hash = ThreadPoolExecutor(max_workers=HASH_THREADS, thread_name_prefix="hash")
+
+# Criado sob demanda: subir processos só compensa quando há trabalho de CPU
+_pool_cpu: Optional[ProcessPoolExecutor] = None
+
+
+def _obter_pool_cpu() -> ProcessPoolExecutor:
+    global _pool_cpu
+    if _pool_cpu is None:
+        _pool_cpu = ProcessPoolExecutor(max_workers=CPU_PROCESSOS)
+        logger.info(f"⚙️ Pool de processos criado ({CPU_PROCESSOS} workers)")
+    return _pool_cpu
+
+
+async def em_thread(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Executa função de I/O síncrono no pool de threads de I/O"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool_io, functools.partial(fn, *args, **kwargs))
+
+
+async def em_thread_hash(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Executa hashing de senha (bcrypt) no pool dedicado"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool_hash, functools.partial(fn, *args, **kwargs))
+
+
+async def em_processo(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Executa trabalho de CPU em outro processo
+
+    `fn` e os argumentos precisam ser serializáveis (pickle): use funções
+    definidas no nível do módulo.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_obter_pool_cpu(), functools.partial(fn, *args, **kwargs))
+
+
+def encerrar_executores():
+    """Libera threads e processos (chamar no shutdown da aplicação)"""
+    global _pool_cpu
+    _pool_io.shutdown(wait=False, cancel_futures=True)
+    _pool_hash.shutdown(wait=False, cancel_futures=True)
+    if _pool_cpu is not None:
+        _pool_cpu.shutdown(wait=False, cancel_futures=True)
+        _pool_cpu = None
@@ -1,6 +1,7 @@
 from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field, validator
 from typing import Optional, Dict, List
 from datetime import datetime, timedelta
@@ -12,6 +13,12 @@ import logging
 import hashlib
 import asyncio
 
+from cache_camadas import CacheCamadas
+from cliente_ollama import TIMEOUT_SONDA, cliente_ollama
+from fila_ollama import Prioridade, agendador_ollama
+from streaming_sse import CABECALHOS_SSE, transmitir_geracao
+from voo_unico import VooUnico
+
 # ============================================================================
 # CONFIGURAÇÃO DE LOGGING
 # ============================================================================
@@ -33,6 +40,12 @@ MAX_RETRIES = int(os.getenv("MAX_RETRIES", "2"))
 CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
 CACHE_TTL_HOURS = int(os.getenv("CACHE_TTL_HOURS", "24"))
 
+# Parâmetros de geração (com e sem streaming)
+OPCOES_OLLAMA = {
+    "temperature": 0.7,
+    "top_p": 0.9,
+}
+
 # ============================================================================
 # INICIALIZAÇÃO DA APP
 # ============================================================================
@@ -57,8 +70,11 @@ app.add_middleware(
 # SISTEMA DE CACHE E RATE LIMITING
 # ============================================================================
 
-# Cache simples em memória (em produção, use Redis)
-cache_explicacoes: Dict[str, Dict] = {}
+# Cache de explicações: memória LRU limitada + disco comprimido (ver cache_camadas.py)
+cache_explicacoes = CacheCamadas("explicacoes", CACHE_TTL_HOURS * 3600)
+
+# Pedidos idênticos simultâneos compartilham uma única geração no Ollama
+voo_explicacoes = VooUnico("explicar")
 
 # Rate limiting simples
 rate_limit_store: Dict[str, List[datetime]] = defaultdict(list)
@@ -66,20 +82,6 @@ RATE_LIMIT_MAX = 10  # requisições
 RATE_LIMIT_WINDOW = 60  # segundos
 
 
-def limpar_cache_expirado():
-    """Remove entradas expiradas do cache"""
-    agora = datetime.now()
-    keys_para_remover = []
-
-    for key, valor in cache_explicacoes.items():
-        if agora > valor["expira_em"]:
-            keys_para_remover.append(key)
-
-    for key in keys_para_remover:
-        del cache_explicacoes[key]
-        logger.info(f"🗑️ Cache expirado removido: {key[:8]}...")
-
-
 def gerar_cache_key(questao_id: int, resposta: str, contexto: Optional[str]) -> str:
     """Gera chave única para cache baseada nos parâmetros"""
     dados = f"{questao_id}:{resposta}:{contexto or ''}"
@@ -143,6 +145,7 @@ class ExplicacaoResponse(BaseModel):
     explicacao: str
     questao_id: int
     cached: bool = False
+    coalescido: bool = False
     tempo_processamento: float
     modelo_usado: str
     timestamp: str
@@ -150,6 +153,17 @@ class ExplicacaoResponse(BaseModel):
     nivel_confianca: Optional[str] = None
 
 
+# Pré-geração: questões por pedido
+PREGERAR_MAX = 50
+
+
+class PregerarReq(BaseModel):
+    questoes: List[ExplicarReq] = Field(
+        ..., min_items=1, max_items=PREGERAR_MAX,
+        description="Questões a explicar de antemão (ex: simulado recém-publicado)"
+    )
+
+
 class HealthResponse(BaseModel):
     status: str
     ollama_disponivel: bool
@@ -218,9 +232,8 @@ class ReexplicacaoResponse(BaseModel):
 async def verificar_ollama_disponivel() -> bool:
     """Verifica se o Ollama está acessível"""
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(f"{OLLAMA_URL}/api/tags")
-            return response.status_code == 200
+        response = await cliente_ollama.cliente.get("/api/tags", timeout=TIMEOUT_SONDA)
+        return response.status_code == 200
     except Exception as e:
         logger.error(f"Ollama não disponível: {str(e)}")
         return False
@@ -326,10 +339,15 @@ Gerar uma explicação COMPLETA, DIDÁTICA e MOTIVADORA que ajude o aluno a:
 
 async def chamar_ollama_com_retry(
     prompt: str,
-    max_tentativas: int = MAX_RETRIES
+    max_tentativas: int = MAX_RETRIES,
+    prioridade: Prioridade = Prioridade.INTERATIVA
 ) -> str:
     """
     Chama Ollama com sistema de retry em caso de falha
+
+    Cada tentativa passa pela fila do Ollama (ver fila_ollama.py): com o
+    modelo saturado, a recusa (429/503 + Retry-After) sai na hora.
+    Timeout não é repetido - só somaria carga a um modelo já saturado.
     """
     ultima_excecao = None
 
@@ -337,20 +355,19 @@ async def chamar_ollama_com_retry(
         try:
             logger.info(f"🤖 Tentativa {tentativa + 1}/{max_tentativas} - Chamando Ollama")
 
-            async with httpx.AsyncClient(timeout=TIMEOUT_SECONDS) as client:
-                response = await client.post(
-                    f"{OLLAMA_URL}/api/generate",
+            # Uma vaga no Ollama + pool keep-alive compartilhado
+            async with agendador_ollama.vaga(prioridade):
+                response = await cliente_ollama.cliente.post(
+                    "/api/generate",
                     json={
                         "model": OLLAMA_MODEL,
                         "prompt": prompt,
                         "stream": False,
-                        "options": {
-                            "temperature": 0.7,
-                            "top_p": 0.9,
-                        }
+                        "options": OPCOES_OLLAMA
                     }
                 )
-
+                # Dentro da vaga: erro HTTP ou resposta vazia não entra na
+                # média de tempo das gerações
                 response.raise_for_status()
                 data = response.json()
 
@@ -360,15 +377,17 @@ async def chamar_ollama_com_retry(
                 if not texto or len(texto.strip()) < 50:
                     raise ValueError("Resposta muito curta ou vazia da IA")
 
-                logger.info(f"✅ Ollama respondeu com sucesso ({len(texto)} chars)")
-                return texto.strip()
+            logger.info(f"✅ Ollama respondeu com sucesso ({len(texto)} chars)")
+            return texto.strip()
+
+        except HTTPException:
+            # Recusado pela fila do Ollama
+            raise
 
         except httpx.TimeoutException as e:
             ultima_excecao = e
             logger.warning(f"⏱️ Timeout na tentativa {tentativa + 1}")
-            if tentativa < max_tentativas - 1:
-                await asyncio.sleep(2)
-                continue
+            break
 
         except httpx.HTTPStatusError as e:
             ultima_excecao = e
@@ -385,10 +404,51 @@ async def chamar_ollama_com_retry(
                 continue
 
     # Se chegou aqui, todas tentativas falharam
-    erro_msg = f"Falha após {max_tentativas} tentativas. Último erro: {str(ultima_excecao)}"
+    erro_msg = f"Falha após {tentativa + 1} tentativa(s). Último erro: {str(ultima_excecao)}"
     logger.error(f"💥 {erro_msg}")
     raise HTTPException(status_code=503, detail=erro_msg)
 
+
+async def gerar_tokens_na_fila(prompt: str, prioridade: Prioridade = Prioridade.INTERATIVA):
+    """Trechos do Ollama (streaming) ocupando uma vaga da fila até o fim"""
+    trechos = cliente_ollama.gerar_tokens(OLLAMA_MODEL, prompt, OPCOES_OLLAMA)
+    try:
+        async with agendador_ollama.vaga(prioridade):
+            async for trecho in trechos:
+                yield trecho
+    finally:
+        await trechos.aclose()
+
+
+async def pregerar_explicacoes(questoes: List[ExplicarReq]):
+    """
+    Gera e guarda no cache, uma por vez e na prioridade FUNDO: nunca passa
+    na frente de um aluno esperando. Para na primeira recusa da fila.
+    """
+    geradas = 0
+    for req in questoes:
+        cache_key = gerar_cache_key(req.questao_id, req.resposta_usuario, req.contexto_adicional)
+        if await cache_explicacoes.obter(cache_key) is not None:
+            continue
+
+        async def gerar(req: ExplicarReq = req, cache_key: str = cache_key) -> str:
+            explicacao = await chamar_ollama_com_retry(
+                construir_prompt_detalhado(req), prioridade=Prioridade.FUNDO
+            )
+            await cache_explicacoes.guardar(cache_key, explicacao)
+            return explicacao
+
+        try:
+            await voo_explicacoes.executar(cache_key, gerar)
+            geradas += 1
+        except HTTPException as e:
+            logger.warning(f"🚧 Pré-geração interrompida: {e.detail}")
+            break
+        except Exception as e:
+            logger.error(f"❌ Pré-geração da questão #{req.questao_id} falhou: {str(e)}")
+
+    logger.info(f"📚 Pré-geração concluída: {geradas}/{len(questoes)} explicações novas no cache")
+
 # ============================================================================
 # FUNÇÕES AUXILIARES - REEXPLICAÇÃO
 # ============================================================================
@@ -615,7 +675,10 @@ async def root():
         "status": "online",
         "endpoints": {
             "explicar": "/explicar (POST)",
+            "explicar_stream": "/explicar/stream (POST, SSE)",
+            "explicar_pregerar": "/explicar/pregerar (POST, segundo plano)",
             "reexplicar": "/reexplicar (POST)",
+            "reexplicar_stream": "/reexplicar/stream (POST, SSE)",
             "reexplicar_reset": "/reexplicar/reset/{questao_id} (DELETE)",
             "reexplicar_stats": "/reexplicar/stats (GET)",
             "health": "/health (GET)",
@@ -642,14 +705,14 @@ async def health_check():
 
 
 @app.get("/cache/stats")
-async def cache_stats(background_tasks: BackgroundTasks):
-    """Estatísticas do cache"""
-    background_tasks.add_task(limpar_cache_expirado)
-
+async def cache_stats():
+    """Estatísticas do cache (camadas, acertos, faltas, despejos)"""
     return {
         "cache_enabled": CACHE_ENABLED,
-        "total_entries": len(cache_explicacoes),
         "ttl_hours": CACHE_TTL_HOURS,
+        **await cache_explicacoes.estatisticas(),
+        "coalescencia": voo_explicacoes.estatisticas(),
+        "fila_ollama": agendador_ollama.estatisticas(),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -657,7 +720,7 @@ async def cache_stats(background_tasks: BackgroundTasks):
 @app.delete("/cache/clear")
 async def limpar_cache():
     """Limpa todo o cache (útil para desenvolvimento)"""
-    cache_explicacoes.clear()
+    await cache_explicacoes.limpar()
     logger.info("🗑️ Cache limpo manualmente")
     return {"message": "Cache limpo com sucesso", "timestamp": datetime.now().isoformat()}
 
@@ -665,8 +728,7 @@ async def limpar_cache():
 @app.post("/explicar", response_model=ExplicacaoResponse)
 async def explicar(
     req: ExplicarReq,
-    request: Request,
-    background_tasks: BackgroundTasks
+    request: Request
 ):
     """
     Gera explicação pedagógica detalhada e personalizada para uma questão do ENEM.
@@ -684,9 +746,6 @@ async def explicar(
 
     logger.info(f"📨 Nova requisição de explicação - Questão #{req.questao_id} - IP: {ip_cliente}")
 
-    # Limpar cache expirado em background
-    background_tasks.add_task(limpar_cache_expirado)
-
     # Verificar cache
     cache_key = gerar_cache_key(
         req.questao_id,
@@ -694,25 +753,24 @@ async def explicar(
         req.contexto_adicional
     )
 
-    if CACHE_ENABLED and cache_key in cache_explicacoes:
-        cache_entry = cache_explicacoes[cache_key]
-        if datetime.now() < cache_entry["expira_em"]:
-            tempo_processamento = (datetime.now() - inicio).total_seconds()
-            logger.info(f"💾 Cache HIT para questão #{req.questao_id}")
-
-            return ExplicacaoResponse(
-                ok=True,
-                explicacao=cache_entry["explicacao"],
-                questao_id=req.questao_id,
-                cached=True,
-                tempo_processamento=tempo_processamento,
-                modelo_usado=OLLAMA_MODEL,
-                timestamp=datetime.now().isoformat(),
-                resposta_era_correta=(
-                    req.resposta_usuario == req.resposta_correta
-                    if req.resposta_correta else None
-                )
+    explicacao_cache = await cache_explicacoes.obter(cache_key) if CACHE_ENABLED else None
+    if explicacao_cache is not None:
+        tempo_processamento = (datetime.now() - inicio).total_seconds()
+        logger.info(f"💾 Cache HIT para questão #{req.questao_id}")
+
+        return ExplicacaoResponse(
+            ok=True,
+            explicacao=explicacao_cache,
+            questao_id=req.questao_id,
+            cached=True,
+            tempo_processamento=tempo_processamento,
+            modelo_usado=OLLAMA_MODEL,
+            timestamp=datetime.now().isoformat(),
+            resposta_era_correta=(
+                req.resposta_usuario == req.resposta_correta
+                if req.resposta_correta else None
             )
+        )
 
     # Cache miss - gerar nova explicação
     logger.info(f"🔄 Cache MISS - Gerando nova explicação")
@@ -721,21 +779,22 @@ async def explicar(
         # Construir prompt
         prompt = construir_prompt_detalhado(req)
 
-        # Chamar Ollama
-        explicacao = await chamar_ollama_com_retry(prompt)
+        async def gerar() -> str:
+            # Chamar Ollama
+            explicacao = await chamar_ollama_com_retry(prompt)
+
+            # Salvar no cache se habilitado
+            if CACHE_ENABLED:
+                await cache_explicacoes.guardar(cache_key, explicacao)
+                logger.info(f"💾 Explicação salva no cache")
+            return explicacao
+
+        # Uma geração por chave: quem chega durante ela aguarda o mesmo resultado
+        explicacao, coalescido = await voo_explicacoes.executar(cache_key, gerar)
 
         # Calcular tempo de processamento
         tempo_processamento = (datetime.now() - inicio).total_seconds()
 
-        # Salvar no cache se habilitado
-        if CACHE_ENABLED:
-            cache_explicacoes[cache_key] = {
-                "explicacao": explicacao,
-                "expira_em": datetime.now() + timedelta(hours=CACHE_TTL_HOURS),
-                "criado_em": datetime.now().isoformat()
-            }
-            logger.info(f"💾 Explicação salva no cache")
-
         logger.info(f"✅ Explicação gerada com sucesso em {tempo_processamento:.2f}s")
 
         return ExplicacaoResponse(
@@ -743,6 +802,7 @@ async def explicar(
             explicacao=explicacao,
             questao_id=req.questao_id,
             cached=False,
+            coalescido=coalescido,
             tempo_processamento=tempo_processamento,
             modelo_usado=OLLAMA_MODEL,
             timestamp=datetime.now().isoformat(),
@@ -762,21 +822,119 @@ async def explicar(
             detail=f"Erro ao gerar explicação: {str(e)}"
         )
 
-# ============================================================================
-# ENDPOINTS DE REEXPLICAÇÃO
-# ============================================================================
+@app.post("/explicar/stream")
+async def explicar_stream(req: ExplicarReq, request: Request):
+    """
+    Mesma explicação do /explicar, transmitida por Server-Sent Events
+    conforme o Ollama gera (primeiras palavras em menos de 1 s).
 
+    Eventos: `inicio`, `token` (um por trecho), `fim` ou `erro`
+    (ver streaming_sse.py). Ao concluir, a explicação vai para o cache.
+    """
+    ip_cliente = request.client.host if request.client else "unknown"
 
-@app.post("/reexplicar", response_model=ReexplicacaoResponse)
-async def reexplicar(
-    req: ReexplicarReq,
+    # Verificar rate limit
+    if not verificar_rate_limit(ip_cliente):
+        logger.warning(f"⚠️ Rate limit excedido para IP: {ip_cliente}")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Limite de {RATE_LIMIT_MAX} requisições por {RATE_LIMIT_WINDOW}s excedido. Aguarde um momento."
+        )
+
+    logger.info(f"📨 Nova explicação em streaming - Questão #{req.questao_id} - IP: {ip_cliente}")
+
+    cache_key = gerar_cache_key(
+        req.questao_id,
+        req.resposta_usuario,
+        req.contexto_adicional
+    )
+    resposta_era_correta = (
+        req.resposta_usuario == req.resposta_correta
+        if req.resposta_correta else None
+    )
+    explicacao_cache = await cache_explicacoes.obter(cache_key) if CACHE_ENABLED else None
+
+    async def do_cache():
+        # Cache HIT: o texto inteiro num único trecho
+        yield explicacao_cache
+
+    async def ao_concluir(explicacao: str) -> Dict:
+        if explicacao_cache is None and CACHE_ENABLED and len(explicacao) >= 50:
+            await cache_explicacoes.guardar(cache_key, explicacao)
+            logger.info(f"💾 Explicação (streaming) salva no cache")
+        return {
+            "ok": True,
+            "questao_id": req.questao_id,
+            "cached": explicacao_cache is not None,
+            "resposta_era_correta": resposta_era_correta,
+            "timestamp": datetime.now().isoformat()
+        }
+
+    if explicacao_cache is not None:
+        logger.info(f"💾 Cache HIT para questão #{req.questao_id}")
+        trechos = do_cache()
+    else:
+        # Recusa (429/503) antes de abrir o stream
+        agendador_ollama.admitir(Prioridade.INTERATIVA)
+        trechos = gerar_tokens_na_fila(construir_prompt_detalhado(req))
+
+    return StreamingResponse(
+        transmitir_geracao(
+            trechos,
+            {"questao_id": req.questao_id, "cached": explicacao_cache is not None, "modelo_usado": OLLAMA_MODEL},
+            ao_concluir
+        ),
+        media_type="text/event-stream",
+        headers=CABECALHOS_SSE
+    )
+
+@app.post("/explicar/pregerar", status_code=202)
+async def pregerar(
+    req: PregerarReq,
     request: Request,
     background_tasks: BackgroundTasks
 ):
     """
-    Gera uma **reexplicação simplificada** quando o aluno não entendeu a primeira explicação.
+    Agenda a geração de explicações em segundo plano (prioridade FUNDO),
+    para que os alunos já as encontrem no cache.
+    """
+    if not CACHE_ENABLED:
+        raise HTTPException(status_code=400, detail="Cache desabilitado: pré-geração não teria efeito")
+
+    ip_cliente = request.client.host if request.client else "unknown"
+    if not verificar_rate_limit(ip_cliente):
+        logger.warning(f"⚠️ Rate limit excedido para IP: {ip_cliente}")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Limite de {RATE_LIMIT_MAX} requisições por {RATE_LIMIT_WINDOW}s excedido. Aguarde um momento."
+        )
+
+    # Fila saturada: recusa já, com Retry-After
+    agendador_ollama.admitir(Prioridade.FUNDO)
+
+    background_tasks.add_task(pregerar_explicacoes, req.questoes)
+    logger.info(f"📚 Pré-geração agendada: {len(req.questoes)} questões - IP: {ip_cliente}")
+
+    return {
+        "ok": True,
+        "agendadas": len(req.questoes),
+        "fila_ollama": agendador_ollama.estatisticas(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+# ============================================================================
+# ENDPOINTS DE REEXPLICAÇÃO
+# ============================================================================
+
+
+def registrar_tentativa_reexplicacao(req: ReexplicarReq, request: Request):
+    """
+    Rate limit + contador de tentativas de /reexplicar e /reexplicar/stream
+
+    Returns:
+        (tentativa atual, nível de simplificação)
     """
-    inicio = datetime.now()
     ip_cliente = request.client.host if request.client else "unknown"
 
     # Verificar rate limit
@@ -816,6 +974,21 @@ async def reexplicar(
     nivel = determinar_nivel_simplificacao(req.tentativa_numero or tentativa_atual)
     logger.info(f"📊 Nível de simplificação: {nivel.value}")
 
+    return tentativa_atual, nivel
+
+
+@app.post("/reexplicar", response_model=ReexplicacaoResponse)
+async def reexplicar(
+    req: ReexplicarReq,
+    request: Request,
+    background_tasks: BackgroundTasks
+):
+    """
+    Gera uma **reexplicação simplificada** quando o aluno não entendeu a primeira explicação.
+    """
+    inicio = datetime.now()
+    tentativa_atual, nivel = registrar_tentativa_reexplicacao(req, request)
+
     try:
         # Construir prompt específico para reexplicação
         prompt = construir_prompt_reexplicacao(req, nivel)
@@ -861,6 +1034,48 @@ async def reexplicar(
         )
 
 
+@app.post("/reexplicar/stream")
+async def reexplicar_stream(req: ReexplicarReq, request: Request):
+    """
+    Mesma reexplicação do /reexplicar, transmitida por Server-Sent Events.
+
+    Eventos: `inicio` (com nível e tentativa), `token`, `fim` (com sugestões
+    e recursos) ou `erro`.
+    """
+    # Recusa (429/503) antes de abrir o stream e de contar a tentativa
+    agendador_ollama.admitir(Prioridade.INTERATIVA)
+    tentativa_atual, nivel = registrar_tentativa_reexplicacao(req, request)
+
+    async def ao_concluir(explicacao: str) -> Dict:
+        logger.info(f"✅ Reexplicação (streaming) gerada - Nível: {nivel.value}")
+        return {
+            "ok": True,
+            "questao_id": req.questao_id,
+            "nivel_simplificacao": nivel.value,
+            "tentativa_numero": tentativa_atual,
+            "sugestoes_estudo": gerar_sugestoes_estudo(req.questao_id, nivel),
+            "recursos_adicionais": gerar_recursos_adicionais(nivel),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    return StreamingResponse(
+        transmitir_geracao(
+            gerar_tokens_na_fila(construir_prompt_reexplicacao(req, nivel)),
+            {
+                "questao_id": req.questao_id,
+                "nivel_simplificacao": nivel.value,
+                "tentativa_numero": tentativa_atual,
+                "modelo_usado": OLLAMA_MODEL
+            },
+            ao_concluir
+        ),
+        media_type="text/event-stream",
+        headers=CABECALHOS_SSE,
+        # Agendar limpeza de tentativas antigas ao final
+        background=BackgroundTask(limpar_tentativas_antigas)
+    )
+
+
 @app.delete("/reexplicar/reset/{questao_id}")
 async def resetar_tentativas(
     questao_id: int,
@@ -944,7 +1159,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
             "error": exc.detail,
             "status_code": exc.status_code,
             "timestamp": datetime.now().isoformat()
-        }
+        },
+        headers=exc.headers
     )
 
 
@@ -977,6 +1193,7 @@ async def startup_event():
     logger.info(f"🧠 Modelo: {OLLAMA_MODEL}")
     logger.info(f"⏱️  Timeout: {TIMEOUT_SECONDS}s")
     logger.info(f"🔄 Max Retries: {MAX_RETRIES}")
+    logger.info(f"🚦 Fila Ollama: {agendador_ollama.vagas} vaga(s), até {agendador_ollama.max_fila} esperando")
     logger.info(f"💾 Cache: {'Habilitado' if CACHE_ENABLED else 'Desabilitado'}")
     if CACHE_ENABLED:
         logger.info(f"⏰ Cache TTL: {CACHE_TTL_HOURS}h")
@@ -984,6 +1201,8 @@ async def startup_event():
     logger.info(f"📖 Docs: http://localhost:8000/docs")
     logger.info("=" * 70)
 
+    await cliente_ollama.iniciar()
+
     # Verificar disponibilidade do Ollama
     ollama_ok = await verificar_ollama_disponivel()
     if ollama_ok:
@@ -996,7 +1215,9 @@ async def startup_event():
 async def shutdown_event():
     """Executado ao encerrar a aplicação"""
     logger.info("🛑 ENEM-IA API encerrada")
-    logger.info(f"📊 Estatísticas finais: {len(cache_explicacoes)} entradas no cache")
+    logger.info(f"📊 Estatísticas finais: {len(cache_explicacoes)} entradas no cache em memória")
+    cache_explicacoes.fechar()
+    await cliente_ollama.encerrar()
 
 # ============================================================================
 # MAIN
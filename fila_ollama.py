@@ -0,0 +1,211 @@
+"""
+Fila Ollama - Admissão com prioridade e contrapressão na frente do modelo
+
+O Ollama atende poucas gerações ao mesmo tempo (OLLAMA_NUM_PARALLEL). Num
+pico, cada requisição abria sua própria chamada, esperava até 90 s, dava
+timeout e tentava de novo - multiplicando a carga justamente quando o modelo
+estava saturado.
+
+Agora toda geração passa por `agendador_ollama.vaga(prioridade)`:
+
+- no máximo OLLAMA_NUM_PARALLEL gerações em andamento
+- as demais esperam numa fila por prioridade (INTERATIVA antes de FUNDO,
+  ordem de chegada dentro da mesma classe)
+- a espera é estimada na entrada (média móvel do tempo das gerações que
+  terminaram bem x posição na fila / vagas); quem não seria atendido a tempo é recusado
+  NA HORA, com Retry-After, em vez de ocupar a fila até o timeout:
+
+    429  fila cheia (OLLAMA_FILA_MAX)
+    503  espera estimada acima do limite da classe
+
+Uso:
+    async with agendador_ollama.vaga(Prioridade.INTERATIVA):
+        await cliente_ollama.cliente.post("/api/generate", ...)
+
+Configuração:
+    OLLAMA_NUM_PARALLEL          (padrão: 1 - vagas do modelo)
+    OLLAMA_FILA_MAX              (padrão: 50 - requisições esperando)
+    OLLAMA_ESPERA_MAX_SECONDS    (padrão: 60 - INTERATIVA)
+    OLLAMA_ESPERA_MAX_FUNDO      (padrão: 600 - FUNDO)
+    OLLAMA_TEMPO_INICIAL         (padrão: 20 - estimativa antes da 1ª geração)
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Dict, List, Tuple
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURAÇÃO
+# ============================================================================
+
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "1"))
+OLLAMA_FILA_MAX = int(os.getenv("OLLAMA_FILA_MAX", "50"))
+OLLAMA_ESPERA_MAX_SECONDS = float(os.getenv("OLLAMA_ESPERA_MAX_SECONDS", "60"))
+OLLAMA_ESPERA_MAX_FUNDO = float(os.getenv("OLLAMA_ESPERA_MAX_FUNDO", "600"))
+OLLAMA_TEMPO_INICIAL = float(os.getenv("OLLAMA_TEMPO_INICIAL", "20"))
+
+# Peso da última geração na média móvel do tempo de geração
+PESO_MEDIA = 0.2
+
+
+class Prioridade(IntEnum):
+    """Classes de atendimento (menor valor = atendido primeiro)"""
+    INTERATIVA = 0  # aluno esperando a resposta (/explicar, /reexplicar)
+    FUNDO = 1       # pré-geração de explicações para o cache
+
+
+ESPERA_MAX = {
+    Prioridade.INTERATIVA: OLLAMA_ESPERA_MAX_SECONDS,
+    Prioridade.FUNDO: OLLAMA_ESPERA_MAX_FUNDO,
+}
+
+# ============================================================================
+# AGENDADOR
+# ============================================================================
+
+class AgendadorOllama:
+    """
+    Vagas limitadas + fila por prioridade
+
+    Só é tocado no event loop (sem lock). Uma vaga liberada passa direto
+    para o primeiro da fila, sem disputa com quem acabou de chegar.
+    """
+
+    def __init__(self, vagas: int = OLLAMA_NUM_PARALLEL,
+                 max_fila: int = OLLAMA_FILA_MAX,
+                 tempo_inicial: float = OLLAMA_TEMPO_INICIAL):
+        self.vagas = vagas
+        self.max_fila = max_fila
+        self.tempo_medio = tempo_inicial
+
+        self._ocupadas = 0
+        # (prioridade, ordem de chegada, future); futures cancelados são
+        # descartados ao chegar no topo
+        self._fila: List[Tuple[int, int, asyncio.Future]] = []
+        self._esperando = {p: 0 for p in Prioridade}
+        self._ordem = itertools.count()
+
+        self._contadores = {
+            "atendidas": 0,
+            "recusadas_429": 0,
+            "recusadas_503": 0,
+            "canceladas_na_fila": 0,
+            "falhas": 0,
+        }
+
+    def estimar_espera(self, prioridade: Prioridade) -> float:
+        """Segundos até uma nova requisição desta prioridade ganhar vaga"""
+        a_frente = sum(self._esperando[p] for p in Prioridade if p <= prioridade)
+        if self._ocupadas < self.vagas and a_frente == 0:
+            return 0.0
+        return self.tempo_medio * (a_frente + 1) / self.vagas
+
+    def admitir(self, prioridade: Prioridade):
+        """
+        Recusa já (HTTPException com Retry-After) quem não seria atendido a
+        tempo. Chamado por vaga(); endpoints de streaming chamam antes de
+        abrir a resposta, para ainda poder devolver 429/503.
+        """
+        espera = self.estimar_espera(prioridade)
+        retry_after = str(max(1, math.ceil(espera)))
+
+        na_fila = sum(self._esperando.values())
+        if na_fila >= self.max_fila:
+            self._contadores["recusadas_429"] += 1
+            logger.warning(f"🚧 Fila do Ollama cheia ({na_fila}) - {prioridade.name} recusada")
+            raise HTTPException(
+                status_code=429,
+                detail="Muitas explicações sendo geradas agora. Tente novamente em instantes.",
+                headers={"Retry-After": retry_after}
+            )
+
+        if espera > ESPERA_MAX[prioridade]:
+            self._contadores["recusadas_503"] += 1
+            logger.warning(f"🚧 Espera estimada de {espera:.0f}s - {prioridade.name} recusada")
+            raise HTTPException(
+                status_code=503,
+                detail=f"Serviço de IA sobrecarregado (espera estimada: {espera:.0f}s). Tente novamente mais tarde.",
+                headers={"Retry-After": retry_after}
+            )
+
+    async def _entrar(self, prioridade: Prioridade):
+        if self._ocupadas < self.vagas and not self._fila:
+            self._ocupadas += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._fila, (prioridade, next(self._ordem), future))
+        self._esperando[prioridade] += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # A vaga chegou junto com o cancelamento: repassa adiante
+                self._sair()
+            else:
+                self._contadores["canceladas_na_fila"] += 1
+            raise
+        finally:
+            self._esperando[prioridade] -= 1
+
+    def _sair(self):
+        # A vaga passa para o primeiro da fila ainda esperando
+        while self._fila:
+            _, _, future = heapq.heappop(self._fila)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._ocupadas -= 1
+
+    @asynccontextmanager
+    async def vaga(self, prioridade: Prioridade = Prioridade.INTERATIVA) -> AsyncIterator[None]:
+        """Uma geração no Ollama (admissão + espera na fila + vaga)"""
+        self.admitir(prioridade)
+        chegada = time.monotonic()
+        await self._entrar(prioridade)
+
+        espera = time.monotonic() - chegada
+        if espera > 1:
+            logger.info(f"⏳ {prioridade.name}: {espera:.1f}s na fila do Ollama")
+
+        inicio = time.monotonic()
+        try:
+            yield
+        except BaseException:
+            # Erro, timeout ou cliente que desistiu: a duração não é o tempo
+            # de uma geração e não entra na média
+            self._contadores["falhas"] += 1
+            raise
+        else:
+            duracao = time.monotonic() - inicio
+            self.tempo_medio += PESO_MEDIA * (duracao - self.tempo_medio)
+        finally:
+            self._contadores["atendidas"] += 1
+            self._sair()
+
+    def estatisticas(self) -> Dict:
+        """Ocupação, fila por prioridade, estimativas e recusas"""
+        return {
+            "vagas": self.vagas,
+            "ocupadas": self._ocupadas,
+            "na_fila": {p.name.lower(): n for p, n in self._esperando.items()},
+            "max_fila": self.max_fila,
+            "tempo_medio_geracao": round(self.tempo_medio, 2),
+            "espera_estimada": {p.name.lower(): round(self.estimar_espera(p), 1) for p in Prioridade},
+            **self._contadores,
+        }
+
+
+# Instância única do processo
+agendador_ollama = AgendadorOllama()
@@ -0,0 +1,297 @@
+"""
+Índice de Cursos - Busca e autocomplete em memória para /cursos/cursos
+
+A busca usava `contains` do Prisma em nome/ies/campus: no SQLite isso é uma
+varredura completa, sem índice e sensível a maiúsculas/acentos ("medicina"
+não achava "Medicina", "sao paulo" não achava "São Paulo"). Agora o processo
+mantém um snapshot SOMENTE LEITURA do catálogo de cursos ativos:
+
+- tokens sem acento e em minúsculas de nome, IES e campus
+- tokens ordenados + bisect: todos os tokens com um prefixo são uma faixa
+  contígua (o mesmo que descer numa trie), então "med" acha "medicina"
+- ranking por qualidade: termo exato > prefixo; nome > IES > campus; empate
+  pela ordem original (IES, nome)
+
+Prefixos curtos ("m", "me") casam com milhares de cursos e pontuá-los a
+cada tecla custava dezenas de ms. Por isso:
+
+- os prefixos pesados (mais de LIMIAR_PREFIXO postings) já saem do build
+  com o top LIMITE_MAX pronto
+- o resto é pontuado com numpy sobre a fatia de postings da faixa (um vetor
+  de pontos por termo; vários termos = soma onde todos casam)
+- o LRU por snapshot guarda só a lista final (no máximo LIMITE_MAX cursos)
+
+O build do índice roda numa thread (em_thread) para não travar o event loop.
+
+Recarga:
+    - automática: a cada CURSOS_TTL_SECONDS compara a assinatura da tabela
+    - manual:     catalogo_cursos.invalidar() (ex: após importar cursos)
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+import unicodedata
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from executores import em_thread
+from prisma_bridge import run_prisma_script
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURAÇÃO
+# ============================================================================
+
+CURSOS_TTL_SECONDS = float(os.getenv("CURSOS_TTL_SECONDS", "60"))
+
+# Carga paginada: o sidecar nunca materializa o catálogo inteiro de uma vez
+PAGINA_CARGA = 5000
+
+# Maior `limit` aceito por /cursos/cursos (e tamanho das listas pré-calculadas)
+LIMITE_MAX = 100
+
+# Prefixos com mais postings que isso têm o top LIMITE_MAX pré-calculado
+LIMIAR_PREFIXO = 1000
+
+# Peso de um termo conforme onde aparece no curso
+PESO_NOME_INICIO = 4  # primeira palavra do nome
+PESO_NOME = 3
+PESO_IES = 2
+PESO_CAMPUS = 1
+PESO_MAX = PESO_NOME_INICIO * 2  # termo exato no início do nome
+
+SCRIPT_CARGA = '''
+return await prisma.course.findMany({
+  where: params.apos_id != null ? { ativo: true, id: { gt: params.apos_id } } : { ativo: true },
+  orderBy: { id: 'asc' },
+  take: params.pagina,
+  select: {
+    id: true, nome: true, ies: true, campus: true,
+    turno: true, notaCorte: true, anoReferencia: true
+  }
+});
+'''
+
+# Uma varredura agregada barata: muda quando cursos entram, saem, mudam de
+# nome/IES/campus, de nota ou de status
+SCRIPT_ASSINATURA = '''
+const [a] = await prisma.$queryRawUnsafe(`
+  SELECT COUNT(*) AS total,
+         MAX(id) AS max_id,
+         TOTAL(ativo) AS ativos,
+         TOTAL(notaCorte) AS soma_notas,
+         TOTAL(length(nome) + length(ies) + length(COALESCE(campus, ''))) AS soma_textos
+  FROM Course
+`);
+
+return {
+  total: Number(a.total),
+  max_id: a.max_id,
+  ativos: Number(a.ativos),
+  soma_notas: Number(a.soma_notas),
+  soma_textos: Number(a.soma_textos)
+};
+'''
+
+# ============================================================================
+# NORMALIZAÇÃO
+# ============================================================================
+
+_SEPARADORES = re.compile(r"[^0-9a-z]+")
+
+
+def tokens(texto: Optional[str]) -> List[str]:
+    """Tokens sem acento e em minúsculas ("São Paulo" -> ["sao", "paulo"])"""
+    if not texto:
+        return []
+    sem_acento = unicodedata.normalize("NFKD", texto)
+    sem_acento = "".join(c for c in sem_acento if not unicodedata.combining(c))
+    return [t for t in _SEPARADORES.split(sem_acento.casefold()) if t]
+
+# ============================================================================
+# SNAPSHOT
+# ============================================================================
+
+class SnapshotCursos:
+    """
+    Índice imutável do catálogo de cursos
+
+    Postings de todos os tokens em dois vetores numpy (curso, peso), na ordem
+    do vocabulário: os postings de uma faixa de prefixo são uma fatia
+    contígua. Cursos numerados na ordem (IES, nome) para o desempate ser o
+    próprio número.
+    """
+
+    def __init__(self, cursos: List[Dict], assinatura: Dict):
+        self.assinatura = assinatura
+        self.cursos = sorted(cursos, key=lambda c: (c["ies"] or "", c["nome"] or ""))
+        self.total = len(self.cursos)
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+
+        for numero, curso in enumerate(self.cursos):
+            pesos: Dict[str, int] = {}
+            campos = (
+                (tokens(curso.get("campus")), PESO_CAMPUS),
+                (tokens(curso.get("ies")), PESO_IES),
+                (tokens(curso.get("nome")), PESO_NOME),
+            )
+            for lista, peso in campos:
+                for posicao, token in enumerate(lista):
+                    if peso == PESO_NOME and posicao == 0:
+                        peso_token = PESO_NOME_INICIO
+                    else:
+                        peso_token = peso
+                    if pesos.get(token, 0) < peso_token:
+                        pesos[token] = peso_token
+            for token, peso in pesos.items():
+                postings.setdefault(token, []).append((numero, peso))
+
+        self._vocabulario = sorted(postings)
+        planos = [p for token in self._vocabulario for p in postings[token]]
+        self._curso = np.array([numero for numero, _ in planos], dtype=np.int32)
+        self._peso = np.array([peso for _, peso in planos], dtype=np.int8)
+        # Início dos postings de cada token (+ fim do último)
+        self._acumulado = np.zeros(len(self._vocabulario) + 1, dtype=np.int64)
+        np.cumsum([len(postings[t]) for t in self._vocabulario], out=self._acumulado[1:])
+
+        # Top LIMITE_MAX dos prefixos pesados; só um prefixo pesado pode ter
+        # extensão pesada, então desce nível a nível a partir da 1ª letra
+        self._top: Dict[str, Tuple[int, ...]] = {}
+        nivel = {t[:1] for t in self._vocabulario}
+        while nivel:
+            proximo = set()
+            for prefixo in nivel:
+                inicio, fim = self._faixa(prefixo)
+                if self._acumulado[fim] - self._acumulado[inicio] <= LIMIAR_PREFIXO:
+                    continue
+                self._top[prefixo] = self._ranking((prefixo,), LIMITE_MAX)
+                n = len(prefixo) + 1
+                proximo.update(t[:n] for t in self._vocabulario[inicio:fim] if len(t) >= n)
+            nivel = proximo
+
+        # Cache por snapshot (some junto com ele na recarga)
+        self._consultas = lru_cache(maxsize=4096)(self._buscar_termos)
+
+    def _faixa(self, termo: str) -> Tuple[int, int]:
+        """Faixa do vocabulário com tokens que começam com `termo`"""
+        inicio = bisect_left(self._vocabulario, termo)
+        fim = bisect_left(self._vocabulario, termo + "￿", inicio)
+        return inicio, fim
+
+    def _pontos(self, termo: str) -> np.ndarray:
+        """Pontuação de cada curso num termo (0 = não tem o termo)"""
+        inicio, fim = self._faixa(termo)
+        a, b = self._acumulado[inicio], self._acumulado[fim]
+        cursos = self._curso[a:b]
+        pesos = self._peso[a:b].copy()
+        # O token exato, se existe, é o primeiro da faixa: vale o dobro
+        if inicio < fim and self._vocabulario[inicio] == termo:
+            pesos[:self._acumulado[inicio + 1] - a] *= 2
+
+        # Um curso pode casar o prefixo com vários tokens: fica o maior peso
+        pontos = np.zeros(self.total, dtype=np.int8)
+        np.maximum.at(pontos, cursos, pesos)
+        return pontos
+
+    def _ranking(self, termos: Tuple[str, ...], limite: int) -> Tuple[int, ...]:
+        """Os `limite` melhores cursos com todos os termos"""
+        total = self._pontos(termos[0]).astype(np.int16)
+        todos = total > 0
+        for termo in termos[1:]:
+            pontos = self._pontos(termo)
+            todos &= pontos > 0
+            total += pontos
+
+        candidatos = np.flatnonzero(todos)
+        # Uma chave inteira por curso: pontuação (decrescente), depois número
+        chave = (PESO_MAX * len(termos) - total[candidatos]).astype(np.int64) * self.total + candidatos
+        if len(chave) > limite:
+            chave = np.partition(chave, limite - 1)[:limite]
+        chave.sort()
+        return tuple((chave % self.total).tolist())
+
+    def _buscar_termos(self, termos: Tuple[str, ...], limite: int) -> Tuple[int, ...]:
+        top = self._top.get(termos[0]) if len(termos) == 1 else None
+        if top is not None:
+            return top[:limite]
+        return self._ranking(termos, limite)
+
+    def buscar(self, texto: Optional[str], limite: int = 50) -> List[Dict]:
+        """
+        Cursos que contêm todos os termos (cada um como palavra ou prefixo)
+
+        Args:
+            texto: Consulta livre ("medic usp", "direito sao paulo")
+            limite: Máximo de resultados (até LIMITE_MAX)
+
+        Returns:
+            Cursos em ordem de relevância (sem consulta: ordem IES, nome)
+        """
+        limite = min(limite, LIMITE_MAX)
+        termos = tuple(dict.fromkeys(tokens(texto)))
+        if not termos:
+            return self.cursos[:limite]
+        return [self.cursos[n] for n in self._consultas(termos, limite)]
+
+# ============================================================================
+# CATÁLOGO (snapshot + recarga)
+# ============================================================================
+
+class CatalogoCursos:
+    """Mantém o snapshot atual e o recarrega quando a tabela muda"""
+
+    def __init__(self):
+        self._snapshot: Optional[SnapshotCursos] = None
+        self._lock = asyncio.Lock()
+        self._verificado_em = 0.0
+
+    def invalidar(self):
+        """Força verificação no próximo acesso"""
+        self._verificado_em = 0.0
+
+    async def obter(self) -> SnapshotCursos:
+        """Snapshot atual (carrega ou recarrega se necessário)"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._verificado_em < CURSOS_TTL_SECONDS:
+            return snapshot
+
+        async with self._lock:
+            # Outra requisição pode ter recarregado enquanto esperávamos
+            if self._snapshot is not None and time.monotonic() - self._verificado_em < CURSOS_TTL_SECONDS:
+                return self._snapshot
+
+            assinatura = await run_prisma_script(SCRIPT_ASSINATURA)
+            if self._snapshot is None or self._snapshot.assinatura != assinatura:
+                self._snapshot = await self._carregar(assinatura)
+            self._verificado_em = time.monotonic()
+            return self._snapshot
+
+    async def _carregar(self, assinatura: Dict) -> SnapshotCursos:
+        inicio = time.perf_counter()
+        cursos: List[Dict] = []
+        apos_id = None
+        while True:
+            pagina = await run_prisma_script(SCRIPT_CARGA, {"apos_id": apos_id, "pagina": PAGINA_CARGA})
+            cursos.extend(pagina)
+            if len(pagina) < PAGINA_CARGA:
+                break
+            apos_id = pagina[-1]["id"]
+
+        snapshot = await em_thread(SnapshotCursos, cursos, assinatura)
+        logger.info(
+            f"🎓 Catálogo de cursos indexado: {snapshot.total} cursos "
+            f"em {(time.perf_counter() - inicio) * 1000:.0f} ms"
+        )
+        return snapshot
+
+
+# Instância única do processo
+catalogo_cursos = CatalogoCursos()
@@ -0,0 +1,151 @@
+"""
+Lançamentos de FP - Razão append-only dos Focus Points
+
+O resgate lia pontosFP, conferia o saldo no JS e gravava com usuario.update
+fora de transação: dois resgates simultâneos gastavam o mesmo saldo, e um
+retry do cliente resgatava duas vezes. O mesmo valia para o prêmio dos
+desafios. Agora todo movimento de FP passa por aqui:
+
+- LancamentoFP: razão append-only (delta, saldo após o lançamento, motivo)
+- Usuario.pontosFP: saldo em cache do razão, alterado numa única instrução
+  condicional (UPDATE ... WHERE pontosFP + delta >= 0): sem leitura prévia,
+  não há corrida entre conferir e debitar
+- Usuario.nivel: não muda aqui (o lançamento só devolve o nível gravado)
+- ChaveIdempotencia: resultado de cada operação com Idempotency-Key, por
+  usuário; repetir a chave devolve o resultado original sem novo lançamento
+
+As tabelas ficam no mesmo banco do Prisma (lançamento e resgate/desafio na
+mesma transação) e fazem parte do schema: models em
+prisma/lancamentos_fp.prisma e migration em
+prisma/migrations/20241016000000_lancamentos_fp, a copiar para o projeto
+enem-pro antes do deploy:
+
+    npx prisma migrate deploy
+
+A migration abre o razão com um lançamento "saldo_inicial" por usuário com
+pontosFP, para que a soma dos deltas de cada usuário feche com o saldo.
+
+O backend não cria tabelas: no primeiro uso, só confere se existem (erro claro
+apontando a migration, em vez de falhar no meio de um resgate).
+
+Configuração:
+    IDEMPOTENCIA_HORAS  (padrão: 24 - chaves mais antigas são removidas ao iniciar)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from prisma_bridge import run_prisma_script
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURAÇÃO
+# ============================================================================
+
+IDEMPOTENCIA_HORAS = float(os.getenv("IDEMPOTENCIA_HORAS", "24"))
+
+# ============================================================================
+# SCRIPTS PRISMA
+# ============================================================================
+
+SCRIPT_TABELAS = '''
+const existentes = await prisma.$queryRawUnsafe(
+  `SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('LancamentoFP', 'ChaveIdempotencia')`
+);
+if (existentes.length < 2) {
+  return { faltando: ['LancamentoFP', 'ChaveIdempotencia'].filter(t => !existentes.some(e => e.name === t)) };
+}
+const expiradas = await prisma.$executeRawUnsafe(
+  `DELETE FROM ChaveIdempotencia WHERE criadoEm < ?`, params.expira_antes
+);
+return { faltando: [], expiradas };
+'''
+
+# Funções compartilhadas pelos scripts que movimentam FP
+JS_LANCAMENTOS_FP = '''
+// Crédito (delta > 0) ou débito condicional (delta < 0) numa única instrução.
+// Retorna null se o saldo não cobre o débito (nada é gravado).
+async function lancarFP(tx, usuarioId, delta, motivo, referencia) {
+  const alterados = await tx.$executeRawUnsafe(
+    `UPDATE Usuario SET pontosFP = pontosFP + ? WHERE id = ? AND pontosFP + ? >= 0`,
+    delta, usuarioId, delta
+  );
+  if (alterados === 0) return null;
+
+  const usuario = await tx.usuario.findUnique({
+    where: { id: usuarioId },
+    select: { pontosFP: true, nivel: true }
+  });
+  await tx.$executeRawUnsafe(
+    `INSERT INTO LancamentoFP (usuarioId, delta, saldo, motivo, referencia, criadoEm) VALUES (?, ?, ?, ?, ?, ?)`,
+    usuarioId, delta, usuario.pontosFP, motivo, referencia ?? null, Date.now()
+  );
+
+  return { saldo: usuario.pontosFP, nivel: usuario.nivel };
+}
+
+async function resultadoAnterior(db, usuarioId, chave) {
+  if (!chave) return null;
+  const linhas = await db.$queryRawUnsafe(
+    `SELECT resultado FROM ChaveIdempotencia WHERE usuarioId = ? AND chave = ?`,
+    usuarioId, chave
+  );
+  return linhas.length > 0 ? JSON.parse(linhas[0].resultado) : null;
+}
+
+// Na mesma transação do lançamento: chave repetida em paralelo viola a
+// chave primária e desfaz tudo (ver chaveRepetida)
+async function guardarResultado(tx, usuarioId, chave, resultado) {
+  if (!chave) return;
+  await tx.$executeRawUnsafe(
+    `INSERT INTO ChaveIdempotencia (usuarioId, chave, resultado, criadoEm) VALUES (?, ?, ?, ?)`,
+    usuarioId, chave, JSON.stringify(resultado), Date.now()
+  );
+}
+
+function chaveRepetida(erro) {
+  return String(erro?.message ?? erro).includes('UNIQUE constraint failed: ChaveIdempotencia');
+}
+'''
+
+# ============================================================================
+# EXECUÇÃO
+# ============================================================================
+
+_tabelas_prontas = False
+_lock_tabelas = asyncio.Lock()
+
+
+async def garantir_tabelas():
+    """Confere as tabelas do razão (uma vez por processo) e expira chaves antigas"""
+    global _tabelas_prontas
+    if _tabelas_prontas:
+        return
+
+    async with _lock_tabelas:
+        if _tabelas_prontas:
+            return
+        expira_antes = int((time.time() - IDEMPOTENCIA_HORAS * 3600) * 1000)
+        result = await run_prisma_script(SCRIPT_TABELAS, {"expira_antes": expira_antes})
+        if result["faltando"]:
+            logger.error(f"❌ Tabelas do razão de FP ausentes: {result['faltando']}")
+            raise HTTPException(
+                status_code=500,
+                detail="Banco sem as tabelas do razão de FP. Aplique a migration "
+                       "prisma/migrations/20241016000000_lancamentos_fp (npx prisma migrate deploy)."
+            )
+        if result["expiradas"]:
+            logger.info(f"🧹 {result['expiradas']} chaves de idempotência expiradas removidas")
+        _tabelas_prontas = True
+
+
+async def run_com_lancamentos(script: str, params: Optional[Dict] = None) -> Dict:
+    """Executa um script com as funções de JS_LANCAMENTOS_FP disponíveis"""
+    await garantir_tabelas()
+    return await run_prisma_script(JS_LANCAMENTOS_FP + script, params)
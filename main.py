@@ -10,6 +10,11 @@ Agrega todas as APIs do projeto:
 
 Uso:
     uvicorn main:app --reload --port 8000
+
+UM WORKER: não use `--workers N` (nem gunicorn com vários workers). As
+respostas do /answer ficam pendentes na memória do processo até a gravação
+em lote (buffer_respostas.py), e o /finish de outro worker não as veria. Um
+segundo worker falha no startup com uma mensagem explicando isso.
 """
 
 import logging
@@ -20,13 +25,22 @@ from fastapi.middleware.cors import CORSMiddleware
 
 # Import dos routers
 from routers.enem_simulados import router as simulados_router
-from routers.auth import router as auth_router
+from routers.auth import router as auth_router, pool as auth_pool
 from routers.enem_usuario import router as usuario_router
 from routers.enem_stats import router as stats_router
 from routers.enem_rewards import router as rewards_router
 from routers.enem_challenges import router as challenges_router
 from routers.enem_cursos import router as cursos_router
 
+from prisma_bridge import prisma_bridge
+from banco_questoes import banco_questoes
+from catalogo_recompensas import catalogo_recompensas
+from indice_cursos import catalogo_cursos
+from notas_corte import tabela_notas_corte
+from buffer_respostas import buffer_respostas
+from motor_desafios import motor_desafios
+from executores import IO_THREADS, HASH_THREADS, encerrar_executores
+
 # Configuração de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -196,9 +210,45 @@ async def startup_event():
     logger.info("   • Desafios: /api/enem/challenges")
     logger.info("="*70)
 
+    logger.info(f"🧵 Executores: {IO_THREADS} threads de I/O, {HASH_THREADS} threads de hashing")
+
+    # Sobe o sidecar Prisma uma única vez (evita spawn de Node por requisição)
+    try:
+        await prisma_bridge.iniciar()
+        sidecar_ok = True
+    except Exception as e:
+        sidecar_ok = False
+        logger.warning(f"⚠️ Sidecar Prisma não iniciado: {e} (nova tentativa na primeira requisição)")
+
+    # Pré-carrega os caches em memória. Cada um é independente: uma falha
+    # não impede os outros, e quem falhou carrega na primeira requisição
+    if sidecar_ok:
+        for nome, cache in (
+            ("banco de questões", banco_questoes),
+            ("catálogo de recompensas", catalogo_recompensas),
+            ("catálogo de cursos", catalogo_cursos),
+            ("tabela de notas de corte", tabela_notas_corte),
+        ):
+            try:
+                await cache.obter()
+            except Exception as e:
+                logger.warning(f"⚠️ {nome.capitalize()} não pré-carregado: {e} (carga na primeira requisição)")
+
+    # Recupera respostas do diário e inicia a gravação em lote do /answer
+    # (falha num segundo worker: o backend roda com um worker só)
+    await buffer_respostas.iniciar()
+
+    # Gravação em lote do progresso dos desafios semanais
+    await motor_desafios.iniciar()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Executado ao encerrar o servidor"""
+    await buffer_respostas.encerrar()
+    await motor_desafios.encerrar()
+    await prisma_bridge.encerrar()
+    auth_pool.fechar()
+    encerrar_executores()
     logger.info("🛑 ENEM-IA Backend encerrado")
 
 # ============================================================================
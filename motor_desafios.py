@@ -0,0 +1,438 @@
+"""
+Motor de Desafios - Progresso dos desafios semanais dirigido por eventos
+
+Antes o frontend chamava /challenges/progresso depois de cada simulado, e o
+endpoint relia usuário e desafio e fazia find-or-create em idas separadas
+ao banco; o /semana buscava o desafio ativo por intervalo de datas a cada
+chamada. Agora:
+
+1. O desafio ativo fica em cache até o fim da sua janela (`fim`)
+2. O /finish entrega o evento "simulado finalizado" ao motor, que marca o
+   usuário para recálculo (e estima o progresso em memória para o /semana)
+3. A cada DESAFIOS_FLUSH_SECONDS os usuários marcados têm o progresso
+   RECALCULADO a partir dos simulados finalizados na janela do desafio,
+   numa única transação por desafio (find-or-create em lote, conclusão e
+   prêmio no razão de FP - ver lancamentos_fp.py)
+
+Recalcular em vez de somar incrementos torna a gravação idempotente: uma
+transação que confirmou mas estourou o timeout (504) é simplesmente refeita,
+sem contar o simulado duas vezes. O banco é a fonte dos eventos, então nada
+se perde numa queda: ao iniciar, o motor recalcula todos os usuários com
+simulados finalizados na janela do desafio ativo.
+
+Regras (campo `tipo` do desafio, se existir no schema; senão deduzida do
+título/descrição):
+    simulados          "Faça 5 simulados"            -> +1 por simulado
+    percentual         "Acerte 80% em um simulado"   -> +1 por simulado >= 80%
+    dias_consecutivos  "Estude 7 dias consecutivos"  -> maior sequência de dias
+                                                         dentro da janela
+
+Configuração:
+    DESAFIOS_FLUSH_SECONDS  (padrão: 5)
+    DESAFIOS_TTL_SECONDS    (padrão: 60 - nova busca quando não há desafio ativo)
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+from agregados_usuario import agregados_usuario
+from executores import em_thread
+from lancamentos_fp import run_com_lancamentos
+from prisma_bridge import run_prisma_script
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURAÇÃO
+# ============================================================================
+
+DESAFIOS_FLUSH_SECONDS = float(os.getenv("DESAFIOS_FLUSH_SECONDS", "5"))
+DESAFIOS_TTL_SECONDS = float(os.getenv("DESAFIOS_TTL_SECONDS", "60"))
+
+REGRA_SIMULADOS = "simulados"
+REGRA_PERCENTUAL = "percentual"
+REGRA_DIAS_CONSECUTIVOS = "dias_consecutivos"
+
+# ============================================================================
+# SCRIPTS PRISMA
+# ============================================================================
+
+SCRIPT_DESAFIO_ATIVO = '''
+const agora = new Date();
+const d = await prisma.weeklyChallenge.findFirst({
+  where: {
+    inicio: { lte: agora },
+    fim: { gte: agora }
+  }
+});
+
+if (!d) return null;
+
+return {
+  id: d.id,
+  titulo: d.titulo,
+  descricao: d.descricao,
+  meta: d.meta,
+  recompensaFP: d.recompensaFP,
+  emoji: d.emoji,
+  inicio: d.inicio,
+  fim: d.fim,
+  tipo: d.tipo ?? null
+};
+'''
+
+# Progresso de vários usuários num desafio, numa transação, recalculado dos
+# simulados finalizados na janela (idempotente). `usuario_ids` null: todos os
+# usuários com simulados na janela (reconciliação ao iniciar). O progresso
+# gravado só sobe (preserva incrementos manuais antigos do /progresso).
+SCRIPT_DESCARREGAR = '''
+function maiorSequencia(dias) {
+  let maior = 0;
+  let atual = 0;
+  let anterior = null;
+  for (const dia of Array.from(dias).sort()) {
+    const t = Date.parse(dia);
+    atual = anterior !== null && t - anterior === 86400000 ? atual + 1 : 1;
+    maior = Math.max(maior, atual);
+    anterior = t;
+  }
+  return maior;
+}
+
+return await prisma.$transaction(async (tx) => {
+  const desafio = await tx.weeklyChallenge.findUnique({ where: { id: params.challenge_id } });
+  if (!desafio) return { pagos: [], usuarios: 0 };
+
+  const simulados = await tx.usuarioSimulado.findMany({
+    where: {
+      status: "finalizado",
+      finishedAt: { gte: desafio.inicio, lte: desafio.fim },
+      ...(params.usuario_ids ? { usuarioId: { in: params.usuario_ids } } : {})
+    },
+    select: { usuarioId: true, acertos: true, total: true, finishedAt: true }
+  });
+
+  // Regra do desafio sobre os simulados de cada usuário
+  const porUsuarioSimulados = new Map();
+  for (const s of simulados) {
+    if (!porUsuarioSimulados.has(s.usuarioId)) porUsuarioSimulados.set(s.usuarioId, []);
+    porUsuarioSimulados.get(s.usuarioId).push(s);
+  }
+  const calculados = new Map();
+  for (const [usuarioId, lista] of porUsuarioSimulados) {
+    let progresso;
+    if (params.tipo === "dias_consecutivos") {
+      progresso = maiorSequencia(new Set(lista.map(s => new Date(s.finishedAt).toISOString().slice(0, 10))));
+    } else if (params.tipo === "percentual") {
+      progresso = lista.filter(s => s.total > 0 && (s.acertos ?? 0) / s.total * 100 >= (params.limiar ?? 0)).length;
+    } else {
+      progresso = lista.length;
+    }
+    if (progresso > 0) calculados.set(usuarioId, progresso);
+  }
+
+  const usuarioIds = Array.from(calculados.keys());
+  const existentes = await tx.usuarioChallenge.findMany({
+    where: { challengeId: desafio.id, usuarioId: { in: usuarioIds } }
+  });
+  const porUsuario = new Map(existentes.map(e => [e.usuarioId, e]));
+
+  const novos = usuarioIds.filter(id => !porUsuario.has(id));
+  if (novos.length > 0) {
+    await tx.usuarioChallenge.createMany({
+      data: novos.map(id => ({
+        usuarioId: id,
+        challengeId: desafio.id,
+        progresso: calculados.get(id),
+        concluido: false
+      }))
+    });
+  }
+
+  for (const existente of existentes) {
+    const progresso = calculados.get(existente.usuarioId);
+    if (progresso > existente.progresso) {
+      await tx.usuarioChallenge.update({
+        where: { id: existente.id },
+        data: { progresso: progresso }
+      });
+    }
+  }
+
+  // Conclusão: só quem vira concluido false -> true recebe o prêmio
+  const atingiram = await tx.usuarioChallenge.findMany({
+    where: {
+      challengeId: desafio.id,
+      usuarioId: { in: usuarioIds },
+      concluido: false,
+      progresso: { gte: desafio.meta }
+    },
+    select: { id: true, usuarioId: true }
+  });
+
+  const pagos = [];
+  for (const registro of atingiram) {
+    const conclusao = await tx.usuarioChallenge.updateMany({
+      where: { id: registro.id, concluido: false },
+      data: { concluido: true }
+    });
+    if (conclusao.count === 1) {
+      const lancamento = await lancarFP(tx, registro.usuarioId, desafio.recompensaFP, "desafio", desafio.id);
+      pagos.push({ usuario_id: registro.usuarioId, fp_total: lancamento.saldo, nivel: lancamento.nivel });
+    }
+  }
+
+  const emails = await tx.usuario.findMany({
+    where: { id: { in: pagos.map(p => p.usuario_id) } },
+    select: { id: true, email: true }
+  });
+  const emailPorId = new Map(emails.map(u => [u.id, u.email]));
+  for (const pago of pagos) pago.email = emailPorId.get(pago.usuario_id);
+
+  return { pagos, usuarios: usuarioIds.length };
+});
+'''
+
+# ============================================================================
+# REGRAS
+# ============================================================================
+
+def _data(valor: str) -> datetime:
+    return datetime.fromisoformat(str(valor).replace("Z", "+00:00"))
+
+
+def classificar_regra(desafio: Dict) -> Tuple[str, Optional[float]]:
+    """(tipo, limiar) do desafio: campo `tipo` se houver, senão pelo texto"""
+    texto = f"{desafio.get('titulo') or ''} {desafio.get('descricao') or ''}".lower()
+    percentual = re.search(r"(\d+(?:[.,]\d+)?)\s*%", texto)
+    limiar = float(percentual.group(1).replace(",", ".")) if percentual else None
+
+    tipo = desafio.get("tipo")
+    if tipo in (REGRA_SIMULADOS, REGRA_PERCENTUAL, REGRA_DIAS_CONSECUTIVOS):
+        return tipo, limiar
+    if limiar is not None:
+        return REGRA_PERCENTUAL, limiar
+    if "consecutiv" in texto or "seguid" in texto:
+        return REGRA_DIAS_CONSECUTIVOS, None
+    return REGRA_SIMULADOS, None
+
+
+class DesafioAtivo:
+    """Desafio da semana com a regra já classificada"""
+
+    def __init__(self, dados: Dict):
+        self.dados = dados
+        self.id = dados["id"]
+        self.meta = dados["meta"]
+        self.inicio = _data(dados["inicio"])
+        self.fim = _data(dados["fim"])
+        self.tipo, self.limiar = classificar_regra(dados)
+
+    def na_janela(self, quando: datetime) -> bool:
+        return self.inicio <= quando <= self.fim
+
+    def avaliar(self, acertos: int, total: int, agregado: Optional[Dict]) -> Tuple[int, int]:
+        """
+        Efeito estimado de um simulado finalizado: (incremento, progresso absoluto)
+
+        O(1): usa só o simulado e o streak já mantido em agregados_usuario.
+        Serve só para o /semana antes da gravação: o valor gravado é
+        recalculado no banco (SCRIPT_DESCARREGAR)
+        """
+        if self.tipo == REGRA_SIMULADOS:
+            return 1, 0
+
+        if self.tipo == REGRA_PERCENTUAL:
+            atingiu = total > 0 and acertos / total * 100 >= (self.limiar or 0)
+            return (1 if atingiu else 0), 0
+
+        # Dias consecutivos: o streak do usuário, sem contar dias antes da janela
+        if not agregado or not agregado["ultimo_dia"]:
+            return 0, 0
+        ultimo = date.fromisoformat(agregado["ultimo_dia"])
+        dias_na_janela = (ultimo - self.inicio.date()).days + 1
+        return 0, max(0, min(agregado["streak"], dias_na_janela))
+
+# ============================================================================
+# MOTOR
+# ============================================================================
+
+class MotorDesafios:
+    """Desafio ativo em cache + progresso pendente gravado em lote"""
+
+    def __init__(self):
+        self._ativo: Optional[DesafioAtivo] = None
+        self._valido_ate = 0.0  # time.time()
+        self._lock = asyncio.Lock()
+        # (challenge_id, usuario_id) -> {"email", "incremento", "progresso"}
+        # (estimativa para o /semana; a gravação recalcula do banco)
+        self._pendentes: Dict[Tuple[str, str], Dict] = {}
+        self._regras: Dict[str, DesafioAtivo] = {}
+        self._reconciliar = False
+        self._gravacao = asyncio.Lock()
+        self._tarefa: Optional[asyncio.Task] = None
+
+    # ------------------------------------------------------------------
+    # Desafio ativo
+    # ------------------------------------------------------------------
+
+    def invalidar(self):
+        """Força nova busca do desafio ativo (ex: após cadastrar um desafio)"""
+        self._valido_ate = 0.0
+
+    async def ativo(self) -> Optional[DesafioAtivo]:
+        """Desafio da semana (em cache até o fim da janela)"""
+        if time.time() < self._valido_ate:
+            return self._ativo
+
+        async with self._lock:
+            if time.time() < self._valido_ate:
+                return self._ativo
+
+            dados = await run_prisma_script(SCRIPT_DESAFIO_ATIVO)
+            if dados is None:
+                self._ativo = None
+                self._valido_ate = time.time() + DESAFIOS_TTL_SECONDS
+            else:
+                self._ativo = DesafioAtivo(dados)
+                self._valido_ate = self._ativo.fim.timestamp()
+                logger.info(f"🎯 Desafio ativo: {dados['titulo']} ({self._ativo.tipo}) até {dados['fim']}")
+            return self._ativo
+
+    # ------------------------------------------------------------------
+    # Eventos
+    # ------------------------------------------------------------------
+
+    async def registrar_simulado(self, email: str, usuario_id: str, acertos: int, total: int,
+                                 finished_at: str):
+        """Evento "simulado finalizado" (chamado pelo /finish)"""
+        desafio = await self.ativo()
+        if desafio is None or not desafio.na_janela(_data(finished_at)):
+            return
+
+        agregado = None
+        if desafio.tipo == REGRA_DIAS_CONSECUTIVOS:
+            agregado = await em_thread(agregados_usuario.por_email, email)
+
+        incremento, progresso = desafio.avaliar(acertos, total, agregado)
+        if not incremento and not progresso:
+            return
+
+        self._regras[desafio.id] = desafio
+        pendente = self._pendentes.setdefault(
+            (desafio.id, usuario_id), {"email": email, "incremento": 0, "progresso": 0}
+        )
+        pendente["incremento"] += incremento
+        pendente["progresso"] = max(pendente["progresso"], progresso)
+
+    def pendente(self, challenge_id: str, usuario_id: str) -> Optional[Dict]:
+        """Progresso ainda não gravado (para o /semana)"""
+        return self._pendentes.get((challenge_id, usuario_id))
+
+    async def descarregar(self):
+        """
+        Recalcula e grava o progresso dos usuários marcados (uma transação por desafio)
+
+        Depois de iniciar, a primeira gravação reconcilia TODOS os usuários
+        com simulados na janela do desafio ativo (eventos perdidos numa queda).
+        """
+        async with self._gravacao:
+            por_desafio: Dict[str, Dict[str, Dict]] = {}
+            reconciliar = None
+            if self._reconciliar:
+                desafio = await self.ativo()
+                if desafio is not None:
+                    self._regras[desafio.id] = desafio
+                    reconciliar = desafio.id
+                    por_desafio[desafio.id] = {}
+                else:
+                    self._reconciliar = False
+
+            lote, self._pendentes = self._pendentes, {}
+            for (challenge_id, usuario_id), p in lote.items():
+                por_desafio.setdefault(challenge_id, {})[usuario_id] = p
+
+            # Uma falha não pode descartar o lote dos outros desafios: cada
+            # desafio que não gravou volta ao buffer e o primeiro erro é
+            # relançado no fim. Refazer é seguro: o progresso é recalculado,
+            # não somado (um 504 depois do commit não conta nada duas vezes)
+            erro = None
+            for challenge_id, usuarios in por_desafio.items():
+                desafio = self._regras[challenge_id]
+                try:
+                    result = await run_com_lancamentos(SCRIPT_DESCARREGAR, {
+                        "challenge_id": challenge_id,
+                        "tipo": desafio.tipo,
+                        "limiar": desafio.limiar,
+                        "usuario_ids": None if challenge_id == reconciliar else list(usuarios),
+                    })
+                except Exception as e:
+                    logger.error(f"❌ Progresso do desafio {challenge_id} devolvido ao buffer: {e}")
+                    self._devolver(challenge_id, usuarios)
+                    erro = erro or e
+                    continue
+
+                if challenge_id == reconciliar:
+                    self._reconciliar = False
+
+                # Já gravado: falha ao atualizar os agregados não volta ao buffer
+                # (o próximo acesso ao /stats corrige o FP)
+                for pago in result["pagos"]:
+                    try:
+                        await em_thread(agregados_usuario.atualizar_fp, pago["email"], pago["fp_total"], pago["nivel"])
+                    except Exception as e:
+                        logger.error(f"❌ FP de {pago['email']} não atualizado nos agregados: {e}")
+                    logger.info(f"🎉 Desafio {challenge_id} concluído por {pago['email']}")
+
+                logger.info(f"💾 Progresso de {result['usuarios']} usuários gravado no desafio {challenge_id}")
+
+            if erro is not None:
+                raise erro
+
+    def _devolver(self, challenge_id: str, usuarios: Dict[str, Dict]):
+        """Devolve usuários não gravados ao buffer (somando ao que chegou enquanto gravava)"""
+        for usuario_id, p in usuarios.items():
+            pendente = self._pendentes.setdefault(
+                (challenge_id, usuario_id), {"email": p["email"], "incremento": 0, "progresso": 0}
+            )
+            pendente["incremento"] += p["incremento"]
+            pendente["progresso"] = max(pendente["progresso"], p["progresso"])
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    async def iniciar(self):
+        """Inicia a gravação periódica (a primeira reconcilia o desafio ativo)"""
+        if self._tarefa is None:
+            self._reconciliar = True
+            self._tarefa = asyncio.create_task(self._laco())
+
+    async def encerrar(self):
+        """Para a gravação periódica e grava o que restou"""
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            await asyncio.gather(self._tarefa, return_exceptions=True)
+            self._tarefa = None
+        try:
+            await self.descarregar()
+        except Exception as e:
+            logger.error(f"❌ Progresso de desafios perdido no encerramento: {e}")
+
+    async def _laco(self):
+        while True:
+            await asyncio.sleep(DESAFIOS_FLUSH_SECONDS)
+            try:
+                await self.descarregar()
+            except Exception as e:
+                # Continua pendente: nova tentativa no próximo ciclo
+                logger.error(f"❌ Erro ao gravar progresso de desafios: {e}")
+
+
+# Instância única do processo
+motor_desafios = MotorDesafios()
@@ -0,0 +1,199 @@
+"""
+Notas de Corte - Tabela em memória para /compare-score
+
+O /compare-score fazia um notaCorte.findFirst por comparação, com igualdade
+exata de texto: "Medicina" x "medicina" ou "Universidade de Sao Paulo" x
+"Universidade de São Paulo" não encontravam nada. Agora o processo mantém
+a tabela inteira indexada por (curso, universidade, ano) normalizados (sem
+acento, minúsculas - mesma normalização da busca de cursos), e cada
+comparação é um acesso a dicionário.
+
+Fallback aproximado: se a chave exata não existe, procura a universidade e
+depois o curso mais parecidos daquele ano (difflib, similaridade >=
+NOTAS_CORTE_SIMILARIDADE). O resultado indica `aproximado: true`.
+
+Recarga:
+    - automática: a cada NOTAS_CORTE_TTL_SECONDS compara a assinatura da tabela
+    - manual:     tabela_notas_corte.invalidar() (ex: após importar notas do SISU)
+"""
+
+import asyncio
+import difflib
+import logging
+import os
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from indice_cursos import tokens
+from prisma_bridge import run_prisma_script
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURAÇÃO
+# ============================================================================
+
+NOTAS_CORTE_TTL_SECONDS = float(os.getenv("NOTAS_CORTE_TTL_SECONDS", "300"))
+NOTAS_CORTE_SIMILARIDADE = float(os.getenv("NOTAS_CORTE_SIMILARIDADE", "0.8"))
+
+PAGINA_CARGA = 5000
+
+SCRIPT_CARGA = '''
+const notas = await prisma.notaCorte.findMany({
+  orderBy: { id: 'asc' },
+  skip: params.apos_id != null ? 1 : 0,
+  cursor: params.apos_id != null ? { id: params.apos_id } : undefined,
+  take: params.pagina
+});
+
+return notas.map(n => ({
+  id: n.id,
+  curso: n.curso,
+  universidade: n.universidade,
+  ano: n.ano,
+  semestre: n.semestre ?? null,
+  nota_minima: n.notaMinima
+}));
+'''
+
+SCRIPT_ASSINATURA = '''
+const [a] = await prisma.$queryRawUnsafe(`
+  SELECT COUNT(*) AS total,
+         TOTAL(notaMinima) AS soma_notas,
+         TOTAL(ano) AS soma_anos,
+         TOTAL(length(curso) + length(universidade)) AS soma_textos
+  FROM NotaCorte
+`);
+
+return {
+  total: Number(a.total),
+  soma_notas: Number(a.soma_notas),
+  soma_anos: Number(a.soma_anos),
+  soma_textos: Number(a.soma_textos)
+};
+'''
+
+Chave = Tuple[str, str, int]
+
+
+def normalizar(texto: Optional[str]) -> str:
+    """Forma comparável de um nome ('São Paulo' -> 'sao paulo')"""
+    return " ".join(tokens(texto))
+
+# ============================================================================
+# TABELA
+# ============================================================================
+
+class TabelaNotas:
+    """Snapshot imutável das notas de corte"""
+
+    def __init__(self, notas: List[Dict], assinatura: Dict):
+        self.assinatura = assinatura
+        self.total = len(notas)
+        self._notas: Dict[Chave, Dict] = {}
+        # ano -> universidade -> cursos (para o fallback aproximado)
+        self._por_ano: Dict[int, Dict[str, List[str]]] = {}
+
+        for n in notas:
+            chave = (normalizar(n["curso"]), normalizar(n["universidade"]), n["ano"])
+            atual = self._notas.get(chave)
+            # Mesma chave em vários semestres: vale o mais recente
+            if atual is None or (n["semestre"] or 0) > (atual["semestre"] or 0):
+                self._notas[chave] = n
+
+        for curso, universidade, ano in self._notas:
+            self._por_ano.setdefault(ano, {}).setdefault(universidade, []).append(curso)
+
+        self._aproximar = lru_cache(maxsize=4096)(self._chave_aproximada)
+
+    def _chave_aproximada(self, curso: str, universidade: str, ano: int) -> Optional[Chave]:
+        universidades = self._por_ano.get(ano)
+        if not universidades:
+            return None
+
+        if universidade not in universidades:
+            parecidas = difflib.get_close_matches(
+                universidade, universidades.keys(), n=1, cutoff=NOTAS_CORTE_SIMILARIDADE
+            )
+            if not parecidas:
+                return None
+            universidade = parecidas[0]
+
+        cursos = universidades[universidade]
+        if curso not in cursos:
+            parecidos = difflib.get_close_matches(curso, cursos, n=1, cutoff=NOTAS_CORTE_SIMILARIDADE)
+            if not parecidos:
+                return None
+            curso = parecidos[0]
+
+        return curso, universidade, ano
+
+    def buscar(self, curso: str, universidade: str, ano: int) -> Optional[Dict]:
+        """
+        Nota de corte de um curso
+
+        Returns:
+            {curso, universidade, ano, semestre, nota_minima, aproximado} ou None
+        """
+        chave = (normalizar(curso), normalizar(universidade), ano)
+        nota = self._notas.get(chave)
+        if nota is not None:
+            return {**nota, "aproximado": False}
+
+        aproximada = self._aproximar(*chave)
+        if aproximada is None:
+            return None
+        return {**self._notas[aproximada], "aproximado": True}
+
+
+class TabelaNotasCorte:
+    """Mantém o snapshot atual e o recarrega quando a tabela muda"""
+
+    def __init__(self):
+        self._tabela: Optional[TabelaNotas] = None
+        self._lock = asyncio.Lock()
+        self._verificado_em = 0.0
+
+    def invalidar(self):
+        """Força verificação no próximo acesso"""
+        self._verificado_em = 0.0
+
+    async def obter(self) -> TabelaNotas:
+        """Snapshot atual (carrega ou recarrega se necessário)"""
+        tabela = self._tabela
+        if tabela is not None and time.monotonic() - self._verificado_em < NOTAS_CORTE_TTL_SECONDS:
+            return tabela
+
+        async with self._lock:
+            # Outra requisição pode ter recarregado enquanto esperávamos
+            if self._tabela is not None and time.monotonic() - self._verificado_em < NOTAS_CORTE_TTL_SECONDS:
+                return self._tabela
+
+            assinatura = await run_prisma_script(SCRIPT_ASSINATURA)
+            if self._tabela is None or self._tabela.assinatura != assinatura:
+                self._tabela = await self._carregar(assinatura)
+            self._verificado_em = time.monotonic()
+            return self._tabela
+
+    async def _carregar(self, assinatura: Dict) -> TabelaNotas:
+        inicio = time.perf_counter()
+        notas: List[Dict] = []
+        apos_id = None
+        while True:
+            pagina = await run_prisma_script(SCRIPT_CARGA, {"apos_id": apos_id, "pagina": PAGINA_CARGA})
+            notas.extend(pagina)
+            if len(pagina) < PAGINA_CARGA:
+                break
+            apos_id = pagina[-1]["id"]
+
+        tabela = TabelaNotas(notas, assinatura)
+        logger.info(
+            f"🎯 Notas de corte carregadas: {tabela.total} registros "
+            f"em {(time.perf_counter() - inicio) * 1000:.0f} ms"
+        )
+        return tabela
+
+
+# Instância única do processo
+tabela_notas_corte = TabelaNotasCorte()
@@ -0,0 +1,106 @@
+"""
+Pool SQLite - Conexões reaproveitadas para acesso síncrono ao SQLite
+
+Abrir uma conexão por consulta custa open() do arquivo, leitura do schema e
+recompilação de cada SQL. O pool mantém até `tamanho` conexões abertas,
+cada uma configurada uma única vez:
+
+- journal_mode=WAL: leitores não esperam o escritor (e vice-versa)
+- busy_timeout: em vez de "database is locked" imediato, espera o lock
+- synchronous=NORMAL: seguro com WAL e sem fsync a cada commit
+- row_factory=sqlite3.Row: linhas acessíveis por nome, em C
+- cache de statements por conexão: o mesmo SQL não é recompilado
+
+Uso (sempre fora do event loop, via em_thread):
+
+    with pool.conexao() as conn:
+        conn.execute(...).fetchone()
+
+Configuração:
+    SQLITE_POOL_SIZE        (padrão: 8 - conexões por banco)
+    SQLITE_BUSY_TIMEOUT_MS  (padrão: 5000)
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURAÇÃO
+# ============================================================================
+
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Statements compilados mantidos por conexão (padrão do sqlite3 é 128)
+STATEMENTS_POR_CONEXAO = 256
+
+# ============================================================================
+# POOL
+# ============================================================================
+
+class PoolSQLite:
+    """Pool de conexões de um arquivo SQLite (abertas sob demanda)"""
+
+    def __init__(self, caminho: Path, tamanho: int = SQLITE_POOL_SIZE):
+        self.caminho = Path(caminho)
+        self.tamanho = tamanho
+        self._livres: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._todas: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _abrir(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            str(self.caminho),
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=STATEMENTS_POR_CONEXAO,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        return conn
+
+    def _pegar(self) -> sqlite3.Connection:
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._todas) < self.tamanho:
+                conn = self._abrir()
+                self._todas.append(conn)
+                if len(self._todas) == 1:
+                    logger.info(f"🗄️ Pool SQLite aberto: {self.caminho.name} (até {self.tamanho} conexões)")
+                return conn
+
+        # Pool cheio: espera uma conexão ser devolvida
+        return self._livres.get()
+
+    @contextmanager
+    def conexao(self) -> Iterator[sqlite3.Connection]:
+        """Conexão emprestada; transação aberta é desfeita na devolução"""
+        conn = self._pegar()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._livres.put(conn)
+
+    def fechar(self):
+        """Fecha todas as conexões (encerramento do servidor)"""
+        with self._lock:
+            for conn in self._todas:
+                conn.close()
+            self._todas.clear()
+            self._livres = queue.LifoQueue()
@@ -0,0 +1,33 @@
+-- Razão de Focus Points (ver prisma/lancamentos_fp.prisma)
+
+-- CreateTable
+CREATE TABLE IF NOT EXISTS "LancamentoFP" (
+    "id" INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    "usuarioId" TEXT NOT NULL,
+    "delta" INTEGER NOT NULL,
+    "saldo" INTEGER NOT NULL,
+    "motivo" TEXT NOT NULL,
+    "referencia" TEXT,
+    "criadoEm" BIGINT NOT NULL
+);
+
+-- CreateTable
+CREATE TABLE IF NOT EXISTS "ChaveIdempotencia" (
+    "usuarioId" TEXT NOT NULL,
+    "chave" TEXT NOT NULL,
+    "resultado" TEXT NOT NULL,
+    "criadoEm" BIGINT NOT NULL,
+
+    PRIMARY KEY ("usuarioId", "chave")
+);
+
+-- CreateIndex
+CREATE INDEX IF NOT EXISTS "LancamentoFP_usuarioId_id_idx" ON "LancamentoFP"("usuarioId", "id");
+
+-- Saldo inicial: o razão abre com o pontosFP atual de cada usuário, para que
+-- a soma dos deltas feche com o saldo em cache
+INSERT INTO "LancamentoFP" ("usuarioId", "delta", "saldo", "motivo", "referencia", "criadoEm")
+SELECT "id", "pontosFP", "pontosFP", 'saldo_inicial', NULL, CAST(strftime('%s', 'now') AS INTEGER) * 1000
+FROM "Usuario"
+WHERE "pontosFP" <> 0
+  AND NOT EXISTS (SELECT 1 FROM "LancamentoFP" WHERE "LancamentoFP"."usuarioId" = "Usuario"."id");
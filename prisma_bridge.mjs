@@ -0,0 +1,75 @@
+// Ponte Prisma - sidecar Node.js de longa duração
+//
+// Mantém um único PrismaClient conectado e executa, sob demanda, os scripts
+// enviados pelo backend Python (prisma_bridge.py).
+//
+// Protocolo (uma mensagem JSON por linha):
+//   stdin  -> {"id": 1, "script": "<corpo de função async>", "params": {...}}
+//   stdout <- {"id": 1, "ok": true, "result": ...}
+//   stdout <- {"id": 1, "ok": false, "error": "..."}
+//
+// O script recebe `prisma` e `params` e devolve o resultado com `return`.
+// Deve ser iniciado com cwd = projeto Next.js (onde está o @prisma/client).
+
+import { createRequire } from 'node:module';
+import path from 'node:path';
+import readline from 'node:readline';
+
+const require = createRequire(path.join(process.cwd(), 'package.json'));
+const { PrismaClient } = require('@prisma/client');
+
+const prisma = new PrismaClient();
+const AsyncFunction = Object.getPrototypeOf(async function () {}).constructor;
+
+// Scripts são texto constante (valores chegam via params), então o cache de
+// funções compiladas fica pequeno e evita recompilar a cada requisição.
+const MAX_COMPILADOS = 512;
+const compilados = new Map();
+
+// stdout é reservado ao protocolo: qualquer log dos scripts vai para stderr
+console.log = (...args) => console.error(...args);
+
+function responder(mensagem) {
+  process.stdout.write(JSON.stringify(mensagem) + '\n');
+}
+
+function compilar(script) {
+  let fn = compilados.get(script);
+  if (!fn) {
+    if (compilados.size >= MAX_COMPILADOS) compilados.clear();
+    fn = new AsyncFunction('prisma', 'params', script);
+    compilados.set(script, fn);
+  }
+  return fn;
+}
+
+async function executar(req) {
+  try {
+    const result = await compilar(req.script)(prisma, req.params ?? {});
+    responder({ id: req.id, ok: true, result: result ?? null });
+  } catch (e) {
+    responder({ id: req.id, ok: false, error: String(e?.message ?? e) });
+  }
+}
+
+const rl = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
+
+rl.on('line', (linha) => {
+  if (!linha.trim()) return;
+  let req;
+  try {
+    req = JSON.parse(linha);
+  } catch (e) {
+    console.error(`[prisma_bridge] Mensagem inválida: ${e.message}`);
+    return;
+  }
+  executar(req);
+});
+
+rl.on('close', async () => {
+  await prisma.$disconnect();
+  process.exit(0);
+});
+
+await prisma.$connect();
+responder({ id: 0, ok: true, result: 'pronto' });
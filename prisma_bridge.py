@@ -0,0 +1,254 @@
+"""
+Ponte Prisma - Camada de acesso a dados compartilhada
+
+Substitui o padrão "um processo Node.js por requisição" (subprocess.run com
+script temporário + new PrismaClient() + $disconnect) por UM sidecar Node.js
+de longa duração (prisma_bridge.mjs) com PrismaClient aquecido e pool de
+conexões próprio. Todos os routers ENEM compartilham a mesma instância.
+
+Protocolo: JSON por linha via stdin/stdout (ver prisma_bridge.mjs).
+
+Uso nos routers:
+    from prisma_bridge import run_prisma_script
+
+    result = await run_prisma_script('''
+      const usuario = await prisma.usuario.findUnique({
+        where: { email: params.email }
+      });
+      return { nome: usuario?.nome ?? null };
+    ''', {"email": user_id})
+
+Os valores sempre chegam via `params` (nunca interpolados no JS), o que evita
+injeção e permite que o sidecar reutilize a função compilada.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURAÇÃO
+# ============================================================================
+
+# Caminho do projeto Prisma (auto-detecta)
+PRISMA_PROJECT_PATH = Path(
+    os.getenv("PRISMA_PROJECT_PATH", Path(__file__).resolve().parent.parent / "enem-pro")
+)
+
+if not (PRISMA_PROJECT_PATH / "prisma" / "schema.prisma").exists():
+    logger.warning(f"Projeto Prisma não encontrado em {PRISMA_PROJECT_PATH}")
+    PRISMA_PROJECT_PATH = None
+
+SIDECAR_SCRIPT = Path(__file__).resolve().parent / "prisma_bridge.mjs"
+DATABASE_URL = os.getenv("DATABASE_URL", "file:./dev.db")
+PRISMA_TIMEOUT_SECONDS = float(os.getenv("PRISMA_TIMEOUT_SECONDS", "30"))
+
+# Respostas grandes (ex: 180 questões com enunciado) cabem numa única linha
+STREAM_LIMIT_BYTES = 32 * 1024 * 1024
+
+# ============================================================================
+# SIDECAR
+# ============================================================================
+
+class PrismaBridge:
+    """Cliente assíncrono do sidecar Node.js com PrismaClient persistente"""
+
+    def __init__(self):
+        self._processo: Optional[asyncio.subprocess.Process] = None
+        self._leitor: Optional[asyncio.Task] = None
+        self._stderr: Optional[asyncio.Task] = None
+        self._pendentes: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._lock_inicio = asyncio.Lock()
+        self._lock_escrita = asyncio.Lock()
+
+    @property
+    def ativo(self) -> bool:
+        return self._processo is not None and self._processo.returncode is None
+
+    async def iniciar(self):
+        """Sobe o sidecar (idempotente). Aguarda o PrismaClient conectar."""
+        async with self._lock_inicio:
+            if self.ativo:
+                return
+
+            if not PRISMA_PROJECT_PATH:
+                raise HTTPException(
+                    status_code=500,
+                    detail="Projeto Prisma não configurado. Verifique PRISMA_PROJECT_PATH."
+                )
+
+            try:
+                self._processo = await asyncio.create_subprocess_exec(
+                    "node", str(SIDECAR_SCRIPT),
+                    cwd=str(PRISMA_PROJECT_PATH),
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    env={**os.environ, "DATABASE_URL": DATABASE_URL},
+                    limit=STREAM_LIMIT_BYTES,
+                )
+            except OSError as e:
+                logger.error(f"Não foi possível executar o Node.js: {e}")
+                raise HTTPException(status_code=500, detail=f"Erro ao iniciar acesso ao banco: {e}")
+
+            if self._stderr is not None:
+                # stderr do sidecar anterior (já encerrado) chega ao fim
+                await asyncio.gather(self._stderr, return_exceptions=True)
+                self._stderr = None
+
+            pronto = asyncio.get_running_loop().create_future()
+            self._pendentes[0] = pronto
+            self._leitor = asyncio.create_task(self._ler_respostas(self._processo))
+            self._stderr = asyncio.create_task(self._repassar_stderr(self._processo))
+
+            try:
+                await asyncio.wait_for(pronto, timeout=PRISMA_TIMEOUT_SECONDS)
+            except Exception as e:
+                logger.error(f"Falha ao iniciar sidecar Prisma: {e}")
+                await self._derrubar()
+                raise HTTPException(status_code=500, detail=f"Erro ao conectar no banco: {e}")
+
+            logger.info(f"✅ Sidecar Prisma ativo (pid {self._processo.pid})")
+
+    async def encerrar(self):
+        """Encerra o sidecar fechando o stdin (o Node faz $disconnect)."""
+        processo = self._processo
+        if processo is None:
+            return
+
+        if processo.returncode is None:
+            processo.stdin.close()
+            try:
+                await asyncio.wait_for(processo.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                processo.kill()
+
+        await self._derrubar()
+        logger.info("🛑 Sidecar Prisma encerrado")
+
+    async def executar(self, script: str, params: Optional[Dict[str, Any]] = None,
+                       timeout: float = PRISMA_TIMEOUT_SECONDS) -> Any:
+        """
+        Executa um script no PrismaClient do sidecar
+
+        Args:
+            script: Corpo de função async JS (recebe `prisma` e `params`)
+            params: Valores usados pelo script (serializados em JSON)
+            timeout: Tempo máximo de espera em segundos
+
+        Returns:
+            Valor retornado pelo script
+        """
+        if not self.ativo:
+            await self.iniciar()
+        processo = self._processo
+
+        req_id = next(self._ids)
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendentes[req_id] = futuro
+
+        mensagem = json.dumps(
+            {"id": req_id, "script": script, "params": params or {}},
+            ensure_ascii=False,
+            default=str,
+        ) + "\n"
+
+        try:
+            async with self._lock_escrita:
+                processo.stdin.write(mensagem.encode("utf-8"))
+                await processo.stdin.drain()
+
+            resposta = await asyncio.wait_for(futuro, timeout=timeout)
+
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Timeout ao acessar banco")
+        except (BrokenPipeError, ConnectionResetError) as e:
+            logger.error(f"Sidecar Prisma indisponível: {e}")
+            raise HTTPException(status_code=500, detail="Conexão com o banco perdida")
+        finally:
+            self._pendentes.pop(req_id, None)
+
+        if not resposta.get("ok"):
+            erro = resposta.get("error", "erro desconhecido")
+            logger.error(f"Erro Prisma: {erro}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Erro ao executar operação no banco: {erro[:200]}"
+            )
+
+        return resposta.get("result")
+
+    async def _ler_respostas(self, processo: asyncio.subprocess.Process):
+        """Distribui as respostas do sidecar para as requisições pendentes"""
+        try:
+            while True:
+                linha = await processo.stdout.readline()
+                if not linha:
+                    break
+                try:
+                    resposta = json.loads(linha)
+                except json.JSONDecodeError:
+                    logger.warning(f"Saída inesperada do sidecar: {linha[:200]!r}")
+                    continue
+
+                futuro = self._pendentes.get(resposta.get("id"))
+                if futuro and not futuro.done():
+                    futuro.set_result(resposta)
+        except ValueError as e:
+            # readline: linha maior que STREAM_LIMIT_BYTES
+            logger.error(f"Resposta do sidecar acima do limite de {STREAM_LIMIT_BYTES} bytes: {e}")
+        finally:
+            # Processo morreu: libera quem estava esperando
+            for futuro in self._pendentes.values():
+                if not futuro.done():
+                    futuro.set_result({"ok": False, "error": "Sidecar Prisma encerrado"})
+            self._pendentes.clear()
+            if self._processo is processo:
+                self._processo = None
+            # Saída ilegível (ex: linha acima de STREAM_LIMIT_BYTES): o Node
+            # ainda está vivo e seria substituído por outro - derruba este
+            if processo.returncode is None:
+                logger.warning(f"Encerrando sidecar Prisma com saída inválida (pid {processo.pid})")
+                try:
+                    processo.kill()
+                except ProcessLookupError:
+                    pass
+                await processo.wait()
+
+    async def _repassar_stderr(self, processo: asyncio.subprocess.Process):
+        """Logs do Node (console.error/console.log dos scripts)"""
+        while True:
+            linha = await processo.stderr.readline()
+            if not linha:
+                break
+            logger.debug(f"[prisma] {linha.decode('utf-8', errors='replace').rstrip()}")
+
+    async def _derrubar(self):
+        processo, self._processo = self._processo, None
+        if processo is not None and processo.returncode is None:
+            processo.kill()
+            await processo.wait()
+        if self._leitor is not None:
+            await asyncio.gather(self._leitor, return_exceptions=True)
+            self._leitor = None
+        if self._stderr is not None:
+            await asyncio.gather(self._stderr, return_exceptions=True)
+            self._stderr = None
+
+
+# Instância única compartilhada por todos os routers
+prisma_bridge = PrismaBridge()
+
+
+async def run_prisma_script(script: str, params: Optional[Dict[str, Any]] = None) -> Any:
+    """Executa script no sidecar Prisma compartilhado e retorna o resultado"""
+    return await prisma_bridge.executar(script, params)
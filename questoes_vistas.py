@@ -0,0 +1,211 @@
+"""
+Questões Vistas - Índice por usuário para seleção sem repetição
+
+Antes, o /start carregava TODOS os simulados anteriores do usuário com TODAS
+as respostas para montar um `notIn` gigante: custo e lista de parâmetros SQL
+cresciam com o histórico. Agora cada usuário tem um bitmap compacto
+(1 bit por id de questão), atualizado quando as respostas chegam ao
+banco (descarga do buffer do /answer, ver buffer_respostas.py) e no /finish:
+
+- consulta: 1 SELECT por chave primária, custo independente do histórico
+- tamanho: maior id de questão / 8 bytes (10.000 questões ~ 1,2 KB)
+
+Armazenamento: SQLite local (QUESTOES_VISTAS_DB), uma linha por
+(usuário, período):
+    '*'        -> tudo o que o usuário já viu
+    'AAAA-MM'  -> o que ele viu naquele mês (usado por janelas de tempo)
+
+POLÍTICA DE REPETIÇÃO:
+----------------------
+A política decide QUAIS questões vistas ficam fora da seleção. É uma função
+`(indice, usuario_id, area) -> bytes` (bitmap de exclusão):
+
+    politica_historico_completo   -> nunca repete (padrão)
+    politica_janela(dias)         -> repete o que foi visto antes da janela
+                                     (granularidade mensal)
+
+Para limites por área, basta registrar uma política que use `area`
+(ex: liberar repetição numa área com poucas questões):
+
+    questoes_vistas.definir_politica(minha_politica)
+
+Variável de ambiente QUESTOES_VISTAS_JANELA_DIAS ativa politica_janela.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURAÇÃO
+# ============================================================================
+
+QUESTOES_VISTAS_DB = Path(
+    os.getenv("QUESTOES_VISTAS_DB", Path(__file__).resolve().parent / "questoes_vistas.db")
+)
+
+PERIODO_TOTAL = "*"
+
+# ============================================================================
+# BITMAP
+# ============================================================================
+
+def _marcar_bits(bitmap: bytearray, ids: Iterable[int]) -> bytearray:
+    for questao_id in ids:
+        byte = questao_id >> 3
+        if byte >= len(bitmap):
+            bitmap.extend(bytes(byte + 1 - len(bitmap)))
+        bitmap[byte] |= 1 << (questao_id & 7)
+    return bitmap
+
+
+def contem(bitmap: bytes, questao_id: int) -> bool:
+    """True se o id está marcado no bitmap"""
+    byte = questao_id >> 3
+    return byte < len(bitmap) and bool(bitmap[byte] & (1 << (questao_id & 7)))
+
+
+def unir(bitmaps: Iterable[bytes]) -> bytes:
+    """OR entre bitmaps de tamanhos diferentes"""
+    acumulado, tamanho = 0, 0
+    for bitmap in bitmaps:
+        acumulado |= int.from_bytes(bitmap, "little")
+        tamanho = max(tamanho, len(bitmap))
+    return acumulado.to_bytes(tamanho, "little")
+
+
+def _periodo(data: datetime) -> str:
+    return data.strftime("%Y-%m")
+
+# ============================================================================
+# ÍNDICE
+# ============================================================================
+
+class IndiceQuestoesVistas:
+    """Bitmaps de questões vistas por usuário (acesso síncrono: use em_thread)"""
+
+    def __init__(self, caminho: Path = QUESTOES_VISTAS_DB):
+        self._caminho = caminho
+        self._conn: Optional[sqlite3.Connection] = None
+        # Marcação é ler-modificar-gravar: serializa entre threads do pool
+        self._lock = threading.Lock()
+
+    def _conexao(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(str(self._caminho), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS questoes_vistas (
+                    usuario_id TEXT NOT NULL,
+                    periodo    TEXT NOT NULL,
+                    bitmap     BLOB NOT NULL,
+                    PRIMARY KEY (usuario_id, periodo)
+                ) WITHOUT ROWID
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def possui(self, usuario_id: str) -> bool:
+        """True se o usuário já tem índice (senão precisa de reconstrução)"""
+        with self._lock:
+            linha = self._conexao().execute(
+                "SELECT 1 FROM questoes_vistas WHERE usuario_id = ? AND periodo = ?",
+                (usuario_id, PERIODO_TOTAL)
+            ).fetchone()
+        return linha is not None
+
+    def bitmap(self, usuario_id: str, periodos: Optional[List[str]] = None) -> bytes:
+        """
+        Bitmap de questões vistas
+
+        Args:
+            usuario_id: ID do usuário (Prisma)
+            periodos: Meses 'AAAA-MM' a considerar (None = histórico completo)
+        """
+        periodos = periodos or [PERIODO_TOTAL]
+        marcadores = ",".join("?" * len(periodos))
+        with self._lock:
+            linhas = self._conexao().execute(
+                f"SELECT bitmap FROM questoes_vistas WHERE usuario_id = ? AND periodo IN ({marcadores})",
+                (usuario_id, *periodos)
+            ).fetchall()
+        if len(linhas) == 1:
+            return linhas[0][0]
+        return unir(linha[0] for linha in linhas)
+
+    def marcar(self, usuario_id: str, questao_ids: Iterable[int], quando: Optional[datetime] = None):
+        """Marca questões como vistas (no total e no mês de `quando`)"""
+        self.marcar_por_periodo(usuario_id, {_periodo(quando or datetime.now()): list(questao_ids)})
+
+    def marcar_por_periodo(self, usuario_id: str, ids_por_periodo: Dict[str, List[int]]):
+        """Marca vários meses de uma vez (usado na reconstrução do histórico)"""
+        todos = [i for ids in ids_por_periodo.values() for i in ids]
+        alteracoes = {**ids_por_periodo, PERIODO_TOTAL: todos}
+
+        with self._lock:
+            conn = self._conexao()
+            with conn:
+                for periodo, ids in alteracoes.items():
+                    linha = conn.execute(
+                        "SELECT bitmap FROM questoes_vistas WHERE usuario_id = ? AND periodo = ?",
+                        (usuario_id, periodo)
+                    ).fetchone()
+                    bitmap = _marcar_bits(bytearray(linha[0] if linha else b""), ids)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO questoes_vistas (usuario_id, periodo, bitmap) VALUES (?, ?, ?)",
+                        (usuario_id, periodo, bytes(bitmap))
+                    )
+
+    def fechar(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# ============================================================================
+# POLÍTICAS DE REPETIÇÃO
+# ============================================================================
+
+PoliticaRepeticao = Callable[[IndiceQuestoesVistas, str, Optional[str]], bytes]
+
+
+def politica_historico_completo(indice: IndiceQuestoesVistas, usuario_id: str,
+                                area: Optional[str]) -> bytes:
+    """Nunca repete questões já vistas"""
+    return indice.bitmap(usuario_id)
+
+
+def politica_janela(dias: int) -> PoliticaRepeticao:
+    """Exclui apenas questões vistas nos últimos `dias` (por mês)"""
+    def politica(indice: IndiceQuestoesVistas, usuario_id: str, area: Optional[str]) -> bytes:
+        hoje = datetime.now()
+        periodos = []
+        mes = hoje - timedelta(days=dias)
+        while mes <= hoje:
+            periodos.append(_periodo(mes))
+            mes = (mes.replace(day=1) + timedelta(days=32)).replace(day=1)
+        return indice.bitmap(usuario_id, periodos)
+    return politica
+
+
+indice_vistas = IndiceQuestoesVistas()
+
+_janela = os.getenv("QUESTOES_VISTAS_JANELA_DIAS")
+_politica: PoliticaRepeticao = politica_janela(int(_janela)) if _janela else politica_historico_completo
+
+
+def definir_politica(politica: PoliticaRepeticao):
+    """Troca a política de repetição usada pelo /start"""
+    global _politica
+    _politica = politica
+
+
+def bitmap_exclusao(usuario_id: str, area: Optional[str] = None) -> bytes:
+    """Bitmap das questões que NÃO devem entrar no próximo simulado"""
+    return _politica(indice_vistas, usuario_id, area)
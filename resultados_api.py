@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, validator
@@ -11,6 +11,11 @@ import logging
 import hashlib
 import asyncio
 
+from cache_camadas import CacheCamadas
+from cliente_ollama import TIMEOUT_SONDA, cliente_ollama
+from fila_ollama import Prioridade, agendador_ollama
+from voo_unico import VooUnico
+
 # ============================================================================
 # CONFIGURAÇÃO DE LOGGING
 # ============================================================================
@@ -56,8 +61,11 @@ app.add_middleware(
 # SISTEMA DE CACHE E RATE LIMITING
 # ============================================================================
 
-# Cache simples em memória (em produção, use Redis)
-cache_explicacoes: Dict[str, Dict] = {}
+# Cache de explicações: memória LRU limitada + disco comprimido (ver cache_camadas.py)
+cache_explicacoes = CacheCamadas("explicacoes_resultados", CACHE_TTL_HOURS * 3600)
+
+# Pedidos idênticos simultâneos compartilham uma única geração no Ollama
+voo_explicacoes = VooUnico("explicar")
 
 # Rate limiting simples
 rate_limit_store: Dict[str, List[datetime]] = defaultdict(list)
@@ -65,20 +73,6 @@ RATE_LIMIT_MAX = 10  # requisições
 RATE_LIMIT_WINDOW = 60  # segundos
 
 
-def limpar_cache_expirado():
-    """Remove entradas expiradas do cache"""
-    agora = datetime.now()
-    keys_para_remover = []
-    
-    for key, valor in cache_explicacoes.items():
-        if agora > valor["expira_em"]:
-            keys_para_remover.append(key)
-    
-    for key in keys_para_remover:
-        del cache_explicacoes[key]
-        logger.info(f"🗑️ Cache expirado removido: {key[:8]}...")
-
-
 def gerar_cache_key(questao_id: int, resposta: str, contexto: Optional[str]) -> str:
     """Gera chave única para cache baseada nos parâmetros"""
     dados = f"{questao_id}:{resposta}:{contexto or ''}"
@@ -141,6 +135,7 @@ class ExplicacaoResponse(BaseModel):
     explicacao: str
     questao_id: int
     cached: bool = False
+    coalescido: bool = False
     tempo_processamento: float
     modelo_usado: str
     timestamp: str
@@ -163,9 +158,8 @@ class HealthResponse(BaseModel):
 async def verificar_ollama_disponivel() -> bool:
     """Verifica se o Ollama está acessível"""
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(f"{OLLAMA_URL}/api/tags")
-            return response.status_code == 200
+        response = await cliente_ollama.cliente.get("/api/tags", timeout=TIMEOUT_SONDA)
+        return response.status_code == 200
     except Exception as e:
         logger.error(f"Ollama não disponível: {str(e)}")
         return False
@@ -271,10 +265,15 @@ Gerar uma explicação COMPLETA, DIDÁTICA e MOTIVADORA que ajude o aluno a:
 
 async def chamar_ollama_com_retry(
     prompt: str,
-    max_tentativas: int = MAX_RETRIES
+    max_tentativas: int = MAX_RETRIES,
+    prioridade: Prioridade = Prioridade.INTERATIVA
 ) -> str:
     """
     Chama Ollama com sistema de retry em caso de falha
+
+    Cada tentativa passa pela fila do Ollama (ver fila_ollama.py): com o
+    modelo saturado, a recusa (429/503 + Retry-After) sai na hora.
+    Timeout não é repetido - só somaria carga a um modelo já saturado.
     """
     ultima_excecao = None
     
@@ -282,9 +281,10 @@ async def chamar_ollama_com_retry(
         try:
             logger.info(f"🤖 Tentativa {tentativa + 1}/{max_tentativas} - Chamando Ollama")
             
-            async with httpx.AsyncClient(timeout=TIMEOUT_SECONDS) as client:
-                response = await client.post(
-                    f"{OLLAMA_URL}/api/generate",
+            # Uma vaga no Ollama + pool keep-alive compartilhado
+            async with agendador_ollama.vaga(prioridade):
+                response = await cliente_ollama.cliente.post(
+                    "/api/generate",
                     json={
                         "model": OLLAMA_MODEL,
                         "prompt": prompt,
@@ -295,25 +295,28 @@ async def chamar_ollama_com_retry(
                         }
                     }
                 )
-                
+                # Dentro da vaga: erro HTTP ou resposta vazia não entra na
+                # média de tempo das gerações
                 response.raise_for_status()
                 data = response.json()
-                
+
                 # Extrai o texto da resposta
                 texto = data.get("response") or data.get("text") or ""
-                
+
                 if not texto or len(texto.strip()) < 50:
                     raise ValueError("Resposta muito curta ou vazia da IA")
-                
-                logger.info(f"✅ Ollama respondeu com sucesso ({len(texto)} chars)")
-                return texto.strip()
-                
+            
+            logger.info(f"✅ Ollama respondeu com sucesso ({len(texto)} chars)")
+            return texto.strip()
+            
+        except HTTPException:
+            # Recusado pela fila do Ollama
+            raise
+
         except httpx.TimeoutException as e:
             ultima_excecao = e
             logger.warning(f"⏱️ Timeout na tentativa {tentativa + 1}")
-            if tentativa < max_tentativas - 1:
-                await asyncio.sleep(2)  # Aguarda antes de tentar novamente
-                continue
+            break
                 
         except httpx.HTTPStatusError as e:
             ultima_excecao = e
@@ -330,7 +333,7 @@ async def chamar_ollama_com_retry(
                 continue
     
     # Se chegou aqui, todas tentativas falharam
-    erro_msg = f"Falha após {max_tentativas} tentativas. Último erro: {str(ultima_excecao)}"
+    erro_msg = f"Falha após {tentativa + 1} tentativa(s). Último erro: {str(ultima_excecao)}"
     logger.error(f"💥 {erro_msg}")
     raise HTTPException(status_code=503, detail=erro_msg)
 
@@ -371,14 +374,14 @@ async def health_check():
 
 
 @app.get("/cache/stats")
-async def cache_stats(background_tasks: BackgroundTasks):
-    """Estatísticas do cache"""
-    background_tasks.add_task(limpar_cache_expirado)
-    
+async def cache_stats():
+    """Estatísticas do cache (camadas, acertos, faltas, despejos)"""
     return {
         "cache_enabled": CACHE_ENABLED,
-        "total_entries": len(cache_explicacoes),
         "ttl_hours": CACHE_TTL_HOURS,
+        **await cache_explicacoes.estatisticas(),
+        "coalescencia": voo_explicacoes.estatisticas(),
+        "fila_ollama": agendador_ollama.estatisticas(),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -386,7 +389,7 @@ async def cache_stats(background_tasks: BackgroundTasks):
 @app.delete("/cache/clear")
 async def limpar_cache():
     """Limpa todo o cache (útil para desenvolvimento)"""
-    cache_explicacoes.clear()
+    await cache_explicacoes.limpar()
     logger.info("🗑️ Cache limpo manualmente")
     return {"message": "Cache limpo com sucesso", "timestamp": datetime.now().isoformat()}
 
@@ -394,8 +397,7 @@ async def limpar_cache():
 @app.post("/explicar", response_model=ExplicacaoResponse)
 async def explicar(
     req: ExplicarReq,
-    request: Request,
-    background_tasks: BackgroundTasks
+    request: Request
 ):
     """
     Gera explicação pedagógica detalhada e personalizada para uma questão do ENEM.
@@ -425,9 +427,6 @@ async def explicar(
     
     logger.info(f"📨 Nova requisição de explicação - Questão #{req.questao_id} - IP: {ip_cliente}")
     
-    # Limpar cache expirado em background
-    background_tasks.add_task(limpar_cache_expirado)
-    
     # Verificar cache
     cache_key = gerar_cache_key(
         req.questao_id,
@@ -435,26 +434,25 @@ async def explicar(
         req.contexto_adicional
     )
     
-    if CACHE_ENABLED and cache_key in cache_explicacoes:
-        cache_entry = cache_explicacoes[cache_key]
-        if datetime.now() < cache_entry["expira_em"]:
-            tempo_processamento = (datetime.now() - inicio).total_seconds()
-            logger.info(f"💾 Cache HIT para questão #{req.questao_id}")
-            
-            return ExplicacaoResponse(
-                ok=True,
-                explicacao=cache_entry["explicacao"],
-                questao_id=req.questao_id,
-                cached=True,
-                tempo_processamento=tempo_processamento,
-                modelo_usado=OLLAMA_MODEL,
-                timestamp=datetime.now().isoformat(),
-                resposta_era_correta=(
-                    req.resposta_usuario == req.resposta_correta
-                    if req.resposta_correta else None
-                )
+    explicacao_cache = await cache_explicacoes.obter(cache_key) if CACHE_ENABLED else None
+    if explicacao_cache is not None:
+        tempo_processamento = (datetime.now() - inicio).total_seconds()
+        logger.info(f"💾 Cache HIT para questão #{req.questao_id}")
+        
+        return ExplicacaoResponse(
+            ok=True,
+            explicacao=explicacao_cache,
+            questao_id=req.questao_id,
+            cached=True,
+            tempo_processamento=tempo_processamento,
+            modelo_usado=OLLAMA_MODEL,
+            timestamp=datetime.now().isoformat(),
+            resposta_era_correta=(
+                req.resposta_usuario == req.resposta_correta
+                if req.resposta_correta else None
             )
-    
+        )
+
     # Cache miss - gerar nova explicação
     logger.info(f"🔄 Cache MISS - Gerando nova explicação")
     
@@ -462,21 +460,22 @@ async def explicar(
         # Construir prompt
         prompt = construir_prompt_detalhado(req)
         
-        # Chamar Ollama
-        explicacao = await chamar_ollama_com_retry(prompt)
+        async def gerar() -> str:
+            # Chamar Ollama
+            explicacao = await chamar_ollama_com_retry(prompt)
+        
+            # Salvar no cache se habilitado
+            if CACHE_ENABLED:
+                await cache_explicacoes.guardar(cache_key, explicacao)
+                logger.info(f"💾 Explicação salva no cache")
+            return explicacao
+        
+        # Uma geração por chave: quem chega durante ela aguarda o mesmo resultado
+        explicacao, coalescido = await voo_explicacoes.executar(cache_key, gerar)
         
         # Calcular tempo de processamento
         tempo_processamento = (datetime.now() - inicio).total_seconds()
         
-        # Salvar no cache se habilitado
-        if CACHE_ENABLED:
-            cache_explicacoes[cache_key] = {
-                "explicacao": explicacao,
-                "expira_em": datetime.now() + timedelta(hours=CACHE_TTL_HOURS),
-                "criado_em": datetime.now().isoformat()
-            }
-            logger.info(f"💾 Explicação salva no cache")
-        
         logger.info(f"✅ Explicação gerada com sucesso em {tempo_processamento:.2f}s")
         
         return ExplicacaoResponse(
@@ -484,6 +483,7 @@ async def explicar(
             explicacao=explicacao,
             questao_id=req.questao_id,
             cached=False,
+            coalescido=coalescido,
             tempo_processamento=tempo_processamento,
             modelo_usado=OLLAMA_MODEL,
             timestamp=datetime.now().isoformat(),
@@ -519,7 +519,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
             "error": exc.detail,
             "status_code": exc.status_code,
             "timestamp": datetime.now().isoformat()
-        }
+        },
+        headers=exc.headers
     )
 
 
@@ -552,6 +553,7 @@ async def startup_event():
     logger.info(f"🧠 Modelo: {OLLAMA_MODEL}")
     logger.info(f"⏱️  Timeout: {TIMEOUT_SECONDS}s")
     logger.info(f"🔄 Max Retries: {MAX_RETRIES}")
+    logger.info(f"🚦 Fila Ollama: {agendador_ollama.vagas} vaga(s), até {agendador_ollama.max_fila} esperando")
     logger.info(f"💾 Cache: {'Habilitado' if CACHE_ENABLED else 'Desabilitado'}")
     if CACHE_ENABLED:
         logger.info(f"⏰ Cache TTL: {CACHE_TTL_HOURS}h")
@@ -559,6 +561,8 @@ async def startup_event():
     logger.info(f"📖 Docs: http://localhost:8000/docs")
     logger.info("=" * 70)
     
+    await cliente_ollama.iniciar()
+
     # Verificar disponibilidade do Ollama
     ollama_ok = await verificar_ollama_disponivel()
     if ollama_ok:
@@ -571,7 +575,9 @@ async def startup_event():
 async def shutdown_event():
     """Executado ao encerrar a aplicação"""
     logger.info("🛑 ENEM-IA API encerrada")
-    logger.info(f"📊 Estatísticas finais: {len(cache_explicacoes)} entradas no cache")
+    logger.info(f"📊 Estatísticas finais: {len(cache_explicacoes)} entradas no cache em memória")
+    cache_explicacoes.fechar()
+    await cliente_ollama.encerrar()
 
 
 # ============================================================================
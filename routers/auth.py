@@ -8,7 +8,11 @@ Endpoints:
 """
 
 import logging
-from typing import Any
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException, status
 
@@ -22,9 +26,11 @@ from auth_schemas import (
 from auth_utils import (
     create_user_token,
     get_current_user_id,
-    hash_password,
-    verify_password,
+    hash_password_async,
+    verify_password_async,
 )
+from executores import em_thread
+from pool_sqlite import PoolSQLite
 
 logger = logging.getLogger(__name__)
 
@@ -38,31 +44,85 @@ router = APIRouter(
 )
 
 # ============================================================================
-# PRISMA CLIENT
+# BANCO (pool SQLite + cache de usuários)
 # ============================================================================
 
-# Importação do Prisma Client (assumindo que você usará prisma-client-py)
-# Como o Prisma é usado no frontend Next.js, precisamos conectar via API
-# ou usar uma biblioteca Python compatível
+# Banco SQLite do Prisma, acessado direto com sqlite3 por conexões do pool
+# (WAL, busy timeout, sqlite3.Row). Acesso síncrono: os endpoints chamam
+# estas funções via em_thread() para não bloquear o event loop.
 
-# Para esta implementação, vamos criar uma função auxiliar que simula
-# a conexão com o banco de dados SQLite do Prisma
+DB_PATH = Path(__file__).parent.parent / "enem_pro.db"
+pool = PoolSQLite(DB_PATH)
 
-import sqlite3
-from datetime import datetime
-from pathlib import Path
+# /me roda a cada requisição autenticada: os dados públicos do usuário ficam
+# em memória por AUTH_CACHE_TTL_SECONDS
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX = int(os.getenv("AUTH_CACHE_MAX", "10000"))
+
+SQL_POR_EMAIL = "SELECT id, nome, email, senha, createdAt FROM Usuario WHERE email = ?"
+SQL_POR_ID = "SELECT id, nome, email, createdAt FROM Usuario WHERE id = ?"
+SQL_INSERIR = "INSERT INTO Usuario (id, nome, email, senha, createdAt) VALUES (?, ?, ?, ?, ?)"
+
+CAMPOS_PUBLICOS = ("id", "nome", "email", "createdAt")
+
+
+class CacheUsuarios:
+    """
+    Dados públicos (sem senha) por id, com TTL curto
+
+    Usado só no event loop (antes/depois do em_thread), então sem lock.
+    Ordem de inserção do dict = ordem de expiração para o limite de tamanho.
+
+    Só guarda CAMPOS_PUBLICOS, gravados uma vez no /register: nenhum endpoint
+    altera nome/email, então não há invalidação (FP, nível e curso alvo não
+    ficam aqui). Um endpoint que venha a editar esses campos precisa tirar o
+    usuário do cache; até lá, o limite de atraso é o TTL.
+    """
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL_SECONDS, max_itens: int = AUTH_CACHE_MAX):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens: Dict[str, Tuple[float, dict]] = {}
+
+    def obter(self, user_id: str) -> Optional[dict]:
+        item = self._itens.get(user_id)
+        if item is None:
+            return None
+        expira_em, usuario = item
+        if time.monotonic() >= expira_em:
+            del self._itens[user_id]
+            return None
+        return usuario
 
+    def guardar(self, usuario: dict):
+        publico = {campo: usuario[campo] for campo in CAMPOS_PUBLICOS}
+        self._itens.pop(publico["id"], None)
+        self._itens[publico["id"]] = (time.monotonic() + self.ttl, publico)
+        while len(self._itens) > self.max_itens:
+            del self._itens[next(iter(self._itens))]
 
-def get_db_connection():
-    """Conecta ao banco SQLite do Prisma"""
-    db_path = Path(__file__).parent.parent / "enem_pro.db"
-    return sqlite3.connect(str(db_path))
 
+cache_usuarios = CacheUsuarios()
 
-def dict_factory(cursor, row):
-    """Converte resultados do SQLite em dicionários"""
-    fields = [column[0] for column in cursor.description]
-    return {key: value for key, value in zip(fields, row)}
+
+def _buscar_usuario_por_email(email: str) -> Optional[dict]:
+    with pool.conexao() as conn:
+        linha = conn.execute(SQL_POR_EMAIL, (email,)).fetchone()
+    return dict(linha) if linha else None
+
+
+def _buscar_usuario_por_id(user_id: str) -> Optional[dict]:
+    with pool.conexao() as conn:
+        linha = conn.execute(SQL_POR_ID, (user_id,)).fetchone()
+    return dict(linha) if linha else None
+
+
+def _inserir_usuario(user_id: str, nome: Optional[str], email: str,
+                     senha_hash: str, created_at: str) -> dict:
+    with pool.conexao() as conn:
+        with conn:
+            conn.execute(SQL_INSERIR, (user_id, nome, email, senha_hash, created_at))
+        return dict(conn.execute(SQL_POR_ID, (user_id,)).fetchone())
 
 
 # ============================================================================
@@ -91,13 +151,8 @@ async def register(data: RegisterRequest) -> Any:
         Token JWT e dados do usuário criado
     """
     try:
-        conn = get_db_connection()
-        conn.row_factory = dict_factory
-        cursor = conn.cursor()
-
         # Verificar se email já existe
-        cursor.execute("SELECT id FROM Usuario WHERE email = ?", (data.email,))
-        existing_user = cursor.fetchone()
+        existing_user = await em_thread(_buscar_usuario_por_email, data.email)
 
         if existing_user:
             raise HTTPException(
@@ -106,30 +161,19 @@ async def register(data: RegisterRequest) -> Any:
             )
 
         # Criar hash da senha
-        hashed_password = hash_password(data.senha)
+        hashed_password = await hash_password_async(data.senha)
 
         # Gerar ID único (simulando cuid())
         import secrets
         user_id = "u_" + secrets.token_urlsafe(16)
 
-        # Inserir novo usuário
+        # Inserir novo usuário e buscar registro criado
         now = datetime.utcnow().isoformat()
-        cursor.execute(
-            """
-            INSERT INTO Usuario (id, nome, email, senha, createdAt)
-            VALUES (?, ?, ?, ?, ?)
-            """,
-            (user_id, data.nome, data.email, hashed_password, now)
+        user = await em_thread(
+            _inserir_usuario, user_id, data.nome, data.email, hashed_password, now
         )
-        conn.commit()
 
-        # Buscar usuário criado
-        cursor.execute(
-            "SELECT id, nome, email, createdAt FROM Usuario WHERE id = ?",
-            (user_id,)
-        )
-        user = cursor.fetchone()
-        conn.close()
+        cache_usuarios.guardar(user)
 
         # Criar token JWT
         token = create_user_token(user["id"], user["email"])
@@ -172,17 +216,8 @@ async def login(data: LoginRequest) -> Any:
         Token JWT e dados do usuário autenticado
     """
     try:
-        conn = get_db_connection()
-        conn.row_factory = dict_factory
-        cursor = conn.cursor()
-
         # Buscar usuário por email
-        cursor.execute(
-            "SELECT id, nome, email, senha, createdAt FROM Usuario WHERE email = ?",
-            (data.email,)
-        )
-        user = cursor.fetchone()
-        conn.close()
+        user = await em_thread(_buscar_usuario_por_email, data.email)
 
         # Verificar se usuário existe
         if not user:
@@ -192,7 +227,7 @@ async def login(data: LoginRequest) -> Any:
             )
 
         # Verificar senha
-        if not verify_password(data.senha, user["senha"]):
+        if not await verify_password_async(data.senha, user["senha"]):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Email ou senha incorretos"
@@ -201,8 +236,9 @@ async def login(data: LoginRequest) -> Any:
         # Criar token JWT
         token = create_user_token(user["id"], user["email"])
 
-        # Remover senha da resposta
+        # Remover senha da resposta (e aquecer o cache do /me)
         user_response = {k: v for k, v in user.items() if k != "senha"}
+        cache_usuarios.guardar(user_response)
 
         logger.info(f"✅ Login realizado: {user['email']}")
 
@@ -242,23 +278,17 @@ async def get_me(user_id: str = Depends(get_current_user_id)) -> Any:
         Dados do usuário (sem senha)
     """
     try:
-        conn = get_db_connection()
-        conn.row_factory = dict_factory
-        cursor = conn.cursor()
-
-        # Buscar usuário
-        cursor.execute(
-            "SELECT id, nome, email, createdAt FROM Usuario WHERE id = ?",
-            (user_id,)
-        )
-        user = cursor.fetchone()
-        conn.close()
-
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Usuário não encontrado"
-            )
+        # Buscar usuário (cache primeiro: sem disco na maioria das chamadas)
+        user = cache_usuarios.obter(user_id)
+        if user is None:
+            user = await em_thread(_buscar_usuario_por_id, user_id)
+
+            if not user:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Usuário não encontrado"
+                )
+            cache_usuarios.guardar(user)
 
         return UsuarioResponse(**user)
 
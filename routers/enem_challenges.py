@@ -6,31 +6,25 @@ Endpoints para gerenciar desafios semanais e progresso
 ROTAS:
 - GET /api/enem/challenges/semana - Desafio da semana atual
 - POST /api/enem/challenges/progresso - Atualiza progresso do usuário
+  (desafio ativo: só leitura, o /finish já conta os simulados)
 """
 
-import subprocess
-import json
 import logging
-from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, Query
 from pydantic import BaseModel
 
+from agregados_usuario import agregados_usuario
+from executores import em_thread
+from lancamentos_fp import run_com_lancamentos
+from motor_desafios import motor_desafios
+from prisma_bridge import run_prisma_script
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# ============================================================================
-# CONFIGURAÇÃO
-# ============================================================================
-
-PRISMA_PROJECT_PATH = Path(__file__).resolve().parent.parent.parent / "enem-pro"
-
-if not (PRISMA_PROJECT_PATH / "prisma" / "schema.prisma").exists():
-    logger.warning(f"Projeto Prisma não encontrado em {PRISMA_PROJECT_PATH}")
-    PRISMA_PROJECT_PATH = None
-
 # ============================================================================
 # MODELOS PYDANTIC
 # ============================================================================
@@ -64,50 +58,51 @@ class ProgressoResponse(BaseModel):
     concluido: bool
     fp_ganhos: int
 
-# ============================================================================
-# HELPER FUNCTIONS
-# ============================================================================
-
-def run_prisma_script(script: str) -> dict:
-    """Executa script Node.js com Prisma e retorna resultado JSON"""
-    if not PRISMA_PROJECT_PATH:
-        raise HTTPException(status_code=500, detail="Prisma não configurado")
-
-    try:
-        result = subprocess.run(
-            ["node", "-e", script],
-            cwd=str(PRISMA_PROJECT_PATH),
-            capture_output=True,
-            text=True,
-            timeout=30,
-            env={**subprocess.os.environ, "DATABASE_URL": "file:./dev.db"}
-        )
-
-        if result.returncode != 0:
-            logger.error(f"Erro Prisma: {result.stderr}")
-            raise HTTPException(status_code=500, detail=f"Erro no banco: {result.stderr}")
-
-        output = result.stdout.strip()
-        if not output:
-            return {}
-
-        return json.loads(output)
-
-    except subprocess.TimeoutExpired:
-        raise HTTPException(status_code=504, detail="Timeout ao acessar banco")
-    except json.JSONDecodeError as e:
-        logger.error(f"Erro ao parsear JSON: {result.stdout}")
-        raise HTTPException(status_code=500, detail=f"Erro ao parsear resultado: {str(e)}")
-    except Exception as e:
-        logger.error(f"Erro inesperado: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
-
 # ============================================================================
 # ROUTER
 # ============================================================================
 
 router = APIRouter()
 
+SCRIPT_PROGRESSO = '''
+const usuario = await prisma.usuario.findUnique({
+  where: { email: params.email },
+  select: {
+    id: true,
+    challenges: params.challenge_id
+      ? { where: { challengeId: params.challenge_id }, take: 1, select: { progresso: true } }
+      : false
+  }
+});
+
+if (!usuario) return null;
+
+return {
+  usuario_id: usuario.id,
+  progresso: usuario.challenges?.[0]?.progresso ?? 0
+};
+'''
+
+
+async def progresso_do_usuario(email: str, desafio) -> Optional[dict]:
+    """
+    {usuario_id, progresso} no desafio (None se o usuário não existe)
+
+    Soma o progresso de simulados recentes ainda não gravado pelo motor.
+    """
+    usuario = await run_prisma_script(SCRIPT_PROGRESSO, {
+        "email": email,
+        "challenge_id": desafio.id if desafio else None,
+    })
+    if usuario is None or desafio is None:
+        return usuario
+
+    pendente = motor_desafios.pendente(desafio.id, usuario["usuario_id"])
+    if pendente:
+        usuario["progresso"] = max(usuario["progresso"] + pendente["incremento"], pendente["progresso"])
+    return usuario
+
+
 @router.get("/semana", response_model=DesafioSemanaResponse)
 async def get_desafio_semana(user_id: str = Query(..., description="Email/ID do usuário")):
     """
@@ -116,10 +111,13 @@ async def get_desafio_semana(user_id: str = Query(..., description="Email/ID do
     Retorna o desafio ativo da semana com progresso do usuário.
 
     ## Critérios:
-    - Busca desafio onde data atual está entre inicio e fim
+    - Busca desafio onde data atual está entre inicio e fim (em cache até o fim)
     - Retorna progresso do usuário para esse desafio
     - Se não houver desafio ativo, retorna null
 
+    O progresso é atualizado pelo servidor a cada simulado finalizado
+    (não é preciso chamar /progresso depois do /finish).
+
     ## Exemplo de Desafios:
     - 📚 Faça 5 simulados esta semana (+200 FP)
     - 🎯 Acerte 80% em um simulado (+150 FP)
@@ -136,123 +134,64 @@ async def get_desafio_semana(user_id: str = Query(..., description="Email/ID do
     """
     logger.info(f"🎯 Buscando desafio da semana para {user_id}")
 
-    script = f'''
-import {{ PrismaClient }} from '@prisma/client';
-const prisma = new PrismaClient();
-
-async function main() {{
-  // =========================================================================
-  // 1. BUSCA USUÁRIO
-  // =========================================================================
-  const usuario = await prisma.usuario.findUnique({{
-    where: {{ email: "{user_id}" }}
-  }});
-
-  if (!usuario) {{
-    console.log(JSON.stringify({{
-      desafio: null,
-      mensagem: "Usuário não encontrado"
-    }}));
-    return;
-  }}
-
-  // =========================================================================
-  // 2. BUSCA DESAFIO ATIVO DA SEMANA
-  // =========================================================================
-  const agora = new Date();
-
-  const desafioAtivo = await prisma.weeklyChallenge.findFirst({{
-    where: {{
-      inicio: {{ lte: agora }},
-      fim: {{ gte: agora }}
-    }}
-  }});
-
-  if (!desafioAtivo) {{
-    console.log(JSON.stringify({{
-      desafio: null,
-      mensagem: "Nenhum desafio ativo no momento"
-    }}));
-    return;
-  }}
-
-  // =========================================================================
-  // 3. BUSCA PROGRESSO DO USUÁRIO
-  // =========================================================================
-  let progressoRegistro = await prisma.usuarioChallenge.findFirst({{
-    where: {{
-      usuarioId: usuario.id,
-      challengeId: desafioAtivo.id
-    }}
-  }});
-
-  // Se não existe, cria com progresso 0
-  if (!progressoRegistro) {{
-    progressoRegistro = await prisma.usuarioChallenge.create({{
-      data: {{
-        usuarioId: usuario.id,
-        challengeId: desafioAtivo.id,
-        progresso: 0,
-        concluido: false
-      }}
-    }});
-  }}
-
-  // =========================================================================
-  // 4. RETORNA DESAFIO COM PROGRESSO
-  // =========================================================================
-  const concluido = progressoRegistro.progresso >= desafioAtivo.meta;
-
-  console.log(JSON.stringify({{
-    desafio: {{
-      id: desafioAtivo.id,
-      titulo: desafioAtivo.titulo,
-      descricao: desafioAtivo.descricao,
-      meta: desafioAtivo.meta,
-      recompensaFP: desafioAtivo.recompensaFP,
-      emoji: desafioAtivo.emoji,
-      inicio: desafioAtivo.inicio,
-      fim: desafioAtivo.fim,
-      progresso_atual: progressoRegistro.progresso,
-      concluido: concluido
-    }}
-  }}));
-}}
-
-main()
-  .catch(e => {{ console.error(e); process.exit(1); }})
-  .finally(() => prisma.$disconnect());
-'''
-
-    result = run_prisma_script(script)
-
-    if result.get('desafio'):
-        logger.info(f"✅ Desafio encontrado: {result['desafio']['titulo']}")
-    else:
-        logger.info(f"ℹ️ {result.get('mensagem', 'Sem desafio ativo')}")
-
-    return result
+    # Desafio ativo em cache até o fim da semana (ver motor_desafios.py)
+    desafio = await motor_desafios.ativo()
+
+    usuario = await progresso_do_usuario(user_id, desafio)
+
+    if usuario is None:
+        logger.info("ℹ️ Usuário não encontrado")
+        return {"desafio": None, "mensagem": "Usuário não encontrado"}
+
+    if desafio is None:
+        logger.info("ℹ️ Nenhum desafio ativo no momento")
+        return {"desafio": None, "mensagem": "Nenhum desafio ativo no momento"}
+
+    progresso = usuario["progresso"]
+    dados = desafio.dados
+    logger.info(f"✅ Desafio encontrado: {dados['titulo']}")
+
+    return {
+        "desafio": {
+            "id": dados["id"],
+            "titulo": dados["titulo"],
+            "descricao": dados["descricao"],
+            "meta": dados["meta"],
+            "recompensaFP": dados["recompensaFP"],
+            "emoji": dados["emoji"],
+            "inicio": dados["inicio"],
+            "fim": dados["fim"],
+            "progresso_atual": progresso,
+            "concluido": progresso >= dados["meta"],
+        }
+    }
 
 @router.post("/progresso", response_model=ProgressoResponse)
-async def atualizar_progresso(request: ProgressoRequest):
+async def atualizar_progresso(
+    request: ProgressoRequest,
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+):
     """
     ATUALIZAR PROGRESSO DO DESAFIO
 
-    Incrementa o progresso do usuário em um desafio.
+    Incrementa o progresso do usuário em um desafio manualmente.
 
-    ## Casos de Uso:
-    - Usuário finalizou simulado → incremento = 1
-    - Usuário atingiu meta de acertos → incremento = 1
-    - Sistema detecta dia consecutivo → incremento = 1
+    Simulados finalizados já contam automaticamente (motor_desafios.py): para
+    o desafio ATIVO este endpoint não incrementa nada (clientes antigos que
+    ainda o chamam depois do /finish contariam o simulado duas vezes) e só
+    devolve o progresso atual. Incrementos manuais valem para os demais
+    desafios, cujo progresso o servidor não observa.
 
-    ## Lógica:
+    ## Lógica (uma transação):
     1. Incrementa progresso
     2. Verifica se atingiu a meta
-    3. Se completou, marca como concluído e adiciona FP
+    3. Se completou, marca como concluído e credita FP no razão (uma única vez)
+
+    ## Idempotência:
+    - Envie o header Idempotency-Key para que um retry não incremente de novo
 
     ## Exemplo de uso (Frontend):
     ```javascript
-    // Após finalizar simulado
     const response = await fetch('/api/enem/challenges/progresso', {
       method: 'POST',
       body: JSON.stringify({
@@ -269,133 +208,163 @@ async def atualizar_progresso(request: ProgressoRequest):
     """
     logger.info(f"⚡ Atualizando progresso do desafio {request.challenge_id} para {request.user_id}")
 
-    script = f'''
-import {{ PrismaClient }} from '@prisma/client';
-const prisma = new PrismaClient();
-
-async function main() {{
-  // =========================================================================
-  // 1. BUSCA USUÁRIO
-  // =========================================================================
-  const usuario = await prisma.usuario.findUnique({{
-    where: {{ email: "{request.user_id}" }}
-  }});
-
-  if (!usuario) {{
-    console.log(JSON.stringify({{
-      success: false,
-      mensagem: "Usuário não encontrado",
-      progresso_atual: 0,
-      meta: 0,
-      concluido: false,
-      fp_ganhos: 0
-    }}));
-    return;
-  }}
-
-  // =========================================================================
-  // 2. BUSCA DESAFIO
-  // =========================================================================
-  const desafio = await prisma.weeklyChallenge.findUnique({{
-    where: {{ id: "{request.challenge_id}" }}
-  }});
-
-  if (!desafio) {{
-    console.log(JSON.stringify({{
-      success: false,
-      mensagem: "Desafio não encontrado",
-      progresso_atual: 0,
-      meta: 0,
-      concluido: false,
-      fp_ganhos: 0
-    }}));
-    return;
-  }}
-
-  // =========================================================================
-  // 3. BUSCA OU CRIA PROGRESSO DO USUÁRIO
-  // =========================================================================
-  let progressoRegistro = await prisma.usuarioChallenge.findFirst({{
-    where: {{
-      usuarioId: usuario.id,
-      challengeId: desafio.id
-    }}
-  }});
-
-  if (!progressoRegistro) {{
-    progressoRegistro = await prisma.usuarioChallenge.create({{
-      data: {{
+    desafio = await motor_desafios.ativo()
+    if desafio is not None and desafio.id == request.challenge_id:
+        usuario = await progresso_do_usuario(request.user_id, desafio)
+        if usuario is None:
+            return {
+                "success": False,
+                "mensagem": "Usuário não encontrado",
+                "progresso_atual": 0,
+                "meta": 0,
+                "concluido": False,
+                "fp_ganhos": 0
+            }
+        logger.info("ℹ️ Desafio ativo: progresso contado pelo /finish, incremento ignorado")
+        return {
+            "success": True,
+            "mensagem": "Progresso atualizado automaticamente ao finalizar simulados",
+            "progresso_atual": usuario["progresso"],
+            "meta": desafio.dados["meta"],
+            "concluido": usuario["progresso"] >= desafio.dados["meta"],
+            "fp_ganhos": 0
+        }
+
+    script = '''
+// =========================================================================
+// 1. BUSCA USUÁRIO
+// =========================================================================
+const usuario = await prisma.usuario.findUnique({
+  where: { email: params.email }
+});
+
+if (!usuario) {
+  return {
+    success: false,
+    mensagem: "Usuário não encontrado",
+    progresso_atual: 0,
+    meta: 0,
+    concluido: false,
+    fp_ganhos: 0
+  };
+}
+
+// =========================================================================
+// 2. BUSCA DESAFIO
+// =========================================================================
+const desafio = await prisma.weeklyChallenge.findUnique({
+  where: { id: params.challenge_id }
+});
+
+if (!desafio) {
+  return {
+    success: false,
+    mensagem: "Desafio não encontrado",
+    progresso_atual: 0,
+    meta: 0,
+    concluido: false,
+    fp_ganhos: 0
+  };
+}
+
+const anterior = await resultadoAnterior(prisma, usuario.id, params.chave);
+if (anterior) return anterior;
+
+try {
+  return await prisma.$transaction(async (tx) => {
+    // =====================================================================
+    // 3. BUSCA OU CRIA PROGRESSO DO USUÁRIO
+    // =====================================================================
+    let progressoRegistro = await tx.usuarioChallenge.findFirst({
+      where: {
         usuarioId: usuario.id,
-        challengeId: desafio.id,
-        progresso: 0,
-        concluido: false
-      }}
-    }});
-  }}
-
-  // =========================================================================
-  // 4. INCREMENTA PROGRESSO
-  // =========================================================================
-  const novoProgresso = progressoRegistro.progresso + {request.incremento};
-  const atingiuMeta = novoProgresso >= desafio.meta;
-  const jaConcluido = progressoRegistro.concluido;
-
-  let fpGanhos = 0;
-
-  // Se completou agora (não estava concluído antes)
-  if (atingiuMeta && !jaConcluido) {{
-    // Atualiza progresso e marca como concluído
-    await prisma.usuarioChallenge.update({{
-      where: {{ id: progressoRegistro.id }},
-      data: {{
-        progresso: novoProgresso,
-        concluido: true
-      }}
-    }});
-
-    // Adiciona FP ao usuário
-    const fpAtual = usuario.pontosFP || 0;
-    await prisma.usuario.update({{
-      where: {{ id: usuario.id }},
-      data: {{ pontosFP: fpAtual + desafio.recompensaFP }}
-    }});
-
-    fpGanhos = desafio.recompensaFP;
-
-    console.log(JSON.stringify({{
-      success: true,
-      mensagem: `🎉 Desafio "${{desafio.titulo}}" concluído! +${{fpGanhos}} FP`,
-      progresso_atual: novoProgresso,
-      meta: desafio.meta,
-      concluido: true,
-      fp_ganhos: fpGanhos
-    }}));
-  }} else {{
-    // Apenas atualiza progresso
-    await prisma.usuarioChallenge.update({{
-      where: {{ id: progressoRegistro.id }},
-      data: {{ progresso: novoProgresso }}
-    }});
-
-    console.log(JSON.stringify({{
-      success: true,
-      mensagem: jaConcluido
-        ? "Desafio já foi concluído anteriormente"
-        : `Progresso atualizado: ${{novoProgresso}}/${{desafio.meta}}`,
-      progresso_atual: novoProgresso,
-      meta: desafio.meta,
-      concluido: atingiuMeta,
-      fp_ganhos: 0
-    }}));
-  }}
-}}
-
-main()
-  .catch(e => {{ console.error(e); process.exit(1); }})
-  .finally(() => prisma.$disconnect());
+        challengeId: desafio.id
+      }
+    });
+
+    if (!progressoRegistro) {
+      progressoRegistro = await tx.usuarioChallenge.create({
+        data: {
+          usuarioId: usuario.id,
+          challengeId: desafio.id,
+          progresso: 0,
+          concluido: false
+        }
+      });
+    }
+
+    // =====================================================================
+    // 4. INCREMENTA PROGRESSO (atômico: sem ler-somar-gravar)
+    // =====================================================================
+    const atualizado = await tx.usuarioChallenge.update({
+      where: { id: progressoRegistro.id },
+      data: { progresso: { increment: params.incremento } }
+    });
+    const novoProgresso = atualizado.progresso;
+    const atingiuMeta = novoProgresso >= desafio.meta;
+
+    let resultado;
+    let lancamento = null;
+
+    // Só quem vira concluido false -> true paga o prêmio (uma vez por desafio)
+    const conclusao = atingiuMeta
+      ? await tx.usuarioChallenge.updateMany({
+          where: { id: progressoRegistro.id, concluido: false },
+          data: { concluido: true }
+        })
+      : { count: 0 };
+
+    if (conclusao.count === 1) {
+      lancamento = await lancarFP(tx, usuario.id, desafio.recompensaFP, "desafio", desafio.id);
+
+      resultado = {
+        success: true,
+        mensagem: `🎉 Desafio "${desafio.titulo}" concluído! +${desafio.recompensaFP} FP`,
+        progresso_atual: novoProgresso,
+        meta: desafio.meta,
+        concluido: true,
+        fp_ganhos: desafio.recompensaFP
+      };
+    } else {
+      resultado = {
+        success: true,
+        mensagem: atualizado.concluido
+          ? "Desafio já foi concluído anteriormente"
+          : `Progresso atualizado: ${novoProgresso}/${desafio.meta}`,
+        progresso_atual: novoProgresso,
+        meta: desafio.meta,
+        concluido: atingiuMeta,
+        fp_ganhos: 0
+      };
+    }
+
+    await guardarResultado(tx, usuario.id, params.chave, resultado);
+
+    // fp_total/nivel só na resposta nova (sincroniza os agregados)
+    return lancamento
+      ? { ...resultado, fp_total: lancamento.saldo, nivel: lancamento.nivel }
+      : resultado;
+  });
+} catch (erro) {
+  // Mesma chave processada em paralelo: devolve o resultado da que venceu
+  if (params.chave && chaveRepetida(erro)) {
+    return await resultadoAnterior(prisma, usuario.id, params.chave);
+  }
+  throw erro;
+}
 '''
 
-    result = run_prisma_script(script)
+    result = await run_com_lancamentos(script, {
+        "email": request.user_id,
+        "challenge_id": request.challenge_id,
+        "incremento": request.incremento,
+        "chave": f"desafio:{idempotency_key}" if idempotency_key else None,
+    })
+
+    fp_total = result.pop('fp_total', None)
+    nivel = result.pop('nivel', None)
+    if fp_total is not None:
+        await em_thread(agregados_usuario.atualizar_fp, request.user_id, fp_total, nivel)
 
     if result.get('success'):
         logger.info(f"✅ {result['mensagem']}")
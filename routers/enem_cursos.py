@@ -3,12 +3,13 @@ Router para gerenciamento de cursos e notas de corte.
 Permite que usuários escolham curso alvo e comparem suas notas.
 """
 
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query
 from pydantic import BaseModel
-import subprocess
-import json
 from typing import Optional
 
+from indice_cursos import LIMITE_MAX, catalogo_cursos
+from prisma_bridge import run_prisma_script
+
 router = APIRouter()
 
 # ========================================
@@ -47,109 +48,40 @@ async def get_user_curso(user_id: str = Query(..., description="ID do usuário")
     Retorna o curso alvo do usuário.
     Se não tiver curso escolhido, retorna has_curso=false.
     """
-    script = f"""
-    import {{ PrismaClient }} from '@prisma/client';
-    const prisma = new PrismaClient();
-
-    try {{
-      const usuario = await prisma.usuario.findUnique({{
-        where: {{ id: "{user_id}" }},
-        include: {{ cursoAlvo: true }}
-      }});
-
-      if (!usuario || !usuario.cursoAlvo) {{
-        console.log(JSON.stringify({{ has_curso: false, curso: null }}));
-      }} else {{
-        console.log(JSON.stringify({{
-          has_curso: true,
-          curso: usuario.cursoAlvo
-        }}));
-      }}
-    }} catch (error) {{
-      console.error(JSON.stringify({{ error: error.message }}));
-      process.exit(1);
-    }} finally {{
-      await prisma.$disconnect();
-    }}
+    script = """
+    const usuario = await prisma.usuario.findUnique({
+      where: { id: params.user_id },
+      include: { cursoAlvo: true }
+    });
+
+    if (!usuario || !usuario.cursoAlvo) {
+      return { has_curso: false, curso: null };
+    }
+
+    return {
+      has_curso: true,
+      curso: usuario.cursoAlvo
+    };
     """
 
-    result = subprocess.run(
-        ["node", "--input-type=module", "-e", script],
-        capture_output=True,
-        text=True,
-        cwd="../enem-pro"
-    )
-
-    if result.returncode != 0:
-        raise HTTPException(status_code=500, detail=f"Erro ao buscar curso: {result.stderr}")
-
-    data = json.loads(result.stdout.strip())
-    return data
+    return await run_prisma_script(script, {"user_id": user_id})
 
 
 @router.get("/cursos", response_model=list[CourseResponse])
 async def list_cursos(
     search: Optional[str] = Query(None, description="Busca por nome do curso ou IES"),
-    limit: int = Query(50, description="Limite de resultados")
+    limit: int = Query(50, ge=1, le=LIMITE_MAX, description="Limite de resultados")
 ):
     """
     Lista cursos disponíveis com busca opcional.
-    Retorna cursos ativos ordenados por IES e nome.
-    """
-    # Construir cláusula WHERE dinamicamente
-    # NOTA: SQLite não suporta mode:'insensitive', então removemos
-    where_clause = ""
-    if search:
-        # Escapar aspas na busca
-        search_escaped = search.replace('"', '\\"').replace("'", "\\'")
-        where_clause = f"""
-        where: {{
-          ativo: true,
-          OR: [
-            {{ nome: {{ contains: "{search_escaped}" }} }},
-            {{ ies: {{ contains: "{search_escaped}" }} }},
-            {{ campus: {{ contains: "{search_escaped}" }} }}
-          ]
-        }},
-        """
-    else:
-        where_clause = "where: { ativo: true },"
-
-    script = f"""
-    import {{ PrismaClient }} from '@prisma/client';
-    const prisma = new PrismaClient();
-
-    try {{
-      const cursos = await prisma.course.findMany({{
-        {where_clause}
-        orderBy: [
-          {{ ies: 'asc' }},
-          {{ nome: 'asc' }}
-        ],
-        take: {limit}
-      }});
-
-      console.log(JSON.stringify(cursos));
-    }} catch (error) {{
-      console.error(JSON.stringify({{ error: error.message }}));
-      process.exit(1);
-    }} finally {{
-      await prisma.$disconnect();
-    }}
-    """
+    Sem busca, retorna cursos ativos ordenados por IES e nome.
 
-    result = subprocess.run(
-        ["node", "--input-type=module", "-e", script],
-        capture_output=True,
-        text=True,
-        cwd="../enem-pro"
-    )
-
-    if result.returncode != 0:
-        raise HTTPException(status_code=500, detail=f"Erro ao listar cursos: {result.stderr}")
-
-    cursos = json.loads(result.stdout.strip())
-    return cursos
+    A busca ignora acentos e maiúsculas e aceita prefixos em qualquer termo
+    ("medic sao" acha "Medicina - São Paulo"), ordenando por relevância.
+    Atende do índice em memória (ver indice_cursos.py).
+    """
+    catalogo = await catalogo_cursos.obter()
+    return catalogo.buscar(search, limit)
 
 
 @router.post("/user/curso", response_model=SetCourseResponse)
@@ -158,55 +90,33 @@ async def set_user_curso(req: SetCourseRequest):
     Define ou remove curso alvo do usuário.
     Se course_id for null, remove o curso alvo.
     """
-    # Construir valor para cursoAlvoId
-    curso_id_value = f'"{req.course_id}"' if req.course_id else 'null'
-
-    script = f"""
-    import {{ PrismaClient }} from '@prisma/client';
-    const prisma = new PrismaClient();
-
-    try {{
-      const usuario = await prisma.usuario.update({{
-        where: {{ id: "{req.user_id}" }},
-        data: {{ cursoAlvoId: {curso_id_value} }},
-        include: {{ cursoAlvo: true }}
-      }});
+    script = """
+    try {
+      const usuario = await prisma.usuario.update({
+        where: { id: params.user_id },
+        data: { cursoAlvoId: params.course_id },
+        include: { cursoAlvo: true }
+      });
 
       const mensagem = usuario.cursoAlvo
-        ? `Curso alvo definido: ${{usuario.cursoAlvo.nome}} - ${{usuario.cursoAlvo.ies}}`
+        ? `Curso alvo definido: ${usuario.cursoAlvo.nome} - ${usuario.cursoAlvo.ies}`
         : 'Curso alvo removido';
 
-      console.log(JSON.stringify({{
+      return {
         success: true,
         curso: usuario.cursoAlvo,
         mensagem: mensagem
-      }}));
-    }} catch (error) {{
-      console.error(JSON.stringify({{
+      };
+    } catch (error) {
+      return {
         success: false,
         curso: null,
-        mensagem: `Erro ao definir curso: ${{error.message}}`
-      }}));
-      process.exit(1);
-    }} finally {{
-      await prisma.$disconnect();
-    }}
+        mensagem: `Erro ao definir curso: ${error.message}`
+      };
+    }
     """
 
-    result = subprocess.run(
-        ["node", "--input-type=module", "-e", script],
-        capture_output=True,
-        text=True,
-        cwd="../enem-pro"
-    )
-
-    if result.returncode != 0:
-        # Tentar parsear mensagem de erro
-        try:
-            error_data = json.loads(result.stdout.strip())
-            return error_data
-        except:
-            raise HTTPException(status_code=500, detail=f"Erro ao definir curso: {result.stderr}")
-
-    data = json.loads(result.stdout.strip())
-    return data
+    return await run_prisma_script(script, {
+        "user_id": req.user_id,
+        "course_id": req.course_id,
+    })
@@ -8,28 +8,20 @@ ROTAS:
 - POST /api/enem/rewards/resgatar - Resgata recompensa com FP
 """
 
-import subprocess
-import json
 import logging
-from pathlib import Path
 from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, Query, Response
 from pydantic import BaseModel
 
+from agregados_usuario import agregados_usuario
+from catalogo_recompensas import CACHE_CONTROL, catalogo_recompensas
+from executores import em_thread
+from lancamentos_fp import run_com_lancamentos
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# ============================================================================
-# CONFIGURAÇÃO
-# ============================================================================
-
-PRISMA_PROJECT_PATH = Path(__file__).resolve().parent.parent.parent / "enem-pro"
-
-if not (PRISMA_PROJECT_PATH / "prisma" / "schema.prisma").exists():
-    logger.warning(f"Projeto Prisma não encontrado em {PRISMA_PROJECT_PATH}")
-    PRISMA_PROJECT_PATH = None
-
 # ============================================================================
 # MODELOS PYDANTIC
 # ============================================================================
@@ -56,44 +48,6 @@ class ResgatarResponse(BaseModel):
     fp_restante: int
     recompensa: Optional[Recompensa] = None
 
-# ============================================================================
-# HELPER FUNCTIONS
-# ============================================================================
-
-def run_prisma_script(script: str) -> dict:
-    """Executa script Node.js com Prisma e retorna resultado JSON"""
-    if not PRISMA_PROJECT_PATH:
-        raise HTTPException(status_code=500, detail="Prisma não configurado")
-
-    try:
-        result = subprocess.run(
-            ["node", "-e", script],
-            cwd=str(PRISMA_PROJECT_PATH),
-            capture_output=True,
-            text=True,
-            timeout=30,
-            env={**subprocess.os.environ, "DATABASE_URL": "file:./dev.db"}
-        )
-
-        if result.returncode != 0:
-            logger.error(f"Erro Prisma: {result.stderr}")
-            raise HTTPException(status_code=500, detail=f"Erro no banco: {result.stderr}")
-
-        output = result.stdout.strip()
-        if not output:
-            return {}
-
-        return json.loads(output)
-
-    except subprocess.TimeoutExpired:
-        raise HTTPException(status_code=504, detail="Timeout ao acessar banco")
-    except json.JSONDecodeError as e:
-        logger.error(f"Erro ao parsear JSON: {result.stdout}")
-        raise HTTPException(status_code=500, detail=f"Erro ao parsear resultado: {str(e)}")
-    except Exception as e:
-        logger.error(f"Erro inesperado: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
-
 # ============================================================================
 # ROUTER
 # ============================================================================
@@ -101,7 +55,7 @@ def run_prisma_script(script: str) -> dict:
 router = APIRouter()
 
 @router.get("/loja", response_model=LojaResponse)
-async def get_loja():
+async def get_loja(if_none_match: Optional[str] = Header(None)):
     """
     LISTA DE RECOMPENSAS DISPONÍVEIS NA LOJA
 
@@ -111,6 +65,10 @@ async def get_loja():
     - Emoji e categoria
     - Status de disponibilidade
 
+    ## Cache HTTP:
+    - Resposta com ETag forte (versão do catálogo) e Cache-Control
+    - Envie If-None-Match com o ETag recebido: 304 sem corpo se nada mudou
+
     ## Categorias:
     - **motivacao**: Frases e emojis motivacionais
     - **acesso**: Conteúdos premium ou funcionalidades
@@ -125,50 +83,21 @@ async def get_loja():
     // [{id: "clx1", titulo: "Emoji Exclusivo", custoFP: 100, emoji: "🌟"}]
     ```
     """
-    logger.info("🏪 Buscando recompensas disponíveis na loja")
+    # Catálogo em cache versionado (ver catalogo_recompensas.py)
+    catalogo = await catalogo_recompensas.obter()
+    cabecalhos = {"ETag": catalogo.etag, "Cache-Control": CACHE_CONTROL}
 
-    script = '''
-import { PrismaClient } from '@prisma/client';
-const prisma = new PrismaClient();
-
-async function main() {
-  // =========================================================================
-  // BUSCA TODAS AS RECOMPENSAS
-  // =========================================================================
-  const rewards = await prisma.reward.findMany({
-    orderBy: {
-      custoFP: 'asc' // Ordena por custo crescente
-    }
-  });
-
-  // =========================================================================
-  // FORMATA RESPOSTA
-  // =========================================================================
-  const recompensas = rewards.map(r => ({
-    id: r.id,
-    titulo: r.titulo,
-    descricao: r.descricao,
-    custoFP: r.custoFP,
-    emoji: r.emoji,
-    categoria: r.categoria,
-    disponivel: r.disponivel
-  }));
-
-  console.log(JSON.stringify({ recompensas }));
-}
-
-main()
-  .catch(e => { console.error(e); process.exit(1); })
-  .finally(() => prisma.$disconnect());
-'''
+    if catalogo.corresponde(if_none_match):
+        return Response(status_code=304, headers=cabecalhos)
 
-    result = run_prisma_script(script)
-    logger.info(f"✅ Encontradas {len(result.get('recompensas', []))} recompensas")
-
-    return result
+    logger.info(f"🏪 Loja enviada: {len(catalogo.recompensas)} recompensas")
+    return Response(content=catalogo.corpo, media_type="application/json", headers=cabecalhos)
 
 @router.post("/resgatar", response_model=ResgatarResponse)
-async def resgatar_recompensa(request: ResgatarRequest):
+async def resgatar_recompensa(
+    request: ResgatarRequest,
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+):
     """
     RESGATAR RECOMPENSA COM FOCUS POINTS
 
@@ -179,15 +108,21 @@ async def resgatar_recompensa(request: ResgatarRequest):
     2. Recompensa existe e está disponível
     3. FP >= custoFP da recompensa
 
-    ## Ações:
-    1. Deduz FP do usuário
-    2. Cria registro em UsuarioReward
-    3. Retorna FP restante
+    ## Ações (uma transação):
+    1. Deduz FP do usuário (débito condicional: nunca fica negativo)
+    2. Registra o lançamento no razão de FP e recalcula o nível
+    3. Cria registro em UsuarioReward
+    4. Retorna FP restante
+
+    ## Idempotência:
+    - Envie o header Idempotency-Key (ex: um UUID por clique em "resgatar")
+    - Repetir a mesma chave devolve o resultado original sem novo débito
 
     ## Exemplo de uso (Frontend):
     ```javascript
     const response = await fetch('/api/enem/rewards/resgatar', {
       method: 'POST',
+      headers: { 'Idempotency-Key': crypto.randomUUID() },
       body: JSON.stringify({
         user_id: 'user@example.com',
         reward_id: 'clx123'
@@ -202,114 +137,121 @@ async def resgatar_recompensa(request: ResgatarRequest):
     """
     logger.info(f"🎁 Tentando resgatar recompensa {request.reward_id} para {request.user_id}")
 
-    script = f'''
-import {{ PrismaClient }} from '@prisma/client';
-const prisma = new PrismaClient();
-
-async function main() {{
-  // =========================================================================
-  // 1. BUSCA USUÁRIO
-  // =========================================================================
-  const usuario = await prisma.usuario.findUnique({{
-    where: {{ email: "{request.user_id}" }}
-  }});
-
-  if (!usuario) {{
-    console.log(JSON.stringify({{
-      success: false,
-      mensagem: "Usuário não encontrado",
-      fp_restante: 0
-    }}));
-    return;
-  }}
-
-  // =========================================================================
-  // 2. BUSCA RECOMPENSA
-  // =========================================================================
-  const reward = await prisma.reward.findUnique({{
-    where: {{ id: "{request.reward_id}" }}
-  }});
-
-  if (!reward) {{
-    console.log(JSON.stringify({{
-      success: false,
-      mensagem: "Recompensa não encontrada",
-      fp_restante: usuario.pontosFP || 0
-    }}));
-    return;
-  }}
-
-  if (!reward.disponivel) {{
-    console.log(JSON.stringify({{
-      success: false,
-      mensagem: "Recompensa não está disponível no momento",
-      fp_restante: usuario.pontosFP || 0
-    }}));
-    return;
-  }}
-
-  // =========================================================================
-  // 3. VALIDA FP SUFICIENTE
-  // =========================================================================
-  const fpAtual = usuario.pontosFP || 0;
-
-  if (fpAtual < reward.custoFP) {{
-    console.log(JSON.stringify({{
-      success: false,
-      mensagem: `FP insuficiente. Você tem ${{fpAtual}} FP, mas precisa de ${{reward.custoFP}} FP`,
-      fp_restante: fpAtual
-    }}));
-    return;
-  }}
-
-  // =========================================================================
-  // 4. REALIZA RESGATE (TRANSAÇÃO)
-  // =========================================================================
-  const fpRestante = fpAtual - reward.custoFP;
-
-  // Atualiza FP do usuário
-  await prisma.usuario.update({{
-    where: {{ id: usuario.id }},
-    data: {{ pontosFP: fpRestante }}
-  }});
-
-  // Cria registro de resgate
-  await prisma.usuarioReward.create({{
-    data: {{
-      usuarioId: usuario.id,
-      rewardId: reward.id
-    }}
-  }});
-
-  // =========================================================================
-  // 5. RETORNA SUCESSO
-  // =========================================================================
-  console.log(JSON.stringify({{
-    success: true,
-    mensagem: `Recompensa "${{reward.titulo}}" resgatada com sucesso! 🎉`,
-    fp_restante: fpRestante,
-    recompensa: {{
-      id: reward.id,
-      titulo: reward.titulo,
-      descricao: reward.descricao,
-      custoFP: reward.custoFP,
-      emoji: reward.emoji,
-      categoria: reward.categoria,
-      disponivel: reward.disponivel
-    }}
-  }}));
-}}
-
-main()
-  .catch(e => {{ console.error(e); process.exit(1); }})
-  .finally(() => prisma.$disconnect());
+    script = '''
+// =========================================================================
+// 1. BUSCA USUÁRIO (e resultado anterior da mesma Idempotency-Key)
+// =========================================================================
+const usuario = await prisma.usuario.findUnique({
+  where: { email: params.email },
+  select: { id: true, pontosFP: true }
+});
+
+if (!usuario) {
+  return {
+    success: false,
+    mensagem: "Usuário não encontrado",
+    fp_restante: 0
+  };
+}
+
+const anterior = await resultadoAnterior(prisma, usuario.id, params.chave);
+if (anterior) return anterior;
+
+// =========================================================================
+// 2. BUSCA RECOMPENSA
+// =========================================================================
+const reward = await prisma.reward.findUnique({
+  where: { id: params.reward_id }
+});
+
+if (!reward) {
+  return {
+    success: false,
+    mensagem: "Recompensa não encontrada",
+    fp_restante: usuario.pontosFP || 0,
+    catalogo_desatualizado: true
+  };
+}
+
+if (!reward.disponivel) {
+  return {
+    success: false,
+    mensagem: "Recompensa não está disponível no momento",
+    fp_restante: usuario.pontosFP || 0,
+    catalogo_desatualizado: true
+  };
+}
+
+// =========================================================================
+// 3. DÉBITO CONDICIONAL + RESGATE (TRANSAÇÃO)
+// =========================================================================
+// O saldo é conferido pelo próprio UPDATE (WHERE pontosFP >= custo):
+// resgates simultâneos nunca gastam o mesmo FP
+try {
+  return await prisma.$transaction(async (tx) => {
+    const lancamento = await lancarFP(tx, usuario.id, -reward.custoFP, "resgate", reward.id);
+
+    if (!lancamento) {
+      const atual = await tx.usuario.findUnique({ where: { id: usuario.id }, select: { pontosFP: true } });
+      const fpAtual = atual.pontosFP || 0;
+      return {
+        success: false,
+        mensagem: `FP insuficiente. Você tem ${fpAtual} FP, mas precisa de ${reward.custoFP} FP`,
+        fp_restante: fpAtual
+      };
+    }
+
+    await tx.usuarioReward.create({
+      data: {
+        usuarioId: usuario.id,
+        rewardId: reward.id
+      }
+    });
+
+    const resultado = {
+      success: true,
+      mensagem: `Recompensa "${reward.titulo}" resgatada com sucesso! 🎉`,
+      fp_restante: lancamento.saldo,
+      recompensa: {
+        id: reward.id,
+        titulo: reward.titulo,
+        descricao: reward.descricao,
+        custoFP: reward.custoFP,
+        emoji: reward.emoji,
+        categoria: reward.categoria,
+        disponivel: reward.disponivel
+      }
+    };
+    await guardarResultado(tx, usuario.id, params.chave, resultado);
+
+    // nivel só na resposta nova (sincroniza os agregados; não vai para a chave)
+    return { ...resultado, nivel: lancamento.nivel };
+  });
+} catch (erro) {
+  // Mesma chave processada em paralelo: devolve o resultado da que venceu
+  if (params.chave && chaveRepetida(erro)) {
+    return await resultadoAnterior(prisma, usuario.id, params.chave);
+  }
+  throw erro;
+}
 '''
 
-    result = run_prisma_script(script)
+    result = await run_com_lancamentos(script, {
+        "email": request.user_id,
+        "reward_id": request.reward_id,
+        "chave": f"resgate:{idempotency_key}" if idempotency_key else None,
+    })
+
+    nivel = result.pop('nivel', None)
+    if nivel is not None:
+        await em_thread(agregados_usuario.atualizar_fp, request.user_id, result['fp_restante'], nivel)
 
     if result.get('success'):
         logger.info(f"✅ Resgate realizado: {result['mensagem']}")
     else:
         logger.warning(f"❌ Resgate falhou: {result['mensagem']}")
+        # A loja ofereceu algo que o banco não tem disponível: relê o catálogo
+        if result.pop('catalogo_desatualizado', False):
+            catalogo_recompensas.invalidar()
 
     return result
@@ -2,7 +2,7 @@
 Router de Simulados ENEM - API Completa
 
 Endpoints para criação, execução e avaliação de simulados do ENEM
-Integrado com Prisma (via subprocess Node.js)
+Integrado com Prisma (via sidecar Node.js compartilhado - prisma_bridge)
 
 ROTAS:
 - POST /api/enem/simulados/start - Iniciar novo simulado
@@ -10,12 +10,11 @@ ROTAS:
 - POST /api/enem/simulados/finish - Finalizar e calcular nota
 - GET  /api/enem/simulados/history - Histórico do usuário
 - POST /api/enem/simulados/compare-score - Comparar com nota de corte
+- POST /api/enem/simulados/compare-score/lote - Comparar uma nota com vários cursos
 """
 
-import subprocess
-import json
+import base64
 import logging
-from pathlib import Path
 from typing import List, Optional, Dict
 from datetime import datetime
 
@@ -24,20 +23,19 @@ from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel, Field
 
+import tri
+from agregados_usuario import AREA_MAPPING, agregados_usuario, garantir_usuario, registrar_finalizacao
+from banco_questoes import banco_questoes
+from buffer_respostas import JS_GRAVAR_RESPOSTAS, SIMULADO_FINALIZADO, buffer_respostas
+from executores import em_thread
+from motor_desafios import motor_desafios
+from notas_corte import tabela_notas_corte
+from prisma_bridge import run_prisma_script
+from questoes_vistas import bitmap_exclusao, indice_vistas
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# ============================================================================
-# CONFIGURAÇÃO
-# ============================================================================
-
-# Caminho do projeto Prisma (auto-detecta)
-PRISMA_PROJECT_PATH = Path(__file__).resolve().parent.parent.parent / "enem-pro"
-
-if not (PRISMA_PROJECT_PATH / "prisma" / "schema.prisma").exists():
-    logger.warning(f"Projeto Prisma não encontrado em {PRISMA_PROJECT_PATH}")
-    PRISMA_PROJECT_PATH = None
-
 # ============================================================================
 # MODELOS PYDANTIC (Request/Response)
 # ============================================================================
@@ -46,6 +44,7 @@ class StartSimuladoRequest(BaseModel):
     user_id: str = Field(..., description="ID do usuário (pode ser email temporário)")
     area: Optional[str] = Field(None, description="Disciplina/área específica (opcional)")
     quantidade: int = Field(10, ge=1, le=180, description="Quantidade de questões")
+    estratificar_por: Optional[str] = Field(None, description="Sorteio proporcional por 'area' ou 'dificuldade' (opcional)")
 
 class StartSimuladoResponse(BaseModel):
     simulado_id: str
@@ -62,9 +61,10 @@ class AnswerRequest(BaseModel):
 
 class AnswerResponse(BaseModel):
     ok: bool
-    resposta_id: int
+    resposta_id: Optional[int]  # None: resposta ainda no buffer (gravada em lote)
     questao_id: int
     alternativa_marcada: Optional[int]
+    pendente: bool = False
 
 class FinishRequest(BaseModel):
     user_id: str
@@ -85,6 +85,7 @@ class FinishResponse(BaseModel):
     total: int
     porcentagem: float
     nota: float
+    notas_por_area: Dict[str, float] = {}
     desempenho: str
     erros_detalhados: List[ErroDetalhado]
 
@@ -101,6 +102,25 @@ class CompareScoreResponse(BaseModel):
     nota_corte: Optional[float]
     diferenca: Optional[float]
     mensagem: str
+    curso: Optional[str] = None
+    universidade: Optional[str] = None
+    ano: Optional[int] = None
+    aproximado: bool = False  # True: nome do curso/universidade não era exato
+
+class CursoAlvo(BaseModel):
+    curso: str
+    universidade: str
+    ano: int = Field(2024, ge=2015, le=2030)
+
+class CompareScoreLoteRequest(BaseModel):
+    user_id: Optional[str] = None
+    simulado_id: Optional[str] = None
+    nota: Optional[float] = Field(None, ge=0, le=1000)
+    cursos: List[CursoAlvo] = Field(..., min_length=1, max_length=100)
+
+class CompareScoreLoteResponse(BaseModel):
+    nota_usuario: float
+    resultados: List[CompareScoreResponse]
 
 # ============================================================================
 # ROUTER
@@ -112,84 +132,11 @@ router = APIRouter(
 )
 
 # ============================================================================
-# FUNÇÕES AUXILIARES - PRISMA VIA NODE.JS
+# FUNÇÕES AUXILIARES
 # ============================================================================
 
-def run_prisma_script(script_content: str) -> Dict:
-    """
-    Executa script Node.js com Prisma Client
-
-    Args:
-        script_content: Código JavaScript/TypeScript a executar
-
-    Returns:
-        Resultado parseado (JSON)
-    """
-    if not PRISMA_PROJECT_PATH:
-        raise HTTPException(
-            status_code=500,
-            detail="Projeto Prisma não configurado. Verifique PRISMA_PROJECT_PATH."
-        )
-
-    # Cria script temporário
-    script_path = PRISMA_PROJECT_PATH / "scripts" / "temp_api_script.mjs"
-    script_path.parent.mkdir(parents=True, exist_ok=True)
-
-    with open(script_path, 'w', encoding='utf-8') as f:
-        f.write(script_content)
-
-    try:
-        # Executa via Node.js
-        result = subprocess.run(
-            ['node', str(script_path)],
-            cwd=str(PRISMA_PROJECT_PATH),
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            errors='replace'
-        )
-
-        # Remove script temp
-        script_path.unlink()
-
-        if result.returncode != 0:
-            logger.error(f"Erro Prisma: {result.stderr}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Erro ao executar operação no banco: {result.stderr[:200]}"
-            )
-
-        # Parse JSON da última linha da saída
-        output_lines = result.stdout.strip().split('\n')
-        for line in reversed(output_lines):
-            if line.strip().startswith('{') or line.strip().startswith('['):
-                return json.loads(line)
-
-        # Se não encontrou JSON, retorna erro
-        raise HTTPException(
-            status_code=500,
-            detail="Resposta do banco inválida (não é JSON)"
-        )
-
-    except json.JSONDecodeError as e:
-        logger.error(f"Erro ao parsear JSON: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Erro ao processar resposta do banco: {str(e)}"
-        )
-    except Exception as e:
-        logger.error(f"Erro ao executar script Prisma: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-
-def calcular_nota_tri(acertos: int, total: int) -> float:
-    """Calcula nota TRI simplificada (0-1000)"""
-    if total == 0:
-        return 0.0
-    porcentagem = (acertos / total) * 100
-    nota_base = 300
-    nota_por_acerto = 700 / total
-    nota = nota_base + (acertos * nota_por_acerto)
-    return round(nota, 2)
+# Modelo TRI mandado ao script do /finish (a nota sai na mesma transação)
+PARAMETROS_TRI = tri.parametros_sidecar()
 
 def classificar_desempenho(porcentagem: float) -> str:
     """Classifica desempenho"""
@@ -204,6 +151,98 @@ def classificar_desempenho(porcentagem: float) -> str:
     else:
         return "💪 Precisa Melhorar"
 
+async def reconstruir_questoes_vistas(usuario_id: str):
+    """
+    Monta o índice de questões vistas a partir do histórico (uma vez por usuário)
+
+    Usuários anteriores ao índice ainda não têm bitmap: lê as respostas
+    de todos os simulados, agrupadas pelo mês em que o simulado começou.
+    """
+    script = '''
+const simulados = await prisma.usuarioSimulado.findMany({
+  where: { usuarioId: params.usuario_id },
+  select: {
+    createdAt: true,
+    respostas: { select: { questaoId: true } }
+  }
+});
+
+return simulados.map(s => ({
+  periodo: new Date(s.createdAt).toISOString().slice(0, 7),
+  questao_ids: s.respostas.map(r => r.questaoId)
+}));
+'''
+
+    simulados = await run_prisma_script(script, {"usuario_id": usuario_id})
+
+    por_periodo: Dict[str, List[int]] = {}
+    for sim in simulados:
+        por_periodo.setdefault(sim["periodo"], []).extend(sim["questao_ids"])
+
+    await em_thread(indice_vistas.marcar_por_periodo, usuario_id, por_periodo)
+    logger.info(f"🧭 Índice de questões vistas reconstruído para {usuario_id} ({len(simulados)} simulados)")
+
+async def nota_do_simulado(usuario_simulado_id: str) -> float:
+    """Nota de um simulado finalizado (série local, ou banco se ainda não está nela)"""
+    nota = await em_thread(agregados_usuario.nota_do_simulado, usuario_simulado_id)
+    if nota is not None:
+        return nota
+
+    script = '''
+const us = await prisma.usuarioSimulado.findUnique({
+  where: { id: params.usuario_simulado_id }
+});
+
+if (!us || us.status !== "finalizado") {
+  throw new Error("Simulado não finalizado ou não encontrado");
+}
+
+return {nota: us.nota};
+'''
+
+    result = await run_prisma_script(script, {"usuario_simulado_id": usuario_simulado_id})
+    return result['nota']
+
+def comparar_com_corte(nota_usuario: float, corte: Optional[Dict], curso: str,
+                       universidade: str, ano: int) -> Dict:
+    """Resultado de /compare-score para uma nota de corte (ou None)"""
+    if corte is None:
+        return {
+            "curso": curso,
+            "universidade": universidade,
+            "ano": ano,
+            "passou": False,
+            "nota_usuario": nota_usuario,
+            "nota_corte": None,
+            "diferenca": None,
+            "aproximado": False,
+            "mensagem": f"Nota de corte não disponível para {curso} - {universidade} ({ano})"
+        }
+
+    nota_corte = corte['nota_minima']
+    passou = nota_usuario >= nota_corte
+    diferenca = round(nota_usuario - nota_corte, 2)
+
+    if passou:
+        mensagem = f"🎉 Parabéns! Sua nota ({nota_usuario}) está {abs(diferenca)} pontos acima da nota de corte ({nota_corte})."
+    else:
+        mensagem = f"📚 Continue estudando! Você precisa de {abs(diferenca)} pontos a mais. Nota de corte: {nota_corte}, sua nota: {nota_usuario}."
+
+    if corte['aproximado']:
+        mensagem += f" (Comparado com {corte['curso']} - {corte['universidade']})"
+
+    return {
+        "curso": corte['curso'],
+        "universidade": corte['universidade'],
+        "ano": ano,
+        "passou": passou,
+        "nota_usuario": nota_usuario,
+        "nota_corte": nota_corte,
+        "diferenca": diferenca,
+        "aproximado": corte['aproximado'],
+        "mensagem": mensagem
+    }
+
 # ============================================================================
 # ENDPOINTS
 # ============================================================================
@@ -214,7 +253,7 @@ async def start_simulado(req: StartSimuladoRequest):
     INICIA NOVO SIMULADO
 
     1. Busca ou cria usuário
-    2. Seleciona N questões aleatórias do banco
+    2. Sorteia N questões (banco em memória, evitando as já vistas)
     3. Cria Simulado e UsuarioSimulado
     4. Retorna ID + questões
 
@@ -236,191 +275,122 @@ async def start_simulado(req: StartSimuladoRequest):
     """
     logger.info(f"📝 Iniciando simulado para usuário {req.user_id}")
 
-    script = f'''
-import {{ PrismaClient }} from '@prisma/client';
-const prisma = new PrismaClient();
-
-async function main() {{
-  // =========================================================================
-  // 1. BUSCA OU CRIA USUÁRIO
-  // =========================================================================
-  let usuario = await prisma.usuario.findUnique({{
-    where: {{ email: "{req.user_id}" }}
-  }});
-
-  if (!usuario) {{
-    usuario = await prisma.usuario.create({{
-      data: {{
-        email: "{req.user_id}",
-        nome: "Usuário ENEM",
-        senha: "$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewY5R8RZJqZqI7S2" // Hash de "senha123"
-      }}
-    }});
-  }}
-
-  // =========================================================================
-  // 2. BUSCA IDs DE QUESTÕES JÁ RESPONDIDAS PELO USUÁRIO
-  // =========================================================================
-  // Objetivo: NUNCA repetir questões que o usuário já viu em simulados anteriores
-  //
-  // Lógica:
-  // - Busca todos os simulados anteriores do usuário
-  // - Para cada simulado, pega todas as respostas
-  // - Acumula IDs únicos de questões já respondidas
-  //
-  // CUSTOMIZAÇÃO: Para alterar a política de repetição, modifique esta query:
-  // - Adicionar filtro por data (ex: últimos 30 dias)
-  // - Adicionar filtro por área/disciplina
-  // - Permitir repetição após X tempo ou Y simulados
-
-  const simuladosAnteriores = await prisma.usuarioSimulado.findMany({{
-    where: {{
-      usuarioId: usuario.id,
-      // OPCIONAL: Adicionar filtros aqui para customizar política
-      // status: "finalizado",  // Apenas simulados finalizados
-      // createdAt: {{ gte: new Date(Date.now() - 30*24*60*60*1000) }}  // Últimos 30 dias
-    }},
-    include: {{
-      respostas: {{
-        select: {{
-          questaoId: true
-        }}
-      }}
-    }}
-  }});
-
-  // Acumula IDs de questões já respondidas (SEM duplicatas)
-  const questoesJaRespondidas = new Set();
-  for (const sim of simuladosAnteriores) {{
-    for (const resp of sim.respostas) {{
-      questoesJaRespondidas.add(resp.questaoId);
-    }}
-  }}
-
-  console.error(`[INFO] Usuário ${{usuario.id}} já respondeu ${{questoesJaRespondidas.size}} questões únicas`);
-
-  // =========================================================================
-  // 3. SELECIONA QUESTÕES NOVAS (NÃO RESPONDIDAS)
-  // =========================================================================
-  // Estratégia:
-  // 1. Primeiro tenta buscar apenas questões NOVAS
-  // 2. Se não houver questões suficientes, usa FALLBACK (permite repetição)
-  //
-  // CUSTOMIZAÇÃO: Altere o critério de seleção aqui:
-  // - Mudar ordenação (random, por dificuldade, por área)
-  // - Adicionar filtros (disciplina, ano, tipo)
-
-  const whereFilter = {{
-    {f'disciplina: "{req.area}",' if req.area else ''}
-    id: {{
-      notIn: Array.from(questoesJaRespondidas)  // Exclui questões já respondidas
-    }}
-  }};
-
-  let questoes = await prisma.questao.findMany({{
-    where: whereFilter,
-    take: {req.quantidade}
-    // NOTA: Para seleção verdadeiramente aleatória, use extensão Prisma ou raw query
-    // Por ora, pega as primeiras N questões não respondidas
-  }});
-
-  // =========================================================================
-  // 4. FALLBACK: Se não houver questões novas suficientes
-  // =========================================================================
-  // Permite repetição APENAS se não houver questões novas disponíveis
-  //
-  // CUSTOMIZAÇÃO: Ajuste o comportamento do fallback:
-  // - Lançar erro em vez de permitir repetição
-  // - Pegar questões respondidas há mais tempo
-  // - Priorizar questões erradas para revisão
-
-  if (questoes.length < {req.quantidade}) {{
-    console.error(`[WARNING] Apenas ${{questoes.length}} questões novas disponíveis. Solicitadas: {req.quantidade}`);
-    console.error(`[WARNING] Usando FALLBACK: permitindo repetição de questões antigas`);
-
-    // Busca questões adicionais (incluindo já respondidas)
-    const questoesFallback = await prisma.questao.findMany({{
-      where: {{
-        {f'disciplina: "{req.area}",' if req.area else ''}
-        id: {{
-          notIn: questoes.map(q => q.id)  // Evita duplicatas DENTRO deste simulado
-        }}
-      }},
-      take: {req.quantidade} - questoes.length
-    }});
-
-    questoes = [...questoes, ...questoesFallback];
-    console.error(`[INFO] Total após fallback: ${{questoes.length}} questões`);
-  }}
-
-  if (questoes.length === 0) {{
-    throw new Error("Nenhuma questão disponível no banco");
-  }}
-
-  // =========================================================================
-  // 5. CRIA SIMULADO
-  // =========================================================================
-  const simulado = await prisma.simulado.create({{
-    data: {{
-      disciplina: "{req.area or 'geral'}"
-    }}
-  }});
-
-  // =========================================================================
-  // 6. VINCULA QUESTÕES AO SIMULADO
-  // =========================================================================
-  // Garante que não haja duplicatas DENTRO do mesmo simulado
-  const questoesUnicas = Array.from(new Set(questoes.map(q => q.id)))
-    .map(id => questoes.find(q => q.id === id));
-
-  for (const q of questoesUnicas) {{
-    await prisma.simuladoQuestao.create({{
-      data: {{
-        simuladoId: simulado.id,
-        questaoId: q.id
-      }}
-    }});
-  }}
-
-  // =========================================================================
-  // 7. CRIA USUARIOSIMULADO (VÍNCULO USUÁRIO-SIMULADO)
-  // =========================================================================
-  const usuarioSimulado = await prisma.usuarioSimulado.create({{
-    data: {{
-      usuarioId: usuario.id,
-      simuladoId: simulado.id,
-      total: questoesUnicas.length
-    }}
-  }});
+    # 1. Busca ou cria usuário
+    script_usuario = '''
+let usuario = await prisma.usuario.findUnique({
+  where: { email: params.email },
+  select: { id: true }
+});
+
+if (!usuario) {
+  usuario = await prisma.usuario.create({
+    data: {
+      email: params.email,
+      nome: "Usuário ENEM",
+      senha: "$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewY5R8RZJqZqI7S2" // Hash de "senha123"
+    },
+    select: { id: true }
+  });
+}
+
+return { usuario_id: usuario.id };
+'''
 
-  console.error(`[SUCCESS] Simulado ${{simulado.id}} criado com ${{questoesUnicas.length}} questões únicas`);
+    usuario = await run_prisma_script(script_usuario, {"email": req.user_id})
+    usuario_id = usuario["usuario_id"]
 
-  // =========================================================================
-  // 8. RETORNA DADOS PARA API
-  // =========================================================================
-  const result = {{
-    simulado_id: simulado.id,
-    usuario_simulado_id: usuarioSimulado.id,
-    quantidade: questoesUnicas.length,
-    disciplina: simulado.disciplina,
-    questoes_novas: questoesUnicas.length - (questoes.length - questoesUnicas.length),
-    questoes_repetidas: questoes.length > questoesUnicas.length ? questoes.length - questoesUnicas.length : 0,
-    questoes: questoesUnicas.map(q => ({{
-      id: q.id,
-      enunciado: q.enunciado,
-      alternativas: JSON.parse(q.alternativas)
-    }}))
-  }};
-
-  console.log(JSON.stringify(result));
-}}
-
-main()
-  .catch(e => {{ console.error(e); process.exit(1); }})
-  .finally(() => prisma.$disconnect());
+    # 2. Questões já vistas (bitmap por usuário, ver questoes_vistas.py)
+    if not await em_thread(indice_vistas.possui, usuario_id):
+        await reconstruir_questoes_vistas(usuario_id)
+
+    excluir = await em_thread(bitmap_exclusao, usuario_id, req.area)
+
+    # 3-4. Sorteia no banco em memória (ver banco_questoes.py): novas
+    #      primeiro, completa com repetidas se faltar
+    banco = await banco_questoes.obter()
+    try:
+        selecionadas, questoes_repetidas = banco.amostrar(
+            req.quantidade,
+            excluir,
+            disciplina=req.area,
+            estratificar_por=req.estratificar_por,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not selecionadas:
+        raise HTTPException(status_code=404, detail="Nenhuma questão disponível no banco")
+
+    if questoes_repetidas > 0:
+        logger.warning(f"⚠️  Apenas {len(selecionadas) - questoes_repetidas} questões novas disponíveis. Solicitadas: {req.quantidade}")
+
+    script = '''
+const questoes = await prisma.questao.findMany({
+  where: { id: { in: params.questao_ids } }
+});
+
+// Mantém a ordem da seleção
+const porId = new Map(questoes.map(q => [q.id, q]));
+const questoesUnicas = params.questao_ids.map(id => porId.get(id)).filter(Boolean);
+
+// =========================================================================
+// 5-7. CRIA SIMULADO, VINCULA QUESTÕES E CRIA USUARIOSIMULADO
+// =========================================================================
+// Uma transação e um INSERT multi-linha para os vínculos, em vez de um
+// create sequencial por questão (180 idas ao banco num simulado completo)
+const { simulado, usuarioSimulado } = await prisma.$transaction(async (tx) => {
+  const simulado = await tx.simulado.create({
+    data: {
+      disciplina: params.area || "geral"
+    }
+  });
+
+  await tx.simuladoQuestao.createMany({
+    data: questoesUnicas.map(q => ({
+      simuladoId: simulado.id,
+      questaoId: q.id
+    }))
+  });
+
+  const usuarioSimulado = await tx.usuarioSimulado.create({
+    data: {
+      usuarioId: params.usuario_id,
+      simuladoId: simulado.id,
+      total: questoesUnicas.length
+    }
+  });
+
+  return { simulado, usuarioSimulado };
+});
+
+console.error(`[SUCCESS] Simulado ${simulado.id} criado com ${questoesUnicas.length} questões únicas`);
+
+// =========================================================================
+// 8. RETORNA DADOS PARA API
+// =========================================================================
+const result = {
+  simulado_id: simulado.id,
+  usuario_simulado_id: usuarioSimulado.id,
+  quantidade: questoesUnicas.length,
+  disciplina: simulado.disciplina,
+  questoes_novas: questoesUnicas.length - params.questoes_repetidas,
+  questoes_repetidas: params.questoes_repetidas,
+  questoes: questoesUnicas.map(q => ({
+    id: q.id,
+    enunciado: q.enunciado,
+    alternativas: JSON.parse(q.alternativas)
+  }))
+};
+
+return result;
 '''
 
-    result = run_prisma_script(script)
+    result = await run_prisma_script(script, {
+        "usuario_id": usuario_id,
+        "area": req.area,
+        "questao_ids": selecionadas,
+        "questoes_repetidas": questoes_repetidas,
+    })
 
     # Log detalhado da seleção de questões
     quantidade = result.get('quantidade', 0)
@@ -447,6 +417,10 @@ async def answer_question(req: AnswerRequest):
     Grava ou atualiza resposta do usuário.
     Não calcula nota ainda.
 
+    A resposta é confirmada assim que entra no diário local e vai para o
+    banco em lote (no máximo RESPOSTAS_FLUSH_SECONDS depois, ou no /finish).
+    Simulado inexistente: 404; já finalizado: 409.
+
     ## Exemplo de uso (Frontend):
     ```javascript
     // Quando usuário marca alternativa
@@ -464,59 +438,24 @@ async def answer_question(req: AnswerRequest):
     """
     logger.info(f"💬 Resposta: usuário {req.user_id}, questão {req.questao_id}, alternativa {req.alternativa_marcada}")
 
-    alt_value = req.alternativa_marcada if req.alternativa_marcada is not None else 'null'
-
-    script = f'''
-import {{ PrismaClient }} from '@prisma/client';
-const prisma = new PrismaClient();
-
-async function main() {{
-  // Verifica se já existe resposta
-  const existente = await prisma.usuarioResposta.findFirst({{
-    where: {{
-      usuarioSimuladoId: "{req.simulado_id}",
-      questaoId: {req.questao_id}
-    }}
-  }});
-
-  let resposta;
-
-  if (existente) {{
-    // Atualiza
-    resposta = await prisma.usuarioResposta.update({{
-      where: {{ id: existente.id }},
-      data: {{
-        alternativaMarcada: {alt_value}
-      }}
-    }});
-  }} else {{
-    // Cria nova
-    resposta = await prisma.usuarioResposta.create({{
-      data: {{
-        usuarioSimuladoId: "{req.simulado_id}",
-        questaoId: {req.questao_id},
-        alternativaMarcada: {alt_value}
-      }}
-    }});
-  }}
-
-  const result = {{
-    ok: true,
-    resposta_id: resposta.id,
-    questao_id: resposta.questaoId,
-    alternativa_marcada: resposta.alternativaMarcada
-  }};
-
-  console.log(JSON.stringify(result));
-}}
-
-main()
-  .catch(e => {{ console.error(e); process.exit(1); }})
-  .finally(() => prisma.$disconnect());
-'''
-
-    result = run_prisma_script(script)
-    logger.info(f"✅ Resposta salva (ID {result['resposta_id']})")
+    status = await buffer_respostas.status_do_simulado(req.simulado_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Simulado não encontrado")
+    if status == SIMULADO_FINALIZADO:
+        raise HTTPException(status_code=409, detail="Simulado já finalizado: resposta não registrada")
+
+    # Write-behind: anota no diário e responde; a gravação no banco é em
+    # lote (ver buffer_respostas.py) e sempre acontece antes do /finish
+    await buffer_respostas.registrar(req.simulado_id, req.questao_id, req.alternativa_marcada)
+
+    result = {
+        "ok": True,
+        "resposta_id": None,
+        "questao_id": req.questao_id,
+        "alternativa_marcada": req.alternativa_marcada,
+        "pendente": True,
+    }
+    logger.info(f"✅ Resposta registrada (questão {req.questao_id})")
 
     return JSONResponse(content=jsonable_encoder(result))
 
@@ -525,11 +464,17 @@ async def finish_simulado(req: FinishRequest):
     """
     FINALIZA SIMULADO E CALCULA NOTA
 
+    Tudo em UMA transação no banco:
     1. Busca todas as respostas do usuário
     2. Busca gabaritos corretos
-    3. Calcula acertos/erros
-    4. Calcula nota TRI
-    5. Atualiza UsuarioSimulado com status=finalizado
+    3. Grava respostas ainda pendentes no buffer do /answer
+    4. Calcula acertos/erros e a nota TRI (3PL por área, ver tri.py)
+    5. Atualiza UsuarioSimulado com status=finalizado e a nota
+    6. Retorna curso alvo do dono do simulado para comparação
+
+    Só o dono (user_id) finaliza o simulado (403 para outro usuário). Um
+    simulado já finalizado não é regravado: a resposta traz a nota e a data
+    guardadas.
 
     ## Exemplo de uso (Frontend):
     ```javascript
@@ -552,163 +497,215 @@ async def finish_simulado(req: FinishRequest):
     """
     logger.info(f"🏁 Finalizando simulado {req.simulado_id}")
 
-    script = f'''
-import {{ PrismaClient }} from '@prisma/client';
-const prisma = new PrismaClient();
-
-async function main() {{
-  // 1. Busca UsuarioSimulado
-  const usuarioSimulado = await prisma.usuarioSimulado.findUnique({{
-    where: {{ id: "{req.simulado_id}" }},
-    include: {{
-      respostas: true
-    }}
-  }});
-
-  if (!usuarioSimulado) {{
-    throw new Error("Simulado não encontrado");
-  }}
-
-  // 2. Busca simulado e questões
-  const simulado = await prisma.simulado.findUnique({{
-    where: {{ id: usuarioSimulado.simuladoId }},
-    include: {{
-      questoes: {{
-        include: {{
+    # Uma única ida ao banco: lê respostas + gabarito, pontua, grava o
+    # resultado e devolve o curso alvo do DONO do simulado, tudo na mesma
+    # transação (antes eram 3 scripts separados e busca O(n²) das respostas).
+    # A nota TRI sai no próprio script (tri.JS_NOTA_TRI com o modelo vindo
+    # de tri.parametros_sidecar), então status e nota são gravados juntos.
+    script = JS_GRAVAR_RESPOSTAS + tri.JS_NOTA_TRI + '''
+function areaDaDisciplina(disciplina) {
+  return params.areas[(disciplina || "geral").toLowerCase()] ?? "Geral";
+}
+
+return await prisma.$transaction(async (tx) => {
+  // 1. Busca UsuarioSimulado com respostas e curso alvo do dono
+  const usuarioSimulado = await tx.usuarioSimulado.findUnique({
+    where: { id: params.usuario_simulado_id },
+    include: {
+      respostas: true,
+      usuario: { include: { cursoAlvo: true } }
+    }
+  });
+
+  if (!usuarioSimulado) {
+    return { error: "Simulado não encontrado", status: 404 };
+  }
+  if (usuarioSimulado.usuario?.email !== params.email) {
+    return { error: "Simulado pertence a outro usuário", status: 403 };
+  }
+
+  // Finalizar de novo (retry do cliente) não regrava nada: devolve o
+  // resultado guardado, com a mesma nota e data dos agregados
+  const jaFinalizado = usuarioSimulado.status === "finalizado";
+
+  // 2. Busca questões do simulado (gabarito)
+  const simulado = await tx.simulado.findUnique({
+    where: { id: usuarioSimulado.simuladoId },
+    include: {
+      questoes: {
+        include: {
           questao: true
-        }}
-      }}
-    }}
-  }});
+        }
+      }
+    }
+  });
+
+  // 3. Grava respostas ainda no buffer (só questões deste simulado)
+  const doSimulado = new Set(simulado.questoes.map(sq => sq.questaoId));
+  const pendentes = jaFinalizado ? [] : params.pendentes.filter(r => doSimulado.has(r.questao_id));
+  await gravarRespostas(tx, pendentes);
+
+  // 4. Calcula acertos (hash-join questaoId -> alternativa marcada)
+  const marcadas = new Map(
+    usuarioSimulado.respostas.map(r => [r.questaoId, r.alternativaMarcada])
+  );
+  for (const r of pendentes) {
+    marcadas.set(r.questao_id, r.alternativa_marcada);
+  }
 
-  // 3. Calcula acertos
   let acertos = 0;
-  let total = simulado.questoes.length;
+  const total = simulado.questoes.length;
   const errosDetalhados = [];
+  const itens = [];
 
-  for (const sq of simulado.questoes) {{
+  for (const sq of simulado.questoes) {
     const questao = sq.questao;
-    const resposta = usuarioSimulado.respostas.find(r => r.questaoId === questao.id);
-
-    const marcada = resposta?.alternativaMarcada ?? null;
+    const marcada = marcadas.get(questao.id) ?? null;
     const correta = questao.correta;
-    const isCorreto = marcada === correta;
 
-    if (isCorreto) {{
+    // Em branco conta como erro na TRI
+    itens.push({
+      acertou: marcada === correta,
+      dificuldade: questao.difficulty ?? questao.dificuldade ?? null,
+      area: questao.area || areaDaDisciplina(questao.disciplina || simulado.disciplina)
+    });
+
+    if (marcada === correta) {
       acertos++;
-    }} else {{
-      errosDetalhados.push({{
+    } else {
+      errosDetalhados.push({
         questao_id: questao.id,
         enunciado: questao.enunciado,
         alternativas: JSON.parse(questao.alternativas),
         correta: correta,
         marcada: marcada
-      }});
-    }}
-  }}
+      });
+    }
+  }
 
-  // 4. Calcula porcentagem
+  // 5. Porcentagem e nota TRI
   const porcentagem = total > 0 ? (acertos / total) * 100 : 0;
+  const tri = notaTri(itens, params.tri);
+  const notas_por_area = tri.notas_por_area;
+  let nota = usuarioSimulado.nota;
+  let finishedAt = usuarioSimulado.finishedAt;
+
+  // 6. Grava resultado final
+  if (!jaFinalizado) {
+    nota = tri.nota;
+    finishedAt = new Date();
+    await tx.usuarioSimulado.update({
+      where: { id: usuarioSimulado.id },
+      data: {
+        status: "finalizado",
+        nota: nota,
+        acertos: acertos,
+        finishedAt: finishedAt
+      }
+    });
+  }
 
-  // Resultado
-  const result = {{
+  return {
     ok: true,
     usuario_simulado_id: usuarioSimulado.id,
     acertos: acertos,
     erros: total - acertos,
     total: total,
     porcentagem: parseFloat(porcentagem.toFixed(2)),
-    erros_detalhados: errosDetalhados
-  }};
-
-  console.log(JSON.stringify(result));
-}}
-
-main()
-  .catch(e => {{ console.error(e); process.exit(1); }})
-  .finally(() => prisma.$disconnect());
+    nota: nota,
+    notas_por_area: notas_por_area,
+    erros_detalhados: errosDetalhados,
+    curso_alvo: usuarioSimulado.usuario?.cursoAlvo ?? null,
+    usuario_id: usuarioSimulado.usuarioId,
+    questoes_respondidas: Array.from(marcadas.keys()),
+    ja_finalizado: jaFinalizado,
+    disciplina: simulado.disciplina,
+    finished_at: finishedAt ? new Date(finishedAt).toISOString() : null
+  };
+});
 '''
 
-    result = run_prisma_script(script)
-
-    # Calcula nota TRI
-    nota = calcular_nota_tri(result['acertos'], result['total'])
-    desempenho = classificar_desempenho(result['porcentagem'])
-
-    result['nota'] = nota
-    result['desempenho'] = desempenho
-
-    # Busca curso alvo do usuário e compara
-    curso_script = f'''
-import {{ PrismaClient }} from '@prisma/client';
-const prisma = new PrismaClient();
-
-async function main() {{
-  const usuario = await prisma.usuario.findUnique({{
-    where: {{ id: "{req.user_id}" }},
-    include: {{ cursoAlvo: true }}
-  }});
-
-  console.log(JSON.stringify(usuario?.cursoAlvo || null));
-}}
-
-main()
-  .catch(e => {{ console.error(e); process.exit(1); }})
-  .finally(() => prisma.$disconnect());
-'''
+    # Respostas pendentes no buffer entram na mesma transação da nota (o
+    # simulado fica reservado: a descarga periódica não grava as dele)
+    async with buffer_respostas.finalizacao(req.simulado_id) as pendentes:
+        result = await run_prisma_script(script, {
+            "usuario_simulado_id": req.simulado_id,
+            "email": req.user_id,
+            "pendentes": pendentes,
+            "tri": PARAMETROS_TRI,
+            "areas": AREA_MAPPING,
+        })
+        if not result.get('error'):
+            buffer_respostas.marcar_finalizado(req.simulado_id)
+            await buffer_respostas.confirmar(pendentes)
+
+    if result.get('error'):
+        logger.warning(f"⚠️ /finish recusado para {req.user_id}: {result['error']}")
+        raise HTTPException(status_code=result['status'], detail=result['error'])
+
+    usuario_id = result.pop('usuario_id')
+    ja_finalizado = result.pop('ja_finalizado')
+    finished_at = result.pop('finished_at')
+    disciplina = result.pop('disciplina')
+
+    # Garante o índice de questões vistas em dia (idempotente)
+    await em_thread(indice_vistas.marcar, usuario_id, result.pop('questoes_respondidas'))
+
+    # Agregados de /usuario/stats, /stats/por-area e /stats/evolucao em O(1)
+    # (só na primeira finalização)
+    if not ja_finalizado:
+        await registrar_finalizacao(usuario_id, {
+            "id": result['usuario_simulado_id'],
+            "nota": result['nota'],
+            "acertos": result['acertos'],
+            "total": result['total'],
+            "disciplina": disciplina,
+            "finished_at": finished_at,
+        })
+
+        # Evento para o progresso dos desafios semanais (gravado em lote)
+        await motor_desafios.registrar_simulado(
+            req.user_id, usuario_id, result['acertos'], result['total'], finished_at
+        )
 
-    curso_result = run_prisma_script(curso_script)
-    curso_alvo = curso_result if curso_result and isinstance(curso_result, dict) else None
+    nota = result['nota']
+    result['desempenho'] = classificar_desempenho(result['porcentagem'])
 
     # Comparar nota com curso alvo
+    curso_alvo = result['curso_alvo']
     atingiu_nota_corte = False
     diferenca_nota = None
 
-    if curso_alvo and 'notaCorte' in curso_alvo:
+    if curso_alvo and curso_alvo.get('notaCorte') is not None:
         diferenca_nota = nota - curso_alvo['notaCorte']
         atingiu_nota_corte = diferenca_nota >= 0
         logger.info(f"📊 Comparação com curso: {curso_alvo['nome']} - {curso_alvo['ies']} (Nota de corte: {curso_alvo['notaCorte']})")
         logger.info(f"{'✅' if atingiu_nota_corte else '⚠️'} Diferença: {diferenca_nota:+.1f} pontos")
 
-    result['curso_alvo'] = curso_alvo
     result['atingiu_nota_corte'] = atingiu_nota_corte
     result['diferenca_nota'] = diferenca_nota
 
-    # Atualiza banco com nota final
-    update_script = f'''
-import {{ PrismaClient }} from '@prisma/client';
-const prisma = new PrismaClient();
-
-async function main() {{
-  await prisma.usuarioSimulado.update({{
-    where: {{ id: "{req.simulado_id}" }},
-    data: {{
-      status: "finalizado",
-      nota: {nota},
-      acertos: {result['acertos']},
-      finishedAt: new Date()
-    }}
-  }});
-  console.log(JSON.stringify({{ok: true}}));
-}}
-
-main()
-  .catch(e => {{ console.error(e); process.exit(1); }})
-  .finally(() => prisma.$disconnect());
-'''
-
-    run_prisma_script(update_script)
-
     logger.info(f"✅ Simulado finalizado: {result['acertos']}/{result['total']} acertos, nota {nota}")
 
     return JSONResponse(content=jsonable_encoder(result))
 
 @router.get("/history")
-async def get_history(user_id: str = Query(..., description="Email/ID do usuário")):
+async def get_history(
+    user_id: str = Query(..., description="Email/ID do usuário"),
+    limit: int = Query(20, ge=1, le=100, description="Simulados por página"),
+    cursor: Optional[str] = Query(None, description="proximo_cursor da página anterior"),
+    area: Optional[str] = Query(None, description="Só simulados de uma área (ex: Matemática)"),
+    inicio: Optional[str] = Query(None, description="Data inicial (AAAA-MM-DD)"),
+    fim: Optional[str] = Query(None, description="Data final (AAAA-MM-DD)")
+):
     """
     HISTÓRICO DE SIMULADOS DO USUÁRIO
 
-    Retorna últimos simulados realizados com notas e datas.
+    Retorna simulados realizados com notas e datas, mais recentes primeiro.
+
+    Paginação por cursor (finishedAt, id): o custo de cada página é o mesmo
+    na primeira ou na centésima. Lido numa única consulta da série mantida
+    no /finish (ver agregados_usuario.py), sem busca por simulado.
 
     ## Exemplo de uso (Frontend):
     ```javascript
@@ -717,70 +714,44 @@ async def get_history(user_id: str = Query(..., description="Email/ID do usuári
 
     // historico.simulados - array com:
     // [{id, disciplina, nota, acertos, total, porcentagem, data}]
+    // historico.proximo_cursor - passe em ?cursor= para a próxima página (null no fim)
     ```
     """
     logger.info(f"📊 Buscando histórico de {user_id}")
 
-    script = f'''
-import {{ PrismaClient }} from '@prisma/client';
-const prisma = new PrismaClient();
-
-async function main() {{
-  // Busca usuário
-  const usuario = await prisma.usuario.findUnique({{
-    where: {{ email: "{user_id}" }}
-  }});
-
-  if (!usuario) {{
-    console.log(JSON.stringify({{simulados: []}}));
-    return;
-  }}
-
-  // Busca simulados finalizados
-  const simulados = await prisma.usuarioSimulado.findMany({{
-    where: {{
-      usuarioId: usuario.id,
-      status: "finalizado"
-    }},
-    orderBy: {{
-      finishedAt: 'desc'
-    }},
-    take: 20,
-    include: {{
-      usuario: true
-    }}
-  }});
-
-  // Busca dados do simulado original
-  const result = [];
-  for (const us of simulados) {{
-    const sim = await prisma.simulado.findUnique({{
-      where: {{ id: us.simuladoId }}
-    }});
-
-    result.push({{
-      id: us.id,
-      disciplina: sim?.disciplina || 'geral',
-      nota: us.nota,
-      acertos: us.acertos,
-      total: us.total,
-      porcentagem: us.total > 0 ? ((us.acertos / us.total) * 100).toFixed(2) : 0,
-      data: us.finishedAt
-    }});
-  }}
-
-  console.log(JSON.stringify({{simulados: result}}));
-}}
-
-main()
-  .catch(e => {{ console.error(e); process.exit(1); }})
-  .finally(() => prisma.$disconnect());
-'''
+    posicao = None
+    if cursor:
+        try:
+            finished_at, usuario_simulado_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+            posicao = (finished_at, usuario_simulado_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="cursor inválido")
 
-    result = run_prisma_script(script)
-    logger.info(f"✅ Encontrados {len(result.get('simulados', []))} simulados")
+    # `fim` é inclusivo: compara com o fim do dia
+    fim_intervalo = f"{fim}T23:59:59.999Z" if fim and len(fim) == 10 else fim
+    # Uma linha a mais indica se existe próxima página
+    consulta = (user_id, limit + 1, posicao, inicio, fim_intervalo, area)
 
-    return JSONResponse(content=jsonable_encoder(result))
+    simulados = await em_thread(agregados_usuario.historico_por_email, *consulta)
+
+    if simulados is None:
+        # Primeiro acesso: usuário ainda sem agregados (ou inexistente)
+        if not await garantir_usuario(user_id):
+            return {"simulados": [], "proximo_cursor": None}
+        simulados = await em_thread(agregados_usuario.historico_por_email, *consulta) or []
+
+    proximo_cursor = None
+    if len(simulados) > limit:
+        simulados = simulados[:limit]
+        ultimo = simulados[-1]
+        proximo_cursor = base64.urlsafe_b64encode(f"{ultimo['data']}|{ultimo['id']}".encode()).decode()
+
+    for s in simulados:
+        s["porcentagem"] = "%.2f" % (s["acertos"] / s["total"] * 100) if s["total"] > 0 else 0
+
+    logger.info(f"✅ Encontrados {len(simulados)} simulados")
+
+    return {"simulados": simulados, "proximo_cursor": proximo_cursor}
 
 @router.post("/compare-score", response_model=CompareScoreResponse)
 async def compare_score(req: CompareScoreRequest):
@@ -812,87 +783,58 @@ async def compare_score(req: CompareScoreRequest):
     """
     logger.info(f"📈 Comparando nota: {req.curso} - {req.universidade}")
 
-    # 1. Busca nota do simulado
-    script_nota = f'''
-import {{ PrismaClient }} from '@prisma/client';
-const prisma = new PrismaClient();
+    # 1. Nota do simulado (série local; banco só se ainda não está nela)
+    nota_usuario = await nota_do_simulado(req.simulado_id)
 
-async function main() {{
-  const us = await prisma.usuarioSimulado.findUnique({{
-    where: {{ id: "{req.simulado_id}" }}
-  }});
+    # 2. Nota de corte: acesso a dicionário na tabela em memória
+    tabela = await tabela_notas_corte.obter()
+    result = comparar_com_corte(nota_usuario, tabela.buscar(req.curso, req.universidade, req.ano),
+                                req.curso, req.universidade, req.ano)
 
-  if (!us || us.status !== "finalizado") {{
-    throw new Error("Simulado não finalizado ou não encontrado");
-  }}
+    logger.info(f"✅ Comparação: passou={result['passou']}, diferença={result['diferenca']}")
 
-  console.log(JSON.stringify({{nota: us.nota}}));
-}}
+    return JSONResponse(content=jsonable_encoder(result))
 
-main()
-  .catch(e => {{ console.error(e); process.exit(1); }})
-  .finally(() => prisma.$disconnect());
-'''
+@router.post("/compare-score/lote", response_model=CompareScoreLoteResponse)
+async def compare_score_lote(req: CompareScoreLoteRequest):
+    """
+    COMPARA UMA NOTA COM VÁRIOS CURSOS DE UMA VEZ
 
-    nota_result = run_prisma_script(script_nota)
-    nota_usuario = nota_result['nota']
-
-    # 2. Busca nota de corte
-    script_corte = f'''
-import {{ PrismaClient }} from '@prisma/client';
-const prisma = new PrismaClient();
-
-async function main() {{
-  const notaCorte = await prisma.notaCorte.findFirst({{
-    where: {{
-      curso: "{req.curso}",
-      universidade: "{req.universidade}",
-      ano: {req.ano}
-    }},
-    orderBy: {{
-      semestre: 'desc'
-    }}
-  }});
-
-  const result = notaCorte ? {{nota_minima: notaCorte.notaMinima}} : {{nota_minima: null}};
-  console.log(JSON.stringify(result));
-}}
-
-main()
-  .catch(e => {{ console.error(e); process.exit(1); }})
-  .finally(() => prisma.$disconnect());
-'''
+    Informe `nota` diretamente ou `simulado_id` (usa a nota do simulado).
 
-    corte_result = run_prisma_script(script_corte)
-    nota_corte = corte_result.get('nota_minima')
+    ## Exemplo de uso (Frontend):
+    ```javascript
+    const response = await fetch('/api/enem/simulados/compare-score/lote', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        simulado_id: 'clx...',
+        cursos: [
+          { curso: 'Medicina', universidade: 'USP', ano: 2024 },
+          { curso: 'Direito', universidade: 'UFMG', ano: 2024 }
+        ]
+      })
+    });
 
-    # 3. Compara
-    if nota_corte is None:
-        return JSONResponse(content=jsonable_encoder({
-            "passou": False,
-            "nota_usuario": nota_usuario,
-            "nota_corte": None,
-            "diferenca": None,
-            "mensagem": f"Nota de corte não disponível para {req.curso} - {req.universidade} ({req.ano})"
-        }))
+    const data = await response.json();
+    // data.resultados - mesma ordem de `cursos`, cada um como no /compare-score
+    ```
+    """
+    if req.nota is None and req.simulado_id is None:
+        raise HTTPException(status_code=400, detail="Informe nota ou simulado_id")
 
-    passou = nota_usuario >= nota_corte
-    diferenca = round(nota_usuario - nota_corte, 2)
+    nota_usuario = req.nota if req.nota is not None else await nota_do_simulado(req.simulado_id)
 
-    if passou:
-        mensagem = f"🎉 Parabéns! Sua nota ({nota_usuario}) está {abs(diferenca)} pontos acima da nota de corte ({nota_corte})."
-    else:
-        mensagem = f"📚 Continue estudando! Você precisa de {abs(diferenca)} pontos a mais. Nota de corte: {nota_corte}, sua nota: {nota_usuario}."
+    tabela = await tabela_notas_corte.obter()
+    resultados = [
+        comparar_com_corte(nota_usuario, tabela.buscar(alvo.curso, alvo.universidade, alvo.ano),
+                           alvo.curso, alvo.universidade, alvo.ano)
+        for alvo in req.cursos
+    ]
 
-    logger.info(f"✅ Comparação: passou={passou}, diferença={diferenca}")
+    logger.info(f"📈 Nota {nota_usuario} comparada com {len(resultados)} cursos")
 
-    return JSONResponse(content=jsonable_encoder({
-        "passou": passou,
-        "nota_usuario": nota_usuario,
-        "nota_corte": nota_corte,
-        "diferenca": diferenca,
-        "mensagem": mensagem
-    }))
+    return {"nota_usuario": nota_usuario, "resultados": resultados}
 
 @router.get("/")
 async def simulados_root():
@@ -906,6 +848,7 @@ async def simulados_root():
             "POST /api/enem/simulados/answer - Responder questão",
             "POST /api/enem/simulados/finish - Finalizar e calcular nota",
             "GET  /api/enem/simulados/history?user_id=... - Histórico",
-            "POST /api/enem/simulados/compare-score - Comparar com nota de corte"
+            "POST /api/enem/simulados/compare-score - Comparar com nota de corte",
+            "POST /api/enem/simulados/compare-score/lote - Comparar com vários cursos"
         ]
     }))
@@ -8,28 +8,25 @@ ROTAS:
 - GET /api/enem/stats/evolucao - Evolução de notas ao longo do tempo
 """
 
-import subprocess
-import json
 import logging
-from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 
+from agregados_usuario import (
+    AGRUPAMENTOS,
+    agregados_usuario,
+    garantir_usuario,
+    lttb,
+    para_desempenho,
+    para_evolucao,
+)
+from executores import em_thread
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# ============================================================================
-# CONFIGURAÇÃO
-# ============================================================================
-
-PRISMA_PROJECT_PATH = Path(__file__).resolve().parent.parent.parent / "enem-pro"
-
-if not (PRISMA_PROJECT_PATH / "prisma" / "schema.prisma").exists():
-    logger.warning(f"Projeto Prisma não encontrado em {PRISMA_PROJECT_PATH}")
-    PRISMA_PROJECT_PATH = None
-
 # ============================================================================
 # MODELOS PYDANTIC
 # ============================================================================
@@ -43,68 +40,6 @@ class DesempenhoPorArea(BaseModel):
 class DesempenhoPorAreaResponse(BaseModel):
     desempenho: List[DesempenhoPorArea]
 
-# ============================================================================
-# HELPER FUNCTIONS
-# ============================================================================
-
-def run_prisma_script(script: str) -> dict:
-    """Executa script Node.js com Prisma e retorna resultado JSON"""
-    if not PRISMA_PROJECT_PATH:
-        raise HTTPException(status_code=500, detail="Prisma não configurado")
-
-    try:
-        result = subprocess.run(
-            ["node", "-e", script],
-            cwd=str(PRISMA_PROJECT_PATH),
-            capture_output=True,
-            text=True,
-            timeout=30,
-            env={**subprocess.os.environ, "DATABASE_URL": "file:./dev.db"}
-        )
-
-        if result.returncode != 0:
-            logger.error(f"Erro Prisma: {result.stderr}")
-            raise HTTPException(status_code=500, detail=f"Erro no banco: {result.stderr}")
-
-        output = result.stdout.strip()
-        if not output:
-            return {}
-
-        return json.loads(output)
-
-    except subprocess.TimeoutExpired:
-        raise HTTPException(status_code=504, detail="Timeout ao acessar banco")
-    except json.JSONDecodeError as e:
-        logger.error(f"Erro ao parsear JSON: {result.stdout}")
-        raise HTTPException(status_code=500, detail=f"Erro ao parsear resultado: {str(e)}")
-    except Exception as e:
-        logger.error(f"Erro inesperado: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
-
-# ============================================================================
-# MAPEAMENTO DE DISCIPLINAS PARA ÁREAS
-# ============================================================================
-
-AREA_MAPPING = {
-    'matematica': 'Matemática',
-    'math': 'Matemática',
-    'linguagens': 'Linguagens',
-    'portugues': 'Linguagens',
-    'literatura': 'Linguagens',
-    'ingles': 'Linguagens',
-    'espanhol': 'Linguagens',
-    'ciencias_humanas': 'Ciências Humanas',
-    'historia': 'Ciências Humanas',
-    'geografia': 'Ciências Humanas',
-    'filosofia': 'Ciências Humanas',
-    'sociologia': 'Ciências Humanas',
-    'ciencias_natureza': 'Ciências da Natureza',
-    'biologia': 'Ciências da Natureza',
-    'fisica': 'Ciências da Natureza',
-    'quimica': 'Ciências da Natureza',
-    'geral': 'Geral',
-}
-
 # ============================================================================
 # ROUTER
 # ============================================================================
@@ -127,6 +62,8 @@ async def get_stats_por_area(user_id: str = Query(..., description="Email/ID do
     - Número de simulados realizados
     - Nota média TRI
 
+    Mantido incrementalmente a cada simulado finalizado (ver agregados_usuario.py).
+
     ## Exemplo de uso (Frontend):
     ```javascript
     const response = await fetch('/api/enem/stats/por-area?user_id=user@example.com');
@@ -138,149 +75,39 @@ async def get_stats_por_area(user_id: str = Query(..., description="Email/ID do
     """
     logger.info(f"📊 Calculando desempenho por área de {user_id}")
 
-    script = f'''
-import {{ PrismaClient }} from '@prisma/client';
-const prisma = new PrismaClient();
-
-async function main() {{
-  // =========================================================================
-  // 1. BUSCA USUÁRIO
-  // =========================================================================
-  const usuario = await prisma.usuario.findUnique({{
-    where: {{ email: "{user_id}" }}
-  }});
-
-  if (!usuario) {{
-    console.log(JSON.stringify({{ desempenho: [] }}));
-    return;
-  }}
-
-  // =========================================================================
-  // 2. BUSCA TODOS SIMULADOS FINALIZADOS COM DISCIPLINA
-  // =========================================================================
-  const simuladosUsuario = await prisma.usuarioSimulado.findMany({{
-    where: {{
-      usuarioId: usuario.id,
-      status: "finalizado"
-    }},
-    include: {{
-      respostas: true
-    }}
-  }});
-
-  // =========================================================================
-  // 3. BUSCA DADOS DOS SIMULADOS ORIGINAIS (disciplina)
-  // =========================================================================
-  const simuladosIds = simuladosUsuario.map(s => s.simuladoId);
-  const simulados = await prisma.simulado.findMany({{
-    where: {{
-      id: {{ in: simuladosIds }}
-    }}
-  }});
-
-  // Cria mapa de simuladoId -> disciplina
-  const disciplinaPorSimulado = {{}};
-  for (const sim of simulados) {{
-    disciplinaPorSimulado[sim.id] = sim.disciplina || 'geral';
-  }}
-
-  // =========================================================================
-  // 4. MAPEIA DISCIPLINAS PARA ÁREAS
-  // =========================================================================
-  const areaMapping = {{
-    'matematica': 'Matemática',
-    'math': 'Matemática',
-    'linguagens': 'Linguagens',
-    'portugues': 'Linguagens',
-    'literatura': 'Linguagens',
-    'ingles': 'Linguagens',
-    'espanhol': 'Linguagens',
-    'ciencias_humanas': 'Ciências Humanas',
-    'historia': 'Ciências Humanas',
-    'geografia': 'Ciências Humanas',
-    'filosofia': 'Ciências Humanas',
-    'sociologia': 'Ciências Humanas',
-    'ciencias_natureza': 'Ciências da Natureza',
-    'biologia': 'Ciências da Natureza',
-    'fisica': 'Ciências da Natureza',
-    'quimica': 'Ciências da Natureza',
-    'geral': 'Geral',
-  }};
-
-  // =========================================================================
-  // 5. AGRUPA SIMULADOS POR ÁREA
-  // =========================================================================
-  const porArea = {{}};
-
-  for (const simUsuario of simuladosUsuario) {{
-    const disciplina = disciplinaPorSimulado[simUsuario.simuladoId] || 'geral';
-    const area = areaMapping[disciplina.toLowerCase()] || 'Geral';
-
-    if (!porArea[area]) {{
-      porArea[area] = {{
-        area: area,
-        simulados: [],
-        totalAcertos: 0,
-        totalQuestoes: 0,
-        somaNotas: 0
-      }};
-    }}
-
-    porArea[area].simulados.push(simUsuario);
-    porArea[area].totalAcertos += simUsuario.acertos || 0;
-    porArea[area].totalQuestoes += simUsuario.total || 0;
-    porArea[area].somaNotas += simUsuario.nota || 0;
-  }}
-
-  // =========================================================================
-  // 6. CALCULA ESTATÍSTICAS POR ÁREA
-  // =========================================================================
-  const desempenho = Object.values(porArea).map(area => {{
-    const numSimulados = area.simulados.length;
-    const porcentagem = area.totalQuestoes > 0
-      ? (area.totalAcertos / area.totalQuestoes) * 100
-      : 0;
-    const notaMedia = numSimulados > 0
-      ? area.somaNotas / numSimulados
-      : 0;
-
-    return {{
-      area: area.area,
-      porcentagem: Math.round(porcentagem * 10) / 10, // 1 decimal
-      simulados: numSimulados,
-      nota_media: Math.round(notaMedia)
-    }};
-  }});
-
-  // Ordena por número de simulados (decrescente)
-  desempenho.sort((a, b) => b.simulados - a.simulados);
-
-  // =========================================================================
-  // 7. RETORNA RESULTADO
-  // =========================================================================
-  console.log(JSON.stringify({{ desempenho }}));
-}}
-
-main()
-  .catch(e => {{ console.error(e); process.exit(1); }})
-  .finally(() => prisma.$disconnect());
-'''
-
-    result = run_prisma_script(script)
-    logger.info(f"✅ Desempenho calculado para {len(result.get('desempenho', []))} áreas")
+    # Leitura por chave das linhas (usuário, área) mantidas no /finish
+    areas = await em_thread(agregados_usuario.areas_por_email, user_id)
+
+    if areas is None:
+        # Primeiro acesso: usuário ainda sem agregados (ou inexistente)
+        if not await garantir_usuario(user_id):
+            return {"desempenho": []}
+        areas = await em_thread(agregados_usuario.areas_por_email, user_id) or []
+
+    result = {"desempenho": para_desempenho(areas)}
+    logger.info(f"✅ Desempenho calculado para {len(result['desempenho'])} áreas")
 
     return result
 
 @router.get("/evolucao")
 async def get_evolucao(
     user_id: str = Query(..., description="Email/ID do usuário"),
-    limit: int = Query(10, ge=1, le=50, description="Quantidade de pontos no gráfico")
+    limit: int = Query(10, ge=1, le=50, description="Quantidade de pontos no gráfico"),
+    inicio: Optional[str] = Query(None, description="Data inicial (AAAA-MM-DD)"),
+    fim: Optional[str] = Query(None, description="Data final (AAAA-MM-DD)"),
+    agrupamento: Optional[str] = Query(None, description="dia, semana ou mes (padrão: pontos individuais)"),
+    area: Optional[str] = Query(None, description="Série de uma área (ex: Matemática)")
 ):
     """
     EVOLUÇÃO DE NOTAS AO LONGO DO TEMPO
 
     Retorna série temporal de notas para visualizar progresso.
 
+    Cobre TODO o intervalo pedido (padrão: histórico completo) com no
+    máximo `limit` pontos:
+    - sem agrupamento: LTTB sobre os simulados (mantém picos e vales)
+    - com agrupamento: média por dia/semana/mês (últimos `limit` buckets)
+
     ## Exemplo de uso (Frontend):
     ```javascript
     const response = await fetch('/api/enem/stats/evolucao?user_id=user@example.com&limit=10');
@@ -292,48 +119,24 @@ async def get_evolucao(
     """
     logger.info(f"📈 Calculando evolução de notas de {user_id}")
 
-    script = f'''
-import {{ PrismaClient }} from '@prisma/client';
-const prisma = new PrismaClient();
-
-async function main() {{
-  const usuario = await prisma.usuario.findUnique({{
-    where: {{ email: "{user_id}" }}
-  }});
-
-  if (!usuario) {{
-    console.log(JSON.stringify({{ evolucao: [] }}));
-    return;
-  }}
-
-  const simulados = await prisma.usuarioSimulado.findMany({{
-    where: {{
-      usuarioId: usuario.id,
-      status: "finalizado"
-    }},
-    orderBy: {{
-      finishedAt: 'asc'
-    }},
-    take: {limit}
-  }});
-
-  const evolucao = simulados.map(s => ({{
-    data: s.finishedAt,
-    nota: s.nota || 0,
-    acertos: s.acertos || 0,
-    total: s.total || 0,
-    porcentagem: s.total > 0 ? ((s.acertos / s.total) * 100).toFixed(1) : 0
-  }}));
-
-  console.log(JSON.stringify({{ evolucao }}));
-}}
-
-main()
-  .catch(e => {{ console.error(e); process.exit(1); }})
-  .finally(() => prisma.$disconnect());
-'''
-
-    result = run_prisma_script(script)
-    logger.info(f"✅ Evolução calculada: {len(result.get('evolucao', []))} pontos")
+    if agrupamento and agrupamento not in AGRUPAMENTOS:
+        raise HTTPException(status_code=400, detail=f"agrupamento deve ser um de {AGRUPAMENTOS}")
+
+    # `fim` é inclusivo: compara com o fim do dia
+    fim_intervalo = f"{fim}T23:59:59.999Z" if fim and len(fim) == 10 else fim
+    consulta = (user_id, inicio, fim_intervalo, area, agrupamento)
+
+    pontos = await em_thread(agregados_usuario.serie_por_email, *consulta)
+
+    if pontos is None:
+        # Primeiro acesso: usuário ainda sem agregados (ou inexistente)
+        if not await garantir_usuario(user_id):
+            return {"evolucao": []}
+        pontos = await em_thread(agregados_usuario.serie_por_email, *consulta) or []
+
+    pontos = pontos[-limit:] if agrupamento else lttb(pontos, limit)
+
+    result = {"evolucao": para_evolucao(pontos)}
+    logger.info(f"✅ Evolução calculada: {len(result['evolucao'])} pontos")
 
     return result
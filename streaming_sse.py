@@ -0,0 +1,91 @@
+"""
+Streaming SSE - Repasse da geração do Ollama como Server-Sent Events
+
+Sem streaming, o aluno espera a geração inteira (até TIMEOUT_SECONDS) antes
+de ver qualquer texto. Com `transmitir_geracao`, cada trecho gerado vira um
+evento SSE assim que chega:
+
+    event: inicio   data: {...metadados}
+    event: token    data: {"texto": "..."}        (um por trecho)
+    event: fim      data: {...resultado, tempo_processamento}
+    event: erro     data: {"detail": "..."}       (falha depois de iniciar;
+                                                   recusa da fila do Ollama
+                                                   traz status_code e
+                                                   retry_after)
+
+Os dados são JSON (quebras de linha do texto não quebram o protocolo).
+
+Desconexão do cliente: o Starlette cancela/fecha o gerador; a saída do
+`async with` em cliente_ollama.gerar_tokens fecha a conexão com o Ollama,
+que interrompe a geração. Nada é gravado no cache nesse caso.
+"""
+
+import json
+import logging
+import time
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Cabeçalhos para proxies não acumularem a resposta
+CABECALHOS_SSE = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def evento_sse(evento: str, dados: Dict) -> str:
+    """Um evento SSE com dados JSON"""
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+async def transmitir_geracao(
+    trechos: AsyncGenerator[str, None],
+    inicio: Dict,
+    ao_concluir: Callable[[str], Awaitable[Dict]],
+) -> AsyncIterator[str]:
+    """
+    Eventos SSE de uma geração
+
+    Args:
+        trechos: Texto conforme é gerado (ex: cliente_ollama.gerar_tokens)
+        inicio: Dados do evento `inicio` (enviado antes do primeiro trecho)
+        ao_concluir: Recebe o texto completo (ex: grava no cache) e devolve
+                     os dados do evento `fim`
+    """
+    comeco = time.perf_counter()
+    partes = []
+    concluido = False
+
+    yield evento_sse("inicio", inicio)
+    try:
+        async for trecho in trechos:
+            if not partes:
+                logger.info(f"⚡ Primeiro trecho em {time.perf_counter() - comeco:.2f}s")
+            partes.append(trecho)
+            yield evento_sse("token", {"texto": trecho})
+        concluido = True
+    except HTTPException as e:
+        # Fila do Ollama saturou entre a admissão e a vez desta geração
+        concluido = True
+        logger.warning(f"🚧 Streaming recusado: {e.detail}")
+        yield evento_sse("erro", {
+            "detail": e.detail,
+            "status_code": e.status_code,
+            "retry_after": int((e.headers or {}).get("Retry-After", 0)) or None,
+        })
+        return
+    except Exception as e:
+        concluido = True
+        logger.error(f"❌ Erro durante o streaming: {str(e)}")
+        yield evento_sse("erro", {"detail": f"Erro ao gerar explicação: {str(e)}"})
+        return
+    finally:
+        if not concluido:
+            logger.info("🔌 Cliente desconectou - geração no Ollama interrompida")
+            await trechos.aclose()
+
+    fim = await ao_concluir("".join(partes).strip())
+    yield evento_sse("fim", {**fim, "tempo_processamento": round(time.perf_counter() - comeco, 3)})
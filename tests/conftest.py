@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+# Módulos do backend ficam na raiz do repositório
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Pools com mais de uma thread mesmo em máquinas de 1 CPU
+os.environ.setdefault("EXECUTOR_HASH_THREADS", "4")
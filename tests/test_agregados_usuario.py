@@ -0,0 +1,154 @@
+"""
+Agregados por usuário (agregados_usuario.py): redução LTTB, buckets e
+paginação por cursor da série de notas, e a reconstrução que troca tudo numa
+transação sem perder nem duplicar um /finish que chega no meio.
+"""
+
+import asyncio
+
+import pytest
+
+import agregados_usuario as modulo
+from agregados_usuario import SCRIPT_SIMULADOS, SCRIPT_USUARIOS, AgregadosUsuario, lttb
+
+USUARIO = {"id": "u1", "email": "a@x", "nome": "Ana", "pontosFP": 0, "nivel": "Bronze"}
+
+
+def simulado_prisma(id, finished_at, nota, disciplina="matematica", acertos=5, total=10):
+    return {"id": id, "usuarioId": "u1", "simuladoId": "b" + id, "finishedAt": finished_at,
+            "nota": nota, "acertos": acertos, "total": total, "disciplina": disciplina}
+
+
+def popular(agregados, simulados):
+    """Grava `simulados` de u1 pela troca da reconstrução"""
+    agregado = modulo._novo_agregado(USUARIO)
+    for s in simulados:
+        modulo._acumular(agregado, s["nota"], modulo._dia(s["finishedAt"]))
+    tabela = agregados.iniciar_reconstrucao(["u1"])
+    agregados.anexar_reconstrucao(tabela, simulados)
+    agregados.concluir_reconstrucao(tabela, {"u1": agregado})
+
+
+# ============================================================================
+# LTTB
+# ============================================================================
+
+def pontos(notas):
+    return [{"data": str(i), "nota": n} for i, n in enumerate(notas)]
+
+
+def test_lttb_preserva_extremos_e_picos():
+    serie = pontos([500] * 40 + [900] + [500] * 40 + [100] + [500] * 40)
+    reduzida = lttb(serie, 10)
+
+    assert len(reduzida) == 10
+    assert reduzida[0] is serie[0] and reduzida[-1] is serie[-1]
+    assert {p["nota"] for p in reduzida} >= {900, 100}
+    assert [int(p["data"]) for p in reduzida] == sorted(int(p["data"]) for p in reduzida)
+
+
+def test_lttb_limites():
+    serie = pontos([1, 2, 3, 4, 5])
+    assert lttb(serie, 5) is serie
+    assert lttb(serie, 50) is serie
+    assert lttb(serie, 2) == [serie[0], serie[-1]]
+    assert lttb(serie, 1) == [serie[-1]]
+
+# ============================================================================
+# SÉRIE: BUCKETS E CURSOR
+# ============================================================================
+
+def test_buckets_dia_semana_mes(tmp_path):
+    agregados = AgregadosUsuario(tmp_path / "e.db")
+    popular(agregados, [
+        simulado_prisma("s1", "2026-09-28T10:00:00.000Z", 400),  # segunda
+        simulado_prisma("s2", "2026-09-28T20:00:00.000Z", 600),
+        simulado_prisma("s3", "2026-10-04T10:00:00.000Z", 500),  # domingo, mesma semana
+        simulado_prisma("s4", "2026-10-05T10:00:00.000Z", 700),  # segunda seguinte
+    ])
+
+    def agrupar(agrupamento):
+        return [(p["data"], p["nota"], p["simulados"])
+                for p in agregados.serie_por_email("a@x", agrupamento=agrupamento)]
+
+    assert agrupar("dia") == [("2026-09-28", 500, 2), ("2026-10-04", 500, 1), ("2026-10-05", 700, 1)]
+    assert agrupar("semana") == [("2026-09-28", 500, 3), ("2026-10-05", 700, 1)]
+    assert agrupar("mes") == [("2026-09-01", 500, 2), ("2026-10-01", 600, 2)]
+    assert agregados.serie_por_email("ninguem@x") is None
+
+
+def test_historico_por_cursor_sem_repetir_nem_pular(tmp_path):
+    agregados = AgregadosUsuario(tmp_path / "e.db")
+    # Empates em finished_at: o desempate é o id do simulado
+    simulados = [
+        simulado_prisma(f"s{i:02d}", f"2026-10-{1 + i // 3:02d}T10:00:00.000Z", 500 + i)
+        for i in range(11)
+    ]
+    popular(agregados, simulados)
+
+    vistos, cursor = [], None
+    while True:
+        pagina = agregados.historico_por_email("a@x", 4, cursor)
+        vistos.extend(p["id"] for p in pagina)
+        if len(pagina) < 4:
+            break
+        cursor = (pagina[-1]["data"], pagina[-1]["id"])
+
+    assert vistos == [s["id"] for s in reversed(simulados)]
+
+    filtrados = agregados.historico_por_email("a@x", 100, inicio="2026-10-03", fim="2026-10-04")
+    assert [p["id"] for p in filtrados] == ["s08", "s07", "s06"]
+
+# ============================================================================
+# RECONSTRUÇÃO
+# ============================================================================
+
+@pytest.mark.parametrize("lido_pela_reconstrucao", [False, True])
+def test_finish_durante_a_reconstrucao_conta_uma_vez(tmp_path, monkeypatch, lido_pela_reconstrucao):
+    agregados = AgregadosUsuario(tmp_path / "e.db")
+    monkeypatch.setattr(modulo, "agregados_usuario", agregados)
+
+    antigos = [simulado_prisma("s1", "2026-10-13T10:00:00.000Z", 500, "fisica"),
+               simulado_prisma("s2", "2026-10-14T10:00:00.000Z", 600)]
+    popular(agregados, antigos)
+    novo = simulado_prisma("s3", "2026-10-15T10:00:00.000Z", 700)
+
+    async def banco(script, params=None):
+        if script == SCRIPT_USUARIOS:
+            return [USUARIO]
+        assert script == SCRIPT_SIMULADOS
+        # /finish de s3 aplicado aos agregados enquanto a reconstrução lê
+        await asyncio.to_thread(agregados.registrar_simulado, "u1", {
+            "id": "s3", "nota": 700, "acertos": 5, "total": 10,
+            "disciplina": "matematica", "finished_at": novo["finishedAt"],
+        })
+        return antigos + ([novo] if lido_pela_reconstrucao else [])
+
+    monkeypatch.setattr(modulo, "run_prisma_script", banco)
+    asyncio.run(modulo.reconstruir_usuario("u1"))
+
+    agregado = agregados.por_email("a@x")
+    assert (agregado["total_simulados"], agregado["soma_notas"], agregado["streak"]) == (3, 1800, 3)
+    assert [p["nota"] for p in agregados.serie_por_email("a@x")] == [500, 600, 700]
+    areas = {a["area"]: (a["simulados"], a["soma_notas"]) for a in agregados.areas_por_email("a@x")}
+    assert areas == {"Ciências da Natureza": (1, 500), "Matemática": (2, 1300)}
+    assert agregados._reconstrucoes == {}
+
+
+def test_reconstrucao_que_falha_mantem_os_dados(tmp_path, monkeypatch):
+    agregados = AgregadosUsuario(tmp_path / "e.db")
+    monkeypatch.setattr(modulo, "agregados_usuario", agregados)
+    popular(agregados, [simulado_prisma("s1", "2026-10-13T10:00:00.000Z", 500)])
+
+    async def banco(script, params=None):
+        if script == SCRIPT_USUARIOS:
+            return [USUARIO]
+        raise RuntimeError("sidecar caiu")
+
+    monkeypatch.setattr(modulo, "run_prisma_script", banco)
+    with pytest.raises(RuntimeError):
+        asyncio.run(modulo.reconstruir_usuario("u1"))
+
+    assert [p["nota"] for p in agregados.serie_por_email("a@x")] == [500]
+    assert agregados.por_email("a@x")["total_simulados"] == 1
+    assert agregados._reconstrucoes == {}
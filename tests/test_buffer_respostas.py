@@ -0,0 +1,173 @@
+"""
+Buffer do /answer (buffer_respostas.py): o diário sobrevive a uma queda, é
+compactado após gravar, guarda o que não foi gravado e a reserva por
+simulado separa /finish e descarga.
+"""
+
+import asyncio
+import json
+import types
+
+import pytest
+
+import buffer_respostas as modulo
+from buffer_respostas import BufferRespostas
+
+
+class BancoFalso:
+    """Faz o papel do sidecar: grava tudo (ou falha) e guarda as chamadas"""
+
+    def __init__(self):
+        self.lotes = []
+        self.falhar = False
+        self.atraso = 0.0
+
+    async def __call__(self, script, params=None):
+        await asyncio.sleep(self.atraso)
+        if self.falhar:
+            raise RuntimeError("banco fora do ar")
+        self.lotes.append(params["respostas"])
+        return {
+            "gravadas": [{**r, "usuario_id": "u1"} for r in params["respostas"]],
+            "descartadas": 0,
+        }
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    banco = BancoFalso()
+    monkeypatch.setattr(modulo, "run_prisma_script", banco)
+    monkeypatch.setattr(modulo, "indice_vistas", types.SimpleNamespace(marcar=lambda *a: None))
+    # Sem descarga periódica: os testes descarregam na mão
+    monkeypatch.setattr(modulo, "RESPOSTAS_FLUSH_SECONDS", 3600)
+    monkeypatch.setattr(modulo, "RESPOSTAS_JOURNAL_FSYNC", False)
+    return banco
+
+
+def linhas(caminho):
+    return [json.loads(l) for l in caminho.read_text().splitlines()] if caminho.exists() else []
+
+
+def test_diario_recupera_pendentes_apos_queda(tmp_path, banco):
+    diario = tmp_path / "respostas.jsonl"
+
+    async def antes_da_queda():
+        buffer = BufferRespostas(diario)
+        await buffer.iniciar()
+        await buffer.registrar("s1", 1, 0)
+        await buffer.registrar("s1", 2, 3)
+        await buffer.registrar("s1", 1, 4)  # remarcou: a última vence
+        await buffer.registrar("s2", 7, None)
+        # Queda: sem encerrar() (nada gravado), só o processo morre
+        buffer._tarefa.cancel()
+        buffer._lock_arquivo.close()
+
+    async def depois_da_queda():
+        buffer = BufferRespostas(diario)
+        await buffer.iniciar()
+        pendentes = sorted(buffer._todas_pendentes(), key=lambda r: (r["usuario_simulado_id"], r["questao_id"]))
+        await buffer.encerrar()
+        return pendentes
+
+    asyncio.run(antes_da_queda())
+    # Última linha cortada no meio da escrita
+    with open(diario, "a") as f:
+        f.write('{"usuario_simulado_id": "s1", "questao')
+
+    assert asyncio.run(depois_da_queda()) == [
+        {"usuario_simulado_id": "s1", "questao_id": 1, "alternativa_marcada": 4},
+        {"usuario_simulado_id": "s1", "questao_id": 2, "alternativa_marcada": 3},
+        {"usuario_simulado_id": "s2", "questao_id": 7, "alternativa_marcada": None},
+    ]
+    # encerrar() gravou tudo: diário vazio
+    assert len(banco.lotes) == 1 and linhas(diario) == []
+
+
+def test_diario_compactado_apos_gravar(tmp_path, banco):
+    diario = tmp_path / "respostas.jsonl"
+
+    async def cenario():
+        buffer = BufferRespostas(diario)
+        await buffer.iniciar()
+        await buffer.registrar("s1", 1, 0)
+        await buffer.registrar("s1", 1, 2)
+        assert len(linhas(diario)) == 2
+
+        await buffer.descarregar()
+        assert linhas(diario) == []
+
+        await buffer.registrar("s1", 3, 1)
+        assert linhas(diario) == [{"usuario_simulado_id": "s1", "questao_id": 3, "alternativa_marcada": 1}]
+        await buffer.encerrar()
+
+    asyncio.run(cenario())
+    assert banco.lotes[0] == [{"usuario_simulado_id": "s1", "questao_id": 1, "alternativa_marcada": 2}]
+
+
+def test_falha_na_gravacao_mantem_pendentes(tmp_path, banco):
+    diario = tmp_path / "respostas.jsonl"
+
+    async def cenario():
+        buffer = BufferRespostas(diario)
+        await buffer.iniciar()
+        await buffer.registrar("s1", 1, 0)
+
+        banco.falhar = True
+        with pytest.raises(RuntimeError):
+            await buffer.descarregar()
+        assert buffer.pendentes_do_simulado("s1") == [
+            {"usuario_simulado_id": "s1", "questao_id": 1, "alternativa_marcada": 0}
+        ]
+        assert len(linhas(diario)) == 1
+
+        banco.falhar = False
+        await buffer.descarregar()
+        assert buffer.pendentes_do_simulado("s1") == [] and linhas(diario) == []
+        await buffer.encerrar()
+
+    asyncio.run(cenario())
+    assert len(banco.lotes) == 1
+
+
+def test_finalizacao_reserva_so_o_proprio_simulado(tmp_path, banco):
+    async def cenario():
+        buffer = BufferRespostas(tmp_path / "respostas.jsonl")
+        await buffer.iniciar()
+        await buffer.registrar("s1", 1, 0)
+        await buffer.registrar("s2", 1, 1)
+
+        async with buffer.finalizacao("s1") as pendentes:
+            assert [p["usuario_simulado_id"] for p in pendentes] == ["s1"]
+            # A descarga no meio da finalização não grava as respostas de s1
+            await buffer.descarregar()
+            assert banco.lotes[-1] == [{"usuario_simulado_id": "s2", "questao_id": 1, "alternativa_marcada": 1}]
+            await buffer.confirmar(pendentes)
+
+        # Uma descarga lenta não segura a finalização de outro simulado
+        await buffer.registrar("s3", 1, 2)
+        banco.atraso = 0.5
+        descarga = asyncio.create_task(buffer.descarregar())
+        await asyncio.sleep(0.05)
+        async def finalizar_s4():
+            async with buffer.finalizacao("s4"):
+                pass
+
+        await asyncio.wait_for(finalizar_s4(), timeout=0.1)
+        await descarga
+        banco.atraso = 0.0
+        await buffer.encerrar()
+
+    asyncio.run(cenario())
+
+
+def test_segundo_processo_no_mesmo_diario_falha(tmp_path, banco):
+    diario = tmp_path / "respostas.jsonl"
+
+    async def cenario():
+        primeiro = BufferRespostas(diario)
+        await primeiro.iniciar()
+        with pytest.raises(RuntimeError, match="UM worker"):
+            await BufferRespostas(diario).iniciar()
+        await primeiro.encerrar()
+
+    asyncio.run(cenario())
@@ -0,0 +1,104 @@
+"""
+Cache em camadas (cache_camadas.py): LRU limitado por entradas e por bytes,
+expiração por TTL e promoção do disco para a memória.
+"""
+
+import asyncio
+import types
+
+import pytest
+
+import cache_camadas as modulo
+from cache_camadas import CacheCamadas
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    """time.time/time.monotonic do módulo controlados pelo teste"""
+    relogio = types.SimpleNamespace(agora=1000.0)
+    monkeypatch.setattr(modulo, "time", types.SimpleNamespace(
+        time=lambda: relogio.agora, monotonic=lambda: relogio.agora,
+    ))
+    return relogio
+
+
+def rodar(corotina):
+    return asyncio.run(corotina)
+
+
+def test_lru_por_entradas_despeja_o_menos_usado(relogio):
+    async def cenario():
+        cache = CacheCamadas("t", ttl_segundos=60, max_entradas=2, disco=False)
+        await cache.guardar("a", "1")
+        await cache.guardar("b", "2")
+        assert await cache.obter("a") == "1"  # "b" vira o menos usado
+        await cache.guardar("c", "3")
+        return [await cache.obter(k) for k in "abc"], await cache.estatisticas()
+
+    valores, estatisticas = rodar(cenario())
+    assert valores == ["1", None, "3"]
+    assert estatisticas["despejos"] == 1
+    assert estatisticas["memoria"]["entradas"] == 2
+
+
+def test_lru_por_bytes(relogio):
+    async def cenario():
+        cache = CacheCamadas("t", ttl_segundos=60, max_entradas=100, max_bytes=10, disco=False)
+        await cache.guardar("a", "xxxx")
+        await cache.guardar("b", "ççç")       # 6 bytes em UTF-8: 10 no total
+        await cache.guardar("c", "y")         # 11: sai "a"
+        await cache.guardar("grande", "z" * 11)  # maior que o limite: não entra
+        return [await cache.obter(k) for k in ("a", "b", "c", "grande")], cache._bytes
+
+    valores, total = rodar(cenario())
+    assert valores == [None, "ççç", "y", None]
+    assert total == 7
+
+
+def test_ttl_expira_na_memoria_e_no_disco(relogio, tmp_path):
+    async def cenario():
+        cache = CacheCamadas("t", ttl_segundos=60, caminho=tmp_path / "cache.db")
+        await cache.guardar("a", "1")
+        relogio.agora += 59
+        antes = await cache.obter("a")
+        relogio.agora += 2
+        depois = await cache.obter("a")
+        estatisticas = await cache.estatisticas()
+        cache.fechar()
+        return antes, depois, estatisticas
+
+    antes, depois, estatisticas = rodar(cenario())
+    assert (antes, depois) == ("1", None)
+    assert estatisticas["expiradas"] == 1
+    assert estatisticas["faltas"] == 1
+
+
+def test_regravar_renova_o_ttl(relogio):
+    async def cenario():
+        cache = CacheCamadas("t", ttl_segundos=60, disco=False)
+        await cache.guardar("a", "1")
+        relogio.agora += 50
+        await cache.guardar("a", "2")
+        relogio.agora += 50  # venceria pela primeira gravação
+        return await cache.obter("a")
+
+    assert rodar(cenario()) == "2"
+
+
+def test_acerto_no_disco_promove_para_a_memoria(relogio, tmp_path):
+    async def cenario():
+        caminho = tmp_path / "cache.db"
+        primeiro = CacheCamadas("t", ttl_segundos=60, caminho=caminho)
+        await primeiro.guardar("a", "explicação " * 50)
+        primeiro.fechar()
+
+        # Outro processo (restart): memória vazia, disco com a entrada
+        segundo = CacheCamadas("t", ttl_segundos=60, caminho=caminho)
+        valores = [await segundo.obter("a"), await segundo.obter("a")]
+        estatisticas = await segundo.estatisticas()
+        segundo.fechar()
+        return valores, estatisticas
+
+    valores, estatisticas = rodar(cenario())
+    assert valores == ["explicação " * 50] * 2
+    assert (estatisticas["acertos_disco"], estatisticas["acertos_memoria"]) == (1, 1)
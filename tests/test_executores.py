@@ -0,0 +1,68 @@
+"""
+Modelo de execução (executores.py): trabalho bloqueante não pode congelar
+as outras requisições do worker.
+"""
+
+import asyncio
+import os
+import sqlite3
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import auth_utils
+from executores import em_processo
+from pool_sqlite import PoolSQLite
+from routers import auth
+
+ATRASO = 0.5
+
+
+@pytest.fixture
+def app_auth(tmp_path, monkeypatch):
+    """Router de auth com banco temporário e verify_password lento (bloqueante)"""
+    caminho = tmp_path / "auth.db"
+    with sqlite3.connect(caminho) as conn:
+        conn.execute("CREATE TABLE Usuario (id TEXT PRIMARY KEY, nome TEXT, email TEXT UNIQUE, senha TEXT, createdAt TEXT)")
+        for i in range(2):
+            conn.execute(
+                "INSERT INTO Usuario VALUES (?, ?, ?, ?, ?)",
+                (f"u{i}", f"Aluno {i}", f"aluno{i}@email.com", "hash", "2024-01-01T00:00:00")
+            )
+
+    def verify_password_lento(plain_password, hashed_password):
+        time.sleep(ATRASO)
+        return True
+
+    pool = PoolSQLite(caminho)
+    monkeypatch.setattr(auth, "pool", pool)
+    monkeypatch.setattr(auth_utils, "verify_password", verify_password_lento)
+
+    app = FastAPI()
+    app.include_router(auth.router)
+    yield app
+    pool.fechar()
+
+
+def test_logins_concorrentes_se_sobrepoem(app_auth):
+    async def dois_logins():
+        transporte = httpx.ASGITransport(app=app_auth)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://teste") as cliente:
+            inicio = time.perf_counter()
+            respostas = await asyncio.gather(*[
+                cliente.post("/api/auth/login", json={"email": f"aluno{i}@email.com", "senha": "senha123"})
+                for i in range(2)
+            ])
+            return time.perf_counter() - inicio, respostas
+
+    duracao, respostas = asyncio.run(dois_logins())
+
+    assert [r.status_code for r in respostas] == [200, 200]
+    # Em série levaria 2 x ATRASO
+    assert duracao < 1.5 * ATRASO
+
+
+def test_em_processo_roda_fora_do_processo_atual():
+    assert asyncio.run(em_processo(os.getpid)) != os.getpid()
@@ -0,0 +1,96 @@
+"""
+Fila do Ollama (fila_ollama.py): ordem por prioridade, recusa imediata com
+Retry-After (429/503) e média de tempo alimentada só por gerações que
+terminaram bem.
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from fila_ollama import AgendadorOllama, Prioridade
+
+
+def test_interativa_passa_na_frente_de_fundo():
+    ordem = []
+
+    async def gerar(agendador, nome, prioridade):
+        async with agendador.vaga(prioridade):
+            ordem.append(nome)
+            await asyncio.sleep(0)
+
+    async def cenario():
+        agendador = AgendadorOllama(vagas=1, max_fila=10, tempo_inicial=0.01)
+        async with agendador.vaga(Prioridade.INTERATIVA):
+            tarefas = [
+                asyncio.create_task(gerar(agendador, "fundo1", Prioridade.FUNDO)),
+                asyncio.create_task(gerar(agendador, "interativa1", Prioridade.INTERATIVA)),
+                asyncio.create_task(gerar(agendador, "fundo2", Prioridade.FUNDO)),
+                asyncio.create_task(gerar(agendador, "interativa2", Prioridade.INTERATIVA)),
+            ]
+            await asyncio.sleep(0)  # todas na fila
+        await asyncio.gather(*tarefas)
+
+    asyncio.run(cenario())
+    assert ordem == ["interativa1", "interativa2", "fundo1", "fundo2"]
+
+
+def test_fila_cheia_recusa_com_429_e_retry_after():
+    async def cenario():
+        agendador = AgendadorOllama(vagas=1, max_fila=2, tempo_inicial=1)
+        async with agendador.vaga():
+            esperando = [asyncio.create_task(agendador._entrar(Prioridade.INTERATIVA)) for _ in range(2)]
+            await asyncio.sleep(0)
+            with pytest.raises(HTTPException) as recusa:
+                agendador.admitir(Prioridade.INTERATIVA)
+            for tarefa in esperando:
+                tarefa.cancel()
+            await asyncio.gather(*esperando, return_exceptions=True)
+        return recusa.value, agendador.estatisticas()
+
+    recusa, estatisticas = asyncio.run(cenario())
+    assert recusa.status_code == 429
+    assert recusa.headers["Retry-After"] == "3"  # 1 s x (2 na fila + 1)
+    assert estatisticas["recusadas_429"] == 1
+    assert estatisticas["canceladas_na_fila"] == 2
+    assert estatisticas["ocupadas"] == 0
+
+
+def test_espera_estimada_acima_do_limite_recusa_com_503():
+    async def cenario():
+        agendador = AgendadorOllama(vagas=1, max_fila=50, tempo_inicial=40)
+        async with agendador.vaga():
+            # Interativa: 40 s de espera cabe no limite de 60 s
+            agendador.admitir(Prioridade.INTERATIVA)
+            esperando = asyncio.create_task(agendador._entrar(Prioridade.INTERATIVA))
+            await asyncio.sleep(0)
+            # 80 s estourou a interativa, mas cabe no limite de FUNDO
+            with pytest.raises(HTTPException) as recusa:
+                agendador.admitir(Prioridade.INTERATIVA)
+            agendador.admitir(Prioridade.FUNDO)
+            esperando.cancel()
+            await asyncio.gather(esperando, return_exceptions=True)
+        return recusa.value
+
+    recusa = asyncio.run(cenario())
+    assert recusa.status_code == 503
+    assert recusa.headers["Retry-After"] == "80"
+
+
+def test_media_so_com_geracoes_bem_sucedidas():
+    async def cenario():
+        agendador = AgendadorOllama(vagas=1, tempo_inicial=20)
+        with pytest.raises(RuntimeError):
+            async with agendador.vaga():
+                raise RuntimeError("erro HTTP 500 do Ollama")
+        depois_da_falha = agendador.tempo_medio
+
+        async with agendador.vaga():
+            pass  # geração (instantânea) que terminou bem
+        return depois_da_falha, agendador.tempo_medio, agendador.estatisticas()
+
+    depois_da_falha, depois_do_sucesso, estatisticas = asyncio.run(cenario())
+    assert depois_da_falha == 20
+    assert depois_do_sucesso == pytest.approx(16, abs=0.01)  # 20 + 0.2 x (0 - 20)
+    assert (estatisticas["atendidas"], estatisticas["falhas"], estatisticas["ocupadas"]) == (2, 1, 0)
@@ -0,0 +1,60 @@
+"""
+Índice de cursos (indice_cursos.py): o ranking pré-calculado e o vetorizado
+têm que concordar com a definição (termo exato > prefixo; nome > IES > campus;
+empate por IES, nome).
+"""
+
+import random
+
+from indice_cursos import LIMIAR_PREFIXO, LIMITE_MAX, SnapshotCursos, tokens
+
+NOMES = ["Medicina", "Medicina Veterinária", "Direito", "Engenharia Civil", "Música", "Administração"]
+IES = ["USP", "Universidade Federal de Minas", "Universidade Estadual Paulista", "PUC Rio"]
+CAMPI = ["São Paulo", "Belo Horizonte", "Rio de Janeiro", "Campinas", "Medianeira"]
+
+
+def catalogo(n: int):
+    sorteio = random.Random(7)
+    return [
+        {"id": i, "nome": sorteio.choice(NOMES), "ies": f"{sorteio.choice(IES)} {i % 50}",
+         "campus": sorteio.choice(CAMPI)}
+        for i in range(n)
+    ]
+
+
+def ranking_esperado(snapshot: SnapshotCursos, texto: str, limite: int):
+    """Pontua curso a curso, sem índice"""
+    pontuados = []
+    for numero, curso in enumerate(snapshot.cursos):
+        total = 0
+        for termo in dict.fromkeys(tokens(texto)):
+            melhor = 0
+            campos = ((curso["campus"], 1), (curso["ies"], 2), (curso["nome"], 3))
+            for texto_campo, peso in campos:
+                for posicao, token in enumerate(tokens(texto_campo)):
+                    if token.startswith(termo):
+                        valor = 4 if peso == 3 and posicao == 0 else peso
+                        melhor = max(melhor, valor * (2 if token == termo else 1))
+            if not melhor:
+                break
+            total += melhor
+        else:
+            pontuados.append((-total, numero))
+    return [snapshot.cursos[n] for _, n in sorted(pontuados)[:limite]]
+
+
+def test_busca_confere_com_a_definicao():
+    snapshot = SnapshotCursos(catalogo(3000), {})
+    # Há prefixos pesados (top pré-calculado) e leves (pontuados na hora)
+    assert snapshot._top and any(len(t) > 1 for t in snapshot._top)
+
+    for texto in ["m", "Med", "medicina", "MEDICINA vet", "sao", "são paulo", "univ fed", "usp 1", "x", "e c"]:
+        for limite in (1, 10, LIMITE_MAX):
+            assert snapshot.buscar(texto, limite) == ranking_esperado(snapshot, texto, limite), (texto, limite)
+
+
+def test_limite_e_sem_consulta():
+    snapshot = SnapshotCursos(catalogo(LIMIAR_PREFIXO), {})
+    assert len(snapshot.buscar("m", 10 * LIMITE_MAX)) == LIMITE_MAX
+    assert snapshot.buscar(None, 3) == snapshot.cursos[:3]
+    assert snapshot.buscar("   ", 3) == snapshot.cursos[:3]
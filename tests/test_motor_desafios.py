@@ -0,0 +1,186 @@
+"""
+Motor de desafios (motor_desafios.py): o progresso gravado é recalculado dos
+simulados finalizados, então refazer uma gravação (504 depois do commit) não
+conta nada duas vezes, e a primeira gravação após iniciar reconcilia todos os
+usuários da janela.
+"""
+
+import asyncio
+import json
+import shutil
+import subprocess
+
+import pytest
+
+import motor_desafios as modulo
+from motor_desafios import SCRIPT_DESCARREGAR, DesafioAtivo, MotorDesafios
+
+DESAFIO = {
+    "id": "d1", "titulo": "Faça 2 simulados", "descricao": "", "meta": 2, "recompensaFP": 50,
+    "inicio": "2026-10-12T00:00:00Z", "fim": "2026-10-18T23:59:59Z",
+}
+
+
+class BancoFalso:
+    """Faz o papel do sidecar: guarda as chamadas, pode falhar depois de "gravar" """
+
+    def __init__(self):
+        self.chamadas = []
+        self.falhar = False
+
+    async def __call__(self, script, params=None):
+        self.chamadas.append(params)
+        if self.falhar:
+            raise RuntimeError("504: timeout do sidecar")
+        return {"pagos": [], "usuarios": len(params["usuario_ids"] or [])}
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    banco = BancoFalso()
+    monkeypatch.setattr(modulo, "run_com_lancamentos", banco)
+    return banco
+
+
+def motor_com_desafio():
+    motor = MotorDesafios()
+    motor._ativo = DesafioAtivo(DESAFIO)
+    motor._valido_ate = float("inf")
+    return motor
+
+
+def test_refazer_apos_504_manda_os_mesmos_usuarios_sem_incremento(banco):
+    async def cenario():
+        motor = motor_com_desafio()
+        await motor.registrar_simulado("a@x", "u1", 10, 20, "2026-10-14T10:00:00Z")
+        banco.falhar = True
+        with pytest.raises(RuntimeError):
+            await motor.descarregar()
+        assert motor.pendente("d1", "u1")["incremento"] == 1
+
+        banco.falhar = False
+        await motor.descarregar()
+        assert motor.pendente("d1", "u1") is None
+
+    asyncio.run(cenario())
+    assert [c["usuario_ids"] for c in banco.chamadas] == [["u1"], ["u1"]]
+    assert all("progressos" not in c and c["tipo"] == "simulados" for c in banco.chamadas)
+
+
+def test_primeira_gravacao_reconcilia_a_janela(banco):
+    async def cenario():
+        motor = motor_com_desafio()
+        motor._reconciliar = True
+        await motor.registrar_simulado("a@x", "u1", 10, 20, "2026-10-14T10:00:00Z")
+
+        banco.falhar = True
+        with pytest.raises(RuntimeError):
+            await motor.descarregar()
+        banco.falhar = False
+        await motor.descarregar()
+        await motor.descarregar()
+
+    asyncio.run(cenario())
+    # Falhou: reconcilia de novo; depois só os usuários marcados (nenhum)
+    assert [c["usuario_ids"] for c in banco.chamadas] == [None, None]
+
+
+# ============================================================================
+# SCRIPT DE GRAVAÇÃO (node, com um prisma em memória)
+# ============================================================================
+
+PRISMA_FALSO = """
+const banco = JSON.parse(require("fs").readFileSync(0, "utf8"));
+let proximoId = 1;
+const pagamentos = [];
+async function lancarFP(tx, usuarioId, delta) {
+  pagamentos.push([usuarioId, delta]);
+  return { saldo: delta, nivel: "Iniciante" };
+}
+const tx = {
+  weeklyChallenge: { findUnique: async ({ where }) => banco.desafio.id === where.id ? banco.desafio : null },
+  usuarioSimulado: {
+    findMany: async ({ where }) => banco.simulados.filter(s =>
+      s.status === where.status &&
+      s.finishedAt >= where.finishedAt.gte && s.finishedAt <= where.finishedAt.lte &&
+      (!where.usuarioId || where.usuarioId.in.includes(s.usuarioId)))
+  },
+  usuarioChallenge: {
+    findMany: async ({ where }) => banco.registros.filter(r =>
+      r.challengeId === where.challengeId && where.usuarioId.in.includes(r.usuarioId) &&
+      (where.concluido === undefined || r.concluido === where.concluido) &&
+      (!where.progresso || r.progresso >= where.progresso.gte)),
+    createMany: async ({ data }) => { for (const d of data) banco.registros.push({ id: "r" + proximoId++, ...d }); },
+    update: async ({ where, data }) => Object.assign(banco.registros.find(r => r.id === where.id), data),
+    updateMany: async ({ where, data }) => {
+      const r = banco.registros.find(r => r.id === where.id && r.concluido === where.concluido);
+      if (r) Object.assign(r, data);
+      return { count: r ? 1 : 0 };
+    }
+  },
+  usuario: { findMany: async ({ where }) => where.id.in.map(id => ({ id, email: id + "@x" })) }
+};
+const prisma = { $transaction: async (f) => f(tx) };
+(async () => {
+  for (const params of banco.chamadas) {
+    await (async () => { SCRIPT })();
+  }
+  console.log(JSON.stringify({ registros: banco.registros, pagamentos }));
+})();
+"""
+
+
+def gravar(simulados, chamadas, tipo="simulados", limiar=None, registros=()):
+    programa = PRISMA_FALSO.replace("SCRIPT", SCRIPT_DESCARREGAR)
+    entrada = {
+        "desafio": {"id": "d1", "meta": 2, "recompensaFP": 50,
+                    "inicio": DESAFIO["inicio"], "fim": DESAFIO["fim"]},
+        "simulados": simulados,
+        "registros": list(registros),
+        "chamadas": [{"challenge_id": "d1", "tipo": tipo, "limiar": limiar, "usuario_ids": ids} for ids in chamadas],
+    }
+    saida = subprocess.run(["node", "-e", programa], input=json.dumps(entrada),
+                           capture_output=True, text=True, check=True)
+    return json.loads(saida.stdout)
+
+
+def simulado(usuario, quando, acertos=10, total=20, status="finalizado"):
+    return {"usuarioId": usuario, "finishedAt": quando, "acertos": acertos, "total": total, "status": status}
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node não instalado")
+def test_gravacao_repetida_nao_conta_duas_vezes():
+    simulados = [
+        simulado("u1", "2026-10-13T10:00:00Z"),
+        simulado("u1", "2026-10-14T10:00:00Z"),
+        simulado("u1", "2026-10-01T10:00:00Z"),                    # fora da janela
+        simulado("u1", "2026-10-15T10:00:00Z", status="em_andamento"),
+        simulado("u2", "2026-10-14T10:00:00Z"),
+    ]
+    # Mesmo lote gravado três vezes (504 depois do commit, refeito)
+    resultado = gravar(simulados, [["u1", "u2"], ["u1", "u2"], None])
+
+    progresso = {r["usuarioId"]: (r["progresso"], r["concluido"]) for r in resultado["registros"]}
+    assert progresso == {"u1": (2, True), "u2": (1, False)}
+    assert resultado["pagamentos"] == [["u1", 50]]
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node não instalado")
+def test_regras_percentual_e_dias_consecutivos():
+    simulados = [
+        simulado("u1", "2026-10-12T10:00:00Z", acertos=18),
+        simulado("u1", "2026-10-13T10:00:00Z", acertos=5),
+        simulado("u1", "2026-10-13T20:00:00Z", acertos=17),
+        simulado("u1", "2026-10-15T10:00:00Z", acertos=16),
+    ]
+    percentual = gravar(simulados, [None], tipo="percentual", limiar=80)
+    assert percentual["registros"][0]["progresso"] == 3
+
+    dias = gravar(simulados, [None], tipo="dias_consecutivos")
+    assert dias["registros"][0]["progresso"] == 2
+
+    # O valor gravado só sobe (progresso manual antigo é mantido)
+    manual = gravar(simulados, [None], tipo="dias_consecutivos",
+                    registros=[{"id": "r0", "usuarioId": "u1", "challengeId": "d1", "progresso": 5, "concluido": True}])
+    assert manual["registros"][0]["progresso"] == 5
+    assert manual["pagamentos"] == []
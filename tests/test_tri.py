@@ -0,0 +1,94 @@
+"""
+TRI (tri.py) e correção em lote (correcao_lote.py): a nota cresce com os
+acertos, o lote concorda com a pontuação individual e o script do /finish
+(JS_NOTA_TRI) concorda com o Python.
+"""
+
+import json
+import random
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+import tri
+from correcao_lote import corrigir_bloco
+
+DIFICULDADES = [1, 2, 3, 4, 5, "facil", "Médio", "Muito Difícil", "3", None]
+
+
+def itens_sorteados(sorteio: random.Random, n: int, areas=("Matemática",)):
+    return [
+        {"acertou": sorteio.random() < 0.5, "dificuldade": sorteio.choice(DIFICULDADES),
+         "area": sorteio.choice(areas)}
+        for _ in range(n)
+    ]
+
+
+def test_nota_cresce_com_os_acertos():
+    dificuldades = [1, 2, 3, 4, 5] * 9
+    notas = [
+        tri.pontuar_simulado([
+            {"acertou": i < acertos, "dificuldade": d} for i, d in enumerate(dificuldades)
+        ])["nota"]
+        for acertos in range(len(dificuldades) + 1)
+    ]
+    assert all(a < b for a, b in zip(notas, notas[1:]))
+    assert 0 <= notas[0] < tri.ESCALA_MEDIA < notas[-1] <= tri.NOTA_MAXIMA
+
+
+def test_lote_igual_a_pontuacao_individual():
+    sorteio = random.Random(3)
+    itens = [{"dificuldade": sorteio.choice(DIFICULDADES)} for _ in range(30)]
+    respostas = (np.random.default_rng(3).random((200, 30)) < 0.6).astype(float)
+
+    notas = tri.pontuar_lote(respostas, itens)["nota"]
+    for linha, nota in zip(respostas, notas):
+        individual = tri.pontuar_simulado([
+            {**item, "acertou": bool(acertou)} for item, acertou in zip(itens, linha)
+        ])["nota"]
+        assert nota == pytest.approx(individual, abs=0.01)
+
+
+def test_corrigir_bloco_confere_letras_e_notas():
+    gabarito = "ABCDEABCDE"
+    itens = [{"dificuldade": d} for d in [1, 2, 3, 4, 5] * 2]
+    ids = list(range(100, 110))
+    marcadas = ["ABCDEABCDE", "----------", "ABCDE-----", "EDCBAEDCBA"]
+    gabaritos = [None, None, None, "EDCBAEDCBA"]
+
+    resultados = corrigir_bloco(["a", "b", "c", "d"], marcadas, gabaritos, gabarito, ids, itens)
+
+    assert [r["acertos"] for r in resultados] == [10, 0, 5, 10]
+    assert resultados[1]["erradas"] == ids
+    assert resultados[2]["erradas"] == ids[5:]
+    for r, m, g in zip(resultados, marcadas, gabaritos):
+        individual = tri.pontuar_simulado([
+            {**item, "acertou": letra == certa} for item, letra, certa in zip(itens, m, g or gabarito)
+        ])["nota"]
+        assert r["nota"] == pytest.approx(individual, abs=0.01)
+        assert r["porcentagem"] == r["acertos"] * 10
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node não instalado")
+def test_script_do_finish_igual_ao_python():
+    sorteio = random.Random(11)
+    casos = [itens_sorteados(sorteio, sorteio.randint(1, 45), ("Matemática", "Linguagens")) for _ in range(50)]
+    casos.append([])
+
+    programa = tri.JS_NOTA_TRI + """
+const entrada = JSON.parse(require("fs").readFileSync(0, "utf8"));
+console.log(JSON.stringify(entrada.casos.map(itens => notaTri(itens, entrada.tri))));
+"""
+    saida = subprocess.run(
+        ["node", "-e", programa], input=json.dumps({"casos": casos, "tri": tri.parametros_sidecar()}),
+        capture_output=True, text=True, check=True,
+    )
+
+    for itens, js in zip(casos, json.loads(saida.stdout)):
+        python = tri.pontuar_simulado(itens)
+        assert js["nota"] == pytest.approx(python["nota"], abs=0.011)
+        assert set(js["notas_por_area"]) == set(python["por_area"])
+        for area, r in python["por_area"].items():
+            assert js["notas_por_area"][area] == pytest.approx(r["nota"], abs=0.011)
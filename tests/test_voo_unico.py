@@ -0,0 +1,75 @@
+"""
+Voo único (voo_unico.py): chamadas simultâneas da mesma chave dividem uma
+execução, e o cancelamento de um chamador não derruba a dos outros.
+"""
+
+import asyncio
+
+import pytest
+
+from voo_unico import VooUnico
+
+
+def test_chamadas_simultaneas_dividem_uma_execucao():
+    execucoes = []
+
+    async def gerar():
+        execucoes.append(1)
+        await asyncio.sleep(0.01)
+        return "explicação"
+
+    async def cenario():
+        voo = VooUnico("t")
+        resultados = await asyncio.gather(*(voo.executar("q1", gerar) for _ in range(5)))
+        outra = await voo.executar("q2", gerar)
+        return resultados, outra, voo.estatisticas()
+
+    resultados, outra, estatisticas = asyncio.run(cenario())
+    assert [r for r, _ in resultados] == ["explicação"] * 5
+    assert sorted(c for _, c in resultados) == [False, True, True, True, True]
+    assert outra == ("explicação", False)
+    assert len(execucoes) == 2
+    assert estatisticas["em_andamento"] == 0
+    assert (estatisticas["execucoes"], estatisticas["coalescidas"]) == (2, 4)
+
+
+def test_excecao_chega_a_todos_e_libera_a_chave():
+    tentativas = []
+
+    async def falhar():
+        tentativas.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("ollama fora do ar")
+
+    async def cenario():
+        voo = VooUnico("t")
+        resultados = await asyncio.gather(*(voo.executar("q1", falhar) for _ in range(3)),
+                                          return_exceptions=True)
+        # Depois da falha a chave está livre: nova execução
+        with pytest.raises(RuntimeError):
+            await voo.executar("q1", falhar)
+        return resultados
+
+    resultados = asyncio.run(cenario())
+    assert all(isinstance(r, RuntimeError) for r in resultados)
+    assert len(tentativas) == 2
+
+
+def test_lider_cancelado_nao_cancela_a_execucao():
+    async def gerar():
+        await asyncio.sleep(0.05)
+        return "explicação"
+
+    async def cenario():
+        voo = VooUnico("t")
+        lider = asyncio.create_task(voo.executar("q1", gerar))
+        await asyncio.sleep(0)
+        seguidor = asyncio.create_task(voo.executar("q1", gerar))
+        await asyncio.sleep(0.01)
+
+        lider.cancel()  # cliente do líder desconectou
+        with pytest.raises(asyncio.CancelledError):
+            await lider
+        return await seguidor
+
+    assert asyncio.run(cenario()) == ("explicação", True)
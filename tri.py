@@ -0,0 +1,256 @@
+"""
+TRI - Pontuação por Teoria de Resposta ao Item (modelo logístico de 3 parâmetros)
+
+A nota era linear (300 + acertos * 700 / total): acertar uma questão fácil
+valia o mesmo que acertar uma difícil. Agora a proficiência é estimada por
+EAP (Expected A Posteriori) numa grade de quadratura, como no ENEM:
+
+    P(acerto | θ) = c + (1 - c) / (1 + exp(-D·a·(θ - b)))
+
+    a: discriminação   b: dificuldade   c: acerto casual (5 alternativas)
+
+Itens sem parâmetros calibrados usam `difficulty`/`dificuldade` da questão
+(1-5 ou facil/medio/dificil) para b, com a = 1 e c = 0,2.
+
+Cada área do ENEM é pontuada separadamente (θ próprio) e levada para a
+escala 500 ± 100; a nota geral é a média das áreas presentes.
+
+Tudo é vetorizado em NumPy: `pontuar_lote` calcula a verossimilhança de
+milhares de vetores de resposta numa única multiplicação de matrizes
+(pessoas × itens) @ (itens × nós).
+
+O /finish pontua dentro da própria transação do sidecar (JS_NOTA_TRI): o
+modelo continua aqui, que manda para o script a log-verossimilhança de
+acerto/erro de cada dificuldade em cada nó (parametros_sidecar); o JS só
+soma vetores e tira a média a posteriori.
+"""
+
+import unicodedata
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# ============================================================================
+# CONFIGURAÇÃO
+# ============================================================================
+
+# Escala ENEM: média 500, desvio padrão 100 na população de referência
+ESCALA_MEDIA = 500.0
+ESCALA_DESVIO = 100.0
+NOTA_MAXIMA = 1000.0
+
+# Constante de escala do modelo logístico (aproxima a ogiva normal)
+D = 1.7
+
+DISCRIMINACAO_PADRAO = 1.0
+ACERTO_CASUAL_PADRAO = 0.2
+
+# Dificuldade cadastrada -> parâmetro b
+DIFICULDADE_B = {
+    1: -2.0, 2: -1.0, 3: 0.0, 4: 1.0, 5: 2.0,
+    "muito_facil": -2.0, "facil": -1.0, "media": 0.0, "medio": 0.0,
+    "dificil": 1.0, "muito_dificil": 2.0,
+}
+
+# Grade de quadratura e priori N(0, 1)
+NOS = np.linspace(-4.0, 4.0, 61)
+LOG_PRIORI = -0.5 * NOS ** 2
+
+# ============================================================================
+# PARÂMETROS DOS ITENS
+# ============================================================================
+
+def dificuldade_b(dificuldade) -> float:
+    """Parâmetro b a partir da dificuldade cadastrada (média se desconhecida)"""
+    if dificuldade is None:
+        return 0.0
+    if isinstance(dificuldade, str):
+        # "Muito Fácil" -> "muito_facil"
+        chave = unicodedata.normalize("NFKD", dificuldade)
+        chave = "".join(c for c in chave if not unicodedata.combining(c))
+        chave = "_".join(chave.casefold().split())
+        if chave.isdigit():
+            return DIFICULDADE_B.get(int(chave), 0.0)
+        return DIFICULDADE_B.get(chave, 0.0)
+    return DIFICULDADE_B.get(int(dificuldade), 0.0)
+
+
+def parametros_itens(itens: Sequence[Dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Arrays (a, b, c) dos itens
+
+    Cada item pode trazer `a`/`b`/`c` calibrados; senão b vem de
+    `dificuldade` e a/c são os padrões.
+    """
+    a = np.array([i.get("a") or DISCRIMINACAO_PADRAO for i in itens], dtype=float)
+    b = np.array([
+        i["b"] if i.get("b") is not None else dificuldade_b(i.get("dificuldade"))
+        for i in itens
+    ], dtype=float)
+    c = np.array([
+        i["c"] if i.get("c") is not None else ACERTO_CASUAL_PADRAO
+        for i in itens
+    ], dtype=float)
+    return a, b, c
+
+# ============================================================================
+# ESTIMAÇÃO
+# ============================================================================
+
+def probabilidades(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """P(acerto) de cada item em cada nó da grade: (itens × nós)"""
+    return c[:, None] + (1.0 - c[:, None]) / (1.0 + np.exp(-D * a[:, None] * (NOS[None, :] - b[:, None])))
+
+
+def eap(respostas: np.ndarray, a: np.ndarray, b: np.ndarray,
+        c: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Proficiência EAP de vários vetores de resposta de uma vez
+
+    Args:
+        respostas: (pessoas × itens) com 1 (acerto), 0 (erro) ou NaN (item
+                   não aplicado a essa pessoa)
+        a, b, c: Parâmetros dos itens (um valor por coluna)
+
+    Returns:
+        (θ, erro padrão), um por pessoa
+    """
+    respostas = np.atleast_2d(np.asarray(respostas, dtype=float))
+    aplicado = ~np.isnan(respostas)
+    acertos = np.where(aplicado, respostas, 0.0)
+    erros = aplicado - acertos
+
+    p = np.clip(probabilidades(a, b, c), 1e-9, 1 - 1e-9)
+    # log-verossimilhança em cada nó: (pessoas × itens) @ (itens × nós)
+    log_post = acertos @ np.log(p) + erros @ np.log1p(-p) + LOG_PRIORI
+    log_post -= log_post.max(axis=1, keepdims=True)
+    posterior = np.exp(log_post)
+    posterior /= posterior.sum(axis=1, keepdims=True)
+
+    theta = posterior @ NOS
+    erro = np.sqrt(np.maximum(posterior @ NOS ** 2 - theta ** 2, 0.0))
+    return theta, erro
+
+
+def para_escala(theta: np.ndarray) -> np.ndarray:
+    """θ -> nota na escala ENEM (0-1000, 2 casas)"""
+    return np.round(np.clip(ESCALA_MEDIA + ESCALA_DESVIO * theta, 0.0, NOTA_MAXIMA), 2)
+
+
+def pontuar_lote(respostas: np.ndarray, itens: Sequence[Dict]) -> Dict[str, np.ndarray]:
+    """
+    Pontua milhares de vetores de resposta numa chamada
+
+    Args:
+        respostas: (pessoas × itens), 1/0/NaN (ver eap)
+        itens: Parâmetros de cada coluna (ver parametros_itens)
+
+    Returns:
+        {"nota", "theta", "erro"}: arrays com um valor por pessoa
+    """
+    theta, erro = eap(respostas, *parametros_itens(itens))
+    return {"nota": para_escala(theta), "theta": theta, "erro": erro}
+
+
+def pontuar_simulado(itens: List[Dict]) -> Dict:
+    """
+    Nota TRI de um simulado, por área
+
+    Args:
+        itens: [{acertou, area, dificuldade (ou a/b/c)}] - uma entrada por questão
+
+    Returns:
+        {"nota": média das áreas, "por_area": {area: {nota, theta, erro, itens}}}
+    """
+    por_area: Dict[Optional[str], List[Dict]] = {}
+    for item in itens:
+        por_area.setdefault(item.get("area"), []).append(item)
+
+    resultado = {}
+    for area, itens_area in por_area.items():
+        respostas = np.array([[1.0 if i["acertou"] else 0.0 for i in itens_area]])
+        theta, erro = eap(respostas, *parametros_itens(itens_area))
+        resultado[area] = {
+            "nota": float(para_escala(theta)[0]),
+            "theta": round(float(theta[0]), 4),
+            "erro": round(float(erro[0]), 4),
+            "itens": len(itens_area),
+        }
+
+    nota = round(sum(r["nota"] for r in resultado.values()) / len(resultado), 2) if resultado else 0.0
+    return {"nota": nota, "por_area": resultado}
+
+# ============================================================================
+# PONTUAÇÃO NO SIDECAR
+# ============================================================================
+
+def parametros_sidecar() -> Dict:
+    """
+    Parâmetros de JS_NOTA_TRI (itens sem a/b/c calibrados: a e c padrão)
+
+    Returns:
+        {"nos", "log_priori", "dificuldades": {chave: índice},
+         "acerto": [[log P por nó] por b], "erro": [...], "escala": {...}}
+    """
+    bs = sorted(set(DIFICULDADE_B.values()) | {0.0})
+    a = np.full(len(bs), DISCRIMINACAO_PADRAO)
+    c = np.full(len(bs), ACERTO_CASUAL_PADRAO)
+    p = np.clip(probabilidades(a, np.array(bs), c), 1e-9, 1 - 1e-9)
+    return {
+        "nos": NOS.tolist(),
+        "log_priori": LOG_PRIORI.tolist(),
+        "dificuldades": {str(chave): bs.index(b) for chave, b in DIFICULDADE_B.items()},
+        "padrao": bs.index(0.0),
+        "acerto": np.log(p).tolist(),
+        "erro": np.log1p(-p).tolist(),
+        "escala": {"media": ESCALA_MEDIA, "desvio": ESCALA_DESVIO, "maxima": NOTA_MAXIMA},
+    }
+
+
+# notaTri(itens, tri): mesma conta de pontuar_simulado para itens
+# [{acertou, dificuldade, area}], com tri = parametros_sidecar()
+JS_NOTA_TRI = '''
+function chaveDificuldade(dificuldade) {
+  if (dificuldade === null || dificuldade === undefined) return null;
+  if (typeof dificuldade === "number") return String(Math.trunc(dificuldade));
+  // "Muito Fácil" -> "muito_facil" (como dificuldade_b)
+  const chave = String(dificuldade).normalize("NFKD").replace(/[\\u0300-\\u036f]/g, "")
+    .toLowerCase().trim().split(/\\s+/).join("_");
+  return /^\\d+$/.test(chave) ? String(parseInt(chave, 10)) : chave;
+}
+
+function notaTri(itens, tri) {
+  const porArea = new Map();
+  for (const item of itens) {
+    if (!porArea.has(item.area)) porArea.set(item.area, []);
+    porArea.get(item.area).push(item);
+  }
+
+  const notasPorArea = {};
+  for (const [area, lista] of porArea) {
+    const logPost = tri.log_priori.slice();
+    for (const item of lista) {
+      const b = tri.dificuldades[chaveDificuldade(item.dificuldade)] ?? tri.padrao;
+      const termo = item.acertou ? tri.acerto[b] : tri.erro[b];
+      for (let k = 0; k < logPost.length; k++) logPost[k] += termo[k];
+    }
+    const maximo = Math.max(...logPost);
+    let soma = 0;
+    let theta = 0;
+    for (let k = 0; k < logPost.length; k++) {
+      const peso = Math.exp(logPost[k] - maximo);
+      soma += peso;
+      theta += peso * tri.nos[k];
+    }
+    theta /= soma;
+    const nota = Math.min(Math.max(tri.escala.media + tri.escala.desvio * theta, 0), tri.escala.maxima);
+    notasPorArea[area] = Math.round(nota * 100) / 100;
+  }
+
+  const notas = Object.values(notasPorArea);
+  const nota = notas.length > 0
+    ? Math.round(notas.reduce((a, b) => a + b, 0) / notas.length * 100) / 100
+    : 0;
+  return { nota, notas_por_area: notasPorArea };
+}
+'''
@@ -0,0 +1,61 @@
+"""
+Voo Único - Coalescência de requisições idênticas em andamento
+
+Quando uma turma revisa o mesmo simulado, dezenas de alunos pedem a mesma
+explicação ao mesmo tempo: todos erram o cache e cada um dispara sua própria
+geração no Ollama (um único modelo local, uma geração por vez na prática).
+
+Com VooUnico, a primeira requisição de uma chave (líder) inicia a geração
+numa task própria; as demais que chegam enquanto ela está em andamento
+aguardam a MESMA task. Resultado e exceção são entregues a todos.
+
+A task é protegida com asyncio.shield: se o cliente líder desconectar, a
+geração continua para os outros (e para o cache).
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class VooUnico:
+    """Uma execução por chave em andamento, compartilhada entre chamadores"""
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self._em_voo: Dict[str, asyncio.Task] = {}
+        self._contadores = {"execucoes": 0, "coalescidas": 0}
+
+    async def executar(self, chave: str,
+                       funcao: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Executa `funcao` uma vez por chave em andamento
+
+        Returns:
+            (resultado, coalescida) - coalescida=True se aproveitou a
+            execução de outro chamador
+        """
+        task = self._em_voo.get(chave)
+        coalescida = task is not None
+
+        if coalescida:
+            self._contadores["coalescidas"] += 1
+            logger.info(f"🔗 {self.nome}: requisição coalescida ({chave[:8]}...)")
+        else:
+            self._contadores["execucoes"] += 1
+            task = asyncio.ensure_future(funcao())
+            self._em_voo[chave] = task
+            task.add_done_callback(lambda _: self._em_voo.pop(chave, None))
+
+        return await asyncio.shield(task), coalescida
+
+    def estatisticas(self) -> Dict:
+        """Execuções reais, chamadores coalescidos e chaves em andamento"""
+        total = self._contadores["execucoes"] + self._contadores["coalescidas"]
+        return {
+            **self._contadores,
+            "em_andamento": len(self._em_voo),
+            "taxa_coalescencia": round(self._contadores["coalescidas"] / total, 4) if total else None,
+        }